@@ -1,9 +1,12 @@
 import argparse
+import json
 import os
 import shutil
 import subprocess
+import sys
 import zipfile
 from pathlib import Path
+from typing import List
 
 pt = os.path.join
 
@@ -15,6 +18,31 @@ UNOIDL_WRITE = pt(OO_SDK_HOME, "bin/unoidl-write")
 MAIN_DIR = Path(__file__).parent
 SRC_DIR = MAIN_DIR / "src"
 DEST_DIR = MAIN_DIR / "dest"
+OXT_PATH = MAIN_DIR / "lopolyfill.oxt"
+RELEASE_REPORT_PATH = MAIN_DIR / "lopolyfill-release.json"
+
+# LibreOffice 7.2
+MIN_PYTHON_VERSION = (3, 8)
+# the modules that are loaded by LibreOffice only
+UNO_MODULES = ("uno", "unohelper", "com", "pyuno")
+
+# run by the target Python: import the modules of the extension, print the
+# names of the modules that were imported and of the modules that need UNO
+_VALIDATE_CODE = """
+import importlib, json, sys
+sys.path[:0] = sys.argv[1:3]
+ok, uno = [], []
+for name in sys.argv[3:]:
+    try:
+        importlib.import_module(name)
+    except ImportError as e:
+        if (e.name or "").split(".")[0] not in {uno_modules!r}:
+            raise
+        uno.append(name)
+    else:
+        ok.append(name)
+print(json.dumps({{"ok": ok, "uno": uno}}))
+""".format(uno_modules=UNO_MODULES)
 
 
 class LoPolyfillbuilder:
@@ -29,27 +57,112 @@ class LoPolyfillbuilder:
                    str(OFFICE_HOME / "program/types/offapi.rdb"),
                    str(SRC_DIR / "lopolyfill.idl"),
                    str(DEST_DIR / "lopolyfill.rdb")]
-        _process = self._run_command(command)
+        self._run_command(command)
 
     def copy(self):
         print("Copy files...")
         for path in SRC_DIR.glob("*"):
             if path.name in (
-                    "lopolyfill.xcu", "description.xml", "LoPolyfill.py",
-                    "LICENSE"):
+                    "lopolyfill.xcu", "jobs.xcu", "description.xml",
+                    "LoPolyfill.py", "LICENSE"):
                 self._copy_file(path, DEST_DIR / path.name)
             elif path.name.startswith("package-description"):
                 self._copy_file(path, DEST_DIR / path.name)
         self._copy_tree(SRC_DIR / "META-INF", DEST_DIR / "META-INF")
         self._copy_tree(SRC_DIR / "pythonpath", DEST_DIR / "pythonpath")
 
+    def precompile(self, python: str):
+        """
+        Compile the modules of pythonpath/ for the Python of LibreOffice.
+        The hash of the source is not checked: the bytecode is valid even if
+        the extension manager does not keep the modification times, and is
+        never rewritten in a read-only directory. (LoPolyfill.py is compiled
+        by the loader of LibreOffice.)
+        """
+        print("Precompile...")
+        command = [python, "-m", "compileall", "-q",
+                   "--invalidation-mode", "unchecked-hash",
+                   str(DEST_DIR / "pythonpath")]
+        self._run_command(command)
+
+    def validate(self, python: str) -> List[str]:
+        """
+        Import the stripped modules with the Python of LibreOffice. The
+        modules that need UNO are only compiled if this Python has no UNO.
+
+        :return: the names of the imported modules
+        """
+        print("Validate...")
+        names = ["LoPolyfill"] + sorted(
+            path.stem for path in (DEST_DIR / "pythonpath").glob("*.py"))
+        for path in [DEST_DIR / "LoPolyfill.py"] + sorted(
+                (DEST_DIR / "pythonpath").glob("*.py")):
+            compile(path.read_text(encoding="utf-8"), str(path), "exec")
+        # -B: no bytecode for LoPolyfill.py in the extension
+        command = [python, "-B", "-c", _VALIDATE_CODE,
+                   str(DEST_DIR / "pythonpath"), str(DEST_DIR)] + names
+        process = self._run_command(command)
+        result = json.loads(process.stdout.splitlines()[-1])
+        for name in result["uno"]:
+            print("  {}: needs UNO, compiled only".format(name))
+        return result["ok"]
+
+    def report(self, python: str, names: List[str]):
+        """
+        Write the size of the OXT file and the import time of each module
+        that was validated.
+        """
+        print("Report...")
+        import_times = {
+            name: self._get_import_time(python, name) for name in names
+        }
+        report = {
+            "python": self._get_python_version(python),
+            "oxt_size": OXT_PATH.stat().st_size,
+            "import_times_ms": import_times,
+        }
+        for name, import_time in import_times.items():
+            print("  {}: {:.1f} ms".format(name, import_time))
+        print("  {}: {} bytes".format(OXT_PATH.name, report["oxt_size"]))
+        with RELEASE_REPORT_PATH.open("w", encoding="utf-8") as d:
+            json.dump(report, d, indent=4)
+
+    def _get_import_time(self, python: str, name: str) -> float:
+        """
+        The cumulative import time of a module in a new interpreter, in
+        milliseconds.
+        """
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(
+            [str(DEST_DIR / "pythonpath"), str(DEST_DIR)]))
+        process = subprocess.run(
+            [python, "-B", "-X", "importtime", "-c", "import " + name],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            universal_newlines=True, env=env, check=True)
+        for line in process.stderr.splitlines():
+            fields = line.split("|")
+            if len(fields) == 3 and fields[2].strip() == name:
+                return int(fields[1]) / 1000
+        raise Exception("No import time for {}".format(name))
+
+    def check_python(self, python: str):
+        version = self._get_python_version(python)
+        if tuple(version) < MIN_PYTHON_VERSION:
+            raise Exception("Python {}.{} < {}.{}".format(
+                *version, *MIN_PYTHON_VERSION))
+
+    def _get_python_version(self, python: str) -> List[int]:
+        process = self._run_command(
+            [python, "-c", "import sys; print(*sys.version_info[:2])"])
+        return [int(x) for x in process.stdout.split()]
+
     def _copy_file(self, source_path: Path, dest_path: Path):
         print("  {} -> {}".format(source_path, dest_path))
         shutil.copy2(source_path, dest_path)
 
     def _copy_tree(self, source_dir: Path, dest_dir: Path):
         print("  {}/ -> {}/".format(source_dir, dest_dir))
-        shutil.copytree(source_dir, dest_dir)
+        shutil.copytree(source_dir, dest_dir, ignore=shutil.ignore_patterns(
+            "__pycache__", "*.pyc"))
 
     def process(self, debug: bool, noprefix: bool):
         print("Process... (debug={}, noprefix={})".format(debug, noprefix))
@@ -93,18 +206,17 @@ class LoPolyfillbuilder:
 
     def make_oxt(self):
         print("Make OXT...")
-        dest = zipfile.ZipFile(MAIN_DIR / "lopolyfill.oxt", 'w',
-                               zipfile.ZIP_DEFLATED)
-        for root, dirs, files in os.walk(DEST_DIR):
-            for file in files:
-                name = os.path.join(root, file)
-                dest.write(name, os.path.relpath(name, DEST_DIR))
+        with zipfile.ZipFile(OXT_PATH, 'w', zipfile.ZIP_DEFLATED) as dest:
+            for root, dirs, files in os.walk(DEST_DIR):
+                for file in files:
+                    name = os.path.join(root, file)
+                    dest.write(name, os.path.relpath(name, DEST_DIR))
 
     def install(self):
         print("Install OXT...")
         command = [str(OFFICE_HOME / "program/unopkg"), "add", "-f",
-                   str(MAIN_DIR / "lopolyfill.oxt")]
-        process = self._run_command(command)
+                   str(OXT_PATH)]
+        self._run_command(command)
 
 
 if __name__ == "__main__":
@@ -113,12 +225,29 @@ if __name__ == "__main__":
         description='Builds the LoPolyfill extension')
     parser.add_argument("-d", "--debug", action="store_true")
     parser.add_argument("--noprefix", action="store_true")
+    parser.add_argument(
+        "--release", action="store_true",
+        help="precompile, validate the modules and write {}".format(
+            RELEASE_REPORT_PATH.name))
+    parser.add_argument(
+        "--python", default=os.getenv("LO_PYTHON", sys.executable),
+        help="the Python of LibreOffice (the bytecode is specific to its "
+             "version)")
     args = parser.parse_args()
+    if args.release and args.debug:
+        parser.error("--release and --debug are exclusive")
 
     builder = LoPolyfillbuilder()
+    if args.release:
+        builder.check_python(args.python)
     builder.prepare()
     builder.create_rdb()
     builder.copy()
     builder.process(args.debug, args.noprefix)
+    if args.release:
+        builder.precompile(args.python)
+        validated_names = builder.validate(args.python)
     builder.make_oxt()
+    if args.release:
+        builder.report(args.python, validated_names)
     builder.install()
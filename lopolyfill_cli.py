@@ -0,0 +1,286 @@
+# LoPolyfill - Python - A set of 24.8 functions made availaible for 7.2
+# Copyright (C) 2025 Julien Férard.
+#
+# LoPolyfill is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# LoPolyfill is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+Apply the LOP functions to CSV files, without LibreOffice.
+
+The rows are streamed: SORT sorts chunks of rows and merges the sorted
+chunks from temporary files, UNIQUE keeps only the distinct rows in memory,
+XLOOKUP keeps only the lookup table in memory. The cells are converted as
+Calc passes them to the add-in: empty cells are empty strings, finite
+numbers are floats, other cells (including "nan" and "inf") are strings
+compared with a local collator (case insensitive).
+
+    python lopolyfill_cli.py sort data.csv -k 2 -k 1 -r -1 -r 1 -o out.csv
+    python lopolyfill_cli.py unique data.csv --exactly-once
+    python lopolyfill_cli.py xlookup data.csv table.csv -c 1 -s 1
+"""
+import argparse
+import collections
+import csv
+import functools
+import heapq
+import itertools
+import math
+import sys
+from pathlib import Path
+from typing import (
+    Any, Callable, Iterable, Iterator, List, Optional, Sequence, TextIO,
+    Tuple)
+
+MAIN_DIR = Path(__file__).parent
+sys.path.insert(0, str(MAIN_DIR / "src" / "pythonpath"))
+
+import lopolyfill_merge
+from lopolyfill_funcs import (
+    DataRow, IndexFinder, LopSort, XMatchMode)
+
+CHUNK_ROWS = 100000
+
+
+class LocalCollator:
+    """
+    A stand-in for the collator of the document: case insensitive, code
+    point order.
+    """
+
+    @staticmethod
+    def compareString(s1: str, s2: str) -> int:
+        s1 = s1.casefold()
+        s2 = s2.casefold()
+        if s1 < s2:
+            return -1
+        elif s1 > s2:
+            return 1
+        else:
+            return 0
+
+
+def parse_cell(text: str) -> Any:
+    try:
+        value = float(text)
+    except ValueError:  # including the empty cells
+        return text
+    return value if math.isfinite(value) else text
+
+
+def format_cell(value: Any) -> str:
+    if value is None:
+        return ""
+    elif isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    else:
+        return str(value)
+
+
+def read_rows(file: TextIO, delimiter: str) -> Iterator[DataRow]:
+    for row in csv.reader(file, delimiter=delimiter):
+        yield tuple(map(parse_cell, row))
+
+
+def write_rows(file: TextIO, delimiter: str, rows: Iterable[DataRow]):
+    writer = csv.writer(file, delimiter=delimiter, lineterminator="\n")
+    for row in rows:
+        writer.writerow(list(map(format_cell, row)))
+
+
+def sort_rows(
+        rows: Iterable[DataRow], sort_index: Any, sort_order: Any,
+        chunk_rows: int = CHUNK_ROWS
+) -> Iterator[DataRow]:
+    """
+    SORT by row. Each chunk is sorted by LopSort; if there are several
+    chunks, they are written to temporary files and merged. The merge is
+    stable: the result is the result of SORT on all the rows.
+    """
+    lop_sort = LopSort(LocalCollator(), ValueError)
+    cmp_rows = lop_sort.create_cmp_rows(sort_index, sort_order)
+    rows = iter(rows)
+    run_files = []
+    try:
+        while True:
+            chunk = list(itertools.islice(rows, chunk_rows))
+            if not chunk:
+                break
+            sorted_chunk = lop_sort.sort(chunk, sort_index, sort_order, None)
+            if not run_files and len(chunk) < chunk_rows:  # a single chunk
+                yield from sorted_chunk
+                return
+            run_files.append(lopolyfill_merge.write_run(sorted_chunk))
+            del chunk, sorted_chunk
+    except BaseException:
+        for run_file in run_files:
+            run_file.close()
+        raise
+
+    yield from heapq.merge(
+        *[lopolyfill_merge.read_run(f) for f in run_files],
+        key=functools.cmp_to_key(cmp_rows))
+
+
+def unique_rows(
+        read: Callable[[], Iterable[DataRow]], exactly_once: bool
+) -> Iterator[DataRow]:
+    """
+    UNIQUE by row. read is called once, or twice if exactly_once: the first
+    pass counts the rows.
+    """
+    if exactly_once:
+        counter = collections.Counter(read())
+        for row in read():
+            if counter[row] == 1:
+                yield row
+    else:
+        seen = set()
+        for row in read():
+            if row not in seen:
+                seen.add(row)
+                yield row
+
+
+def lookup_rows(
+        rows: Iterable[DataRow], table: Sequence[DataRow], column: int,
+        search_column: int, return_columns: Optional[List[int]],
+        default_value: Any, match_mode: int
+) -> Iterator[DataRow]:
+    """
+    Append to each row the result of XLOOKUP(row[column]; search column of
+    the table; return columns of the table; default; match mode). The table
+    is sorted once (stable: the first match is kept) and the values are
+    searched by bisection.
+    """
+    if not table:
+        raise ValueError("Empty lookup table")
+    lop_sort = LopSort(LocalCollator(), ValueError)
+    table = lop_sort.sort(table, search_column + 1, 1, None)
+    values = [row[search_column] for row in table]
+    if return_columns is None:
+        return_columns = list(range(len(table[0])))
+    finder = IndexFinder(LocalCollator(), ValueError, True)
+    match_mode = XMatchMode(match_mode)
+    defaults = (default_value,) * len(return_columns)
+
+    for row in rows:
+        criterion = row[column] if column < len(row) else ""
+        idx = None if criterion is None else finder.binary_find_index(
+            criterion, values, match_mode, reverse=False)
+        if idx is None:
+            yield row + defaults
+        else:
+            found = table[idx]
+            yield row + tuple(found[j] for j in return_columns)
+
+
+def _read_csv(
+        path: str, delimiter: str, header: bool
+) -> Tuple[Optional[DataRow], Callable[[], Iterator[DataRow]]]:
+    """
+    The header (or None) and a function that streams the other rows of the
+    file.
+    """
+    def read() -> Iterator[DataRow]:
+        with open(path, newline="", encoding="utf-8") as file:
+            rows = read_rows(file, delimiter)
+            if header:
+                next(rows, None)
+            yield from rows
+
+    first_row = None
+    if header:
+        with open(path, newline="", encoding="utf-8") as file:
+            first_row = next(csv.reader(file, delimiter=delimiter), None)
+    return first_row, read
+
+
+def _create_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="lopolyfill_cli",
+        description="Applies LOP functions to CSV files")
+    parent = argparse.ArgumentParser(add_help=False)
+    parent.add_argument("input", help="the input CSV file")
+    parent.add_argument("-o", "--output", help="the output CSV file")
+    parent.add_argument("-d", "--delimiter", default=",")
+    parent.add_argument("--header", action="store_true",
+                        help="copy the first row as is")
+    subparsers = parser.add_subparsers(dest="function", required=True)
+
+    sort_parser = subparsers.add_parser("sort", parents=[parent])
+    sort_parser.add_argument(
+        "-k", "--sort-index", type=int, action="append",
+        help="a column number (1 for the first column), may be repeated")
+    sort_parser.add_argument(
+        "-r", "--sort-order", type=int, action="append",
+        help="1 (ascending) or -1 (descending), may be repeated")
+    sort_parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+
+    unique_parser = subparsers.add_parser("unique", parents=[parent])
+    unique_parser.add_argument("--exactly-once", action="store_true")
+
+    xlookup_parser = subparsers.add_parser("xlookup", parents=[parent])
+    xlookup_parser.add_argument("table", help="the lookup table CSV file")
+    xlookup_parser.add_argument(
+        "-c", "--column", type=int, required=True,
+        help="the column of the criterion in the input file")
+    xlookup_parser.add_argument(
+        "-s", "--search-column", type=int, required=True,
+        help="the column of the search values in the table")
+    xlookup_parser.add_argument(
+        "-R", "--return-column", type=int, action="append",
+        help="a column of the table to return, may be repeated (default: "
+             "all)")
+    xlookup_parser.add_argument("--default", default="")
+    xlookup_parser.add_argument(
+        "-m", "--match-mode", type=int, default=0, choices=(-1, 0, 1))
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = _create_parser()
+    args = parser.parse_args(argv)
+    header, read = _read_csv(args.input, args.delimiter, args.header)
+
+    if args.function == "sort":
+        sort_index = None if args.sort_index is None else [args.sort_index]
+        sort_order = None if args.sort_order is None else [args.sort_order]
+        rows = sort_rows(read(), sort_index, sort_order, args.chunk_rows)
+    elif args.function == "unique":
+        rows = unique_rows(read, args.exactly_once)
+    else:
+        _table_header, read_table = _read_csv(
+            args.table, args.delimiter, args.header)
+        return_columns = None if args.return_column is None else [
+            j - 1 for j in args.return_column]
+        rows = lookup_rows(
+            read(), list(read_table()), args.column - 1,
+            args.search_column - 1, return_columns,
+            parse_cell(args.default), args.match_mode)
+
+    output = sys.stdout if args.output is None else open(
+        args.output, "w", newline="", encoding="utf-8")
+    try:
+        if header is not None:
+            csv.writer(output, delimiter=args.delimiter,
+                       lineterminator="\n").writerow(header)
+        write_rows(output, args.delimiter, rows)
+    except (ValueError, IndexError) as e:
+        parser.exit(2, "{}: error: {}\n".format(parser.prog, e))
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
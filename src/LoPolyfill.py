@@ -16,8 +16,15 @@
 #
 # IMPORTANT: The documentation of the provided functions and their parameters is
 # taken from the LibreOffice help pages ( Mozilla Public License v2.0).
-from pathlib import Path
-from typing import Any, List, cast, Dict
+#
+# This module is imported when LibreOffice starts: the engines and the
+# helpers are imported and created on the first call of a function (see
+# test_lopolyfill_startup).
+from __future__ import annotations
+
+import functools
+import threading
+from typing import TYPE_CHECKING, Any, List, cast, Callable, Optional
 
 # noinspection PyUnresolvedReferences
 import unohelper
@@ -30,52 +37,160 @@ from com.sun.star.i18n import XCollator
 # noinspection PyUnresolvedReferences
 from com.sun.star.lang import IllegalArgumentException
 # noinspection PyUnresolvedReferences
+from com.sun.star.task import XJob
+# noinspection PyUnresolvedReferences
 from com.sun.star.uno import XComponentContext
 
 import lo_helper
-from lopolyfill_funcs import (
-    LopFilter, LopRandarray, LopSequence, LopSort, LopUnique, LopXMatch,
-    LopArrayHandling, DataArray, DataRow)
+
+if TYPE_CHECKING:
+    from lopolyfill_cache import CacheRegistry, DocumentTracker, ResultCache
+    from lopolyfill_funcs import AppendState, DataArray, DataRow
+    from lopolyfill_index import BloomFilter, IndexStore, SortedIndex
+
+# below this number of values, a Bloom filter costs more than a search
+BLOOM_FILTER_MIN_COUNT = 1000
+# the functions whose ranges are prewarmed when a document is loaded
+PREWARM_FUNCTION_NAMES = ("XLOOKUP", "XMATCH", "SORTBY", "SORT")
+# the default maximal duration of the prewarm job, in seconds
+PREWARM_TIME_BUDGET = 10
+
+
+def memoized(func: Callable) -> Callable:
+    """
+    For pure functions: the result only depends on the arguments.
+    """
+    name = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(self, *args):
+        return self._result_cache.memoize(
+            name, args, lambda: func(self, *args))
+
+    return wrapper
+
+
+def memoized_with_doc(func: Callable) -> Callable:
+    """
+    For pure functions whose first argument is the document: the result
+    depends on the document collator and the search criteria.
+    """
+    name = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(self, oDoc, *args):
+        uid = self._documents.track(oDoc)
+        context = (uid, self._get_whole_cell())
+        return self._result_cache.memoize(
+            name, (context,) + args, lambda: func(self, oDoc, *args), uid)
+
+    return wrapper
 
 
 class LoPolyfillImpl(unohelper.Base, XLoPolyfill):
     def __init__(self, ctxt: XComponentContext):
         self.ctxt = ctxt
-        self._collator_by_doc_uid = cast(Dict[str, XCollator], {})
         self._whole_cell = cast(bool, None)
+        self._calculate_access = None
+        self._whole_cell_lock = threading.Lock()
+
+    # the caches are created on the first call of a function
+    @functools.cached_property
+    def _caches(self) -> CacheRegistry:
+        # IF_DEBUG
+        _configure_debug_log()
+        # ENDIF_DEBUG
+        from lopolyfill_cache import CacheRegistry
+        # all the caches share the budget of the registry
+        return CacheRegistry()
+
+    @functools.cached_property
+    def _collators(self) -> ResultCache:
+        return self._create_cache("collators")
+
+    @functools.cached_property
+    def _result_cache(self) -> ResultCache:
+        return self._create_cache("results")
+
+    @functools.cached_property
+    def _append_states(self) -> ResultCache:
+        return self._create_cache("append_states")
+
+    @functools.cached_property
+    def _bloom_filters(self) -> ResultCache:
+        return self._create_cache("bloom_filters")
+
+    @functools.cached_property
+    def _sorted_indexes(self) -> ResultCache:
+        return self._create_cache("sorted_indexes")
+
+    @functools.cached_property
+    def _index_store(self) -> Optional[IndexStore]:
+        from lopolyfill_index import INDEX_DIR, IndexStore
+        return None if INDEX_DIR is None else IndexStore(INDEX_DIR)
+
+    @functools.cached_property
+    def _documents(self) -> DocumentTracker:
+        from lopolyfill_cache import DocumentTracker
+        # the entries of a document are removed when it is closed or when
+        # its locale (hence its collator) changed since the previous call
+        return DocumentTracker(
+            self._caches.clear_owner, lo_helper.DocumentListener,
+            lo_helper.get_locale_name)
+
+    def _create_cache(self, name: str) -> ResultCache:
+        from lopolyfill_cache import ResultCache
+        return ResultCache(self._caches, name)
 
     # FILTER https://help.libreoffice.org/master/en-US/text/scalc/01/func_filter.html
+    @memoized
     def lopFilter(
             self, inRange: DataArray,
             criteria: DataArray, defaultValue: Any
     ) -> DataArray:
+        from lopolyfill_funcs import LopFilter
         return LopFilter(IllegalArgumentException).execute(
             inRange, criteria, defaultValue)
 
     # RANDARRAY https://help.libreoffice.org/master/en-US/text/scalc/01/func_randarray.html
+    # Not memoized: each call must return new random values
     def lopRandarray(self, rows: Any, columns: Any, minValue: Any,
                      maxValue: Any, integers: Any
                      ) -> DataArray:
+        from lopolyfill_funcs import LopRandarray
         return LopRandarray(IllegalArgumentException).execute(
             rows, columns, minValue, maxValue, integers)
 
     # SEQUENCE https://help.libreoffice.org/25.8/en-US/text/scalc/01/func_sequence.html
+    @memoized
     def lopSequence(
             self, rows: int, columns: int, start: Any, step: Any
     ) -> DataArray:
+        from lopolyfill_funcs import LopSequence
         return LopSequence(IllegalArgumentException).execute(
             rows, columns, start, step)
 
+    @memoized_with_doc
     def lopSort(
             self,
             oDoc: XPropertySet,
             inRange: DataArray,
             sortIndex: Any, sortOrder: Any, byCol: Any
     ) -> DataArray:
+        from lopolyfill_funcs import LopSort
         oCollator = self._get_collator_from_doc(oDoc)
-        return LopSort(oCollator, IllegalArgumentException).sort(
-            inRange, sortIndex, sortOrder, byCol)
-
+        lop_sort = LopSort(oCollator, IllegalArgumentException)
+        if byCol:
+            return lop_sort.sort(inRange, sortIndex, sortOrder, byCol)
+
+        uid = self._documents.track(oDoc)
+        key = ("lopSort", uid, self._get_whole_cell(),
+               sortIndex, sortOrder, inRange[0])
+        return self._with_append_state(
+            key, lambda state: lop_sort.sort_appended(
+                state, inRange, sortIndex, sortOrder), uid)
+
+    @memoized_with_doc
     def lopSortBy(
             self,
             oDoc: XPropertySet,
@@ -96,6 +211,7 @@ class LoPolyfillImpl(unohelper.Base, XLoPolyfill):
             sortByRange14: Any, sortOrder14: Any,
             sortByRange15: Any, sortOrder15: Any,
     ) -> DataArray:
+        from lopolyfill_funcs import LopSort
         oCollator = self._get_collator_from_doc(oDoc)
         return LopSort(oCollator, IllegalArgumentException).sort_by(
             inRange,
@@ -109,12 +225,21 @@ class LoPolyfillImpl(unohelper.Base, XLoPolyfill):
             sortByRange15, sortOrder15
         )
 
+    @memoized
     def lopUnique(
             self, inRange: DataArray, byCol: Any, uniqueness: Any
     ) -> DataArray:
-        return LopUnique(IllegalArgumentException).execute(
-            inRange, byCol, uniqueness)
+        from lopolyfill_funcs import LopUnique
+        lop_unique = LopUnique(IllegalArgumentException)
+        if byCol:
+            return lop_unique.execute(inRange, byCol, uniqueness)
+
+        key = ("lopUnique", bool(uniqueness), inRange[0])
+        return self._with_append_state(
+            key, lambda state: lop_unique.execute_appended(
+                state, inRange, uniqueness))
 
+    @memoized_with_doc
     def lopXLookup(
             self,
             oDoc: XPropertySet,
@@ -125,15 +250,22 @@ class LoPolyfillImpl(unohelper.Base, XLoPolyfill):
             matchMode: Any,
             searchMode: Any
     ) -> DataArray:
+        from lopolyfill_funcs import LopXMatch
         oCollator = self._get_collator_from_doc(oDoc)
         whole_cell = self._get_whole_cell()
+        bloom_filter = self._get_bloom_filter(
+            searchRange, matchMode, searchMode)
+        sorted_index = self._get_sorted_index(
+            oDoc, searchRange, matchMode, searchMode)
         return LopXMatch(
-            oCollator, IllegalArgumentException, whole_cell
+            oCollator, IllegalArgumentException, whole_cell, bloom_filter,
+            sorted_index
         ).lookup(
             criterion, searchRange, resultRange, defaultValue, matchMode,
             searchMode
         )
 
+    @memoized_with_doc
     def lopXMatch(
             self,
             oDoc: XPropertySet,
@@ -142,14 +274,21 @@ class LoPolyfillImpl(unohelper.Base, XLoPolyfill):
             matchMode: Any,
             searchMode: Any
     ):
+        from lopolyfill_funcs import LopXMatch
         oCollator = self._get_collator_from_doc(oDoc)
         whole_cell = self._get_whole_cell()
+        bloom_filter = self._get_bloom_filter(
+            searchRange, matchMode, searchMode)
+        sorted_index = self._get_sorted_index(
+            oDoc, searchRange, matchMode, searchMode)
         return LopXMatch(
-            oCollator, IllegalArgumentException, whole_cell
+            oCollator, IllegalArgumentException, whole_cell, bloom_filter,
+            sorted_index
         ).match(
             criterion, searchRange, matchMode, searchMode
         )
 
+    @memoized
     def lopChooseCols(
             self, array: DataArray, column1: int,
             column2: Any, column3: Any, column4: Any, column5: Any,
@@ -161,6 +300,7 @@ class LoPolyfillImpl(unohelper.Base, XLoPolyfill):
             column26: Any, column27: Any, column28: Any, column29: Any,
             column30: Any,
     ) -> List[List[Any]]:
+        from lopolyfill_funcs import LopArrayHandling
         return LopArrayHandling(IllegalArgumentException).choose_cols(
             array, column1,
             column2, column3, column4, column5,
@@ -172,6 +312,7 @@ class LoPolyfillImpl(unohelper.Base, XLoPolyfill):
             column26, column27, column28, column29,
             column30)
 
+    @memoized
     def lopChooseRows(
             self, array: DataArray, row1: int,
             row2: Any, row3: Any, row4: Any, row5: Any,
@@ -183,6 +324,7 @@ class LoPolyfillImpl(unohelper.Base, XLoPolyfill):
             row26: Any, row27: Any, row28: Any, row29: Any,
             row30: Any,
     ) -> List[List[Any]]:
+        from lopolyfill_funcs import LopArrayHandling
         return LopArrayHandling(IllegalArgumentException).choose_rows(
             array, row1,
             row2, row3, row4, row5,
@@ -194,27 +336,34 @@ class LoPolyfillImpl(unohelper.Base, XLoPolyfill):
             row26, row27, row28, row29,
             row30)
 
+    @memoized
     def lopDrop(
             self, array: DataArray, rows: Any,
             columns: Any,
     ) -> List[DataRow]:
+        from lopolyfill_funcs import LopArrayHandling
         return LopArrayHandling(IllegalArgumentException).drop(
             array, rows, columns)
 
+    @memoized
     def lopTake(
             self, array: DataArray, rows: Any,
             columns: Any,
     ) -> List[DataRow]:
+        from lopolyfill_funcs import LopArrayHandling
         return LopArrayHandling(IllegalArgumentException).take(
             array, rows, columns)
 
+    @memoized
     def lopExpand(
             self, array: DataArray, rows: Any,
             columns: Any, pad_with: Any
     ) -> List[DataRow]:
+        from lopolyfill_funcs import LopArrayHandling
         return LopArrayHandling(IllegalArgumentException).expand(
             array, rows, columns, pad_with)
 
+    @memoized
     def lopHStack(
             self, array: DataArray,
             array1: Any, array2: Any, array3: Any, array4: Any,
@@ -226,6 +375,7 @@ class LoPolyfillImpl(unohelper.Base, XLoPolyfill):
             array25: Any, array26: Any, array27: Any, array28: Any,
             array29: Any, array30: Any,
     ) -> List[List[Any]]:
+        from lopolyfill_funcs import LopArrayHandling
         return LopArrayHandling(IllegalArgumentException).hstack(
             array, array1, array2, array3, array4, array5, array6, array7,
             array8, array9, array10, array11, array12, array13, array14,
@@ -234,6 +384,7 @@ class LoPolyfillImpl(unohelper.Base, XLoPolyfill):
             array29, array30,
         )
 
+    @memoized
     def lopVStack(
             self, array: DataArray,
             array1: Any, array2: Any, array3: Any, array4: Any,
@@ -245,6 +396,7 @@ class LoPolyfillImpl(unohelper.Base, XLoPolyfill):
             array25: Any, array26: Any, array27: Any, array28: Any,
             array29: Any, array30: Any,
     ) -> List[DataRow]:
+        from lopolyfill_funcs import LopArrayHandling
         return LopArrayHandling(IllegalArgumentException).vstack(
             array, array1, array2, array3, array4, array5, array6, array7,
             array8, array9, array10, array11, array12, array13, array14,
@@ -253,67 +405,351 @@ class LoPolyfillImpl(unohelper.Base, XLoPolyfill):
             array29, array30,
         )
 
+    @memoized
     def lopToCol(
             self, array: DataArray, ignore: Any,
             by_column: Any
     ) -> List[DataRow]:
+        from lopolyfill_funcs import LopArrayHandling
         return LopArrayHandling(IllegalArgumentException).to_col(
             array, ignore, by_column)
 
+    @memoized
     def lopToRow(
             self, array: DataArray, ignore: Any,
             by_column: Any
     ) -> List[List[Any]]:
+        from lopolyfill_funcs import LopArrayHandling
         return LopArrayHandling(IllegalArgumentException).to_row(
             array, ignore, by_column)
 
+    @memoized
     def lopWrapCols(
             self, in_range: DataArray, wrap_count: int,
             pad_with: Any
     ) -> List[List[Any]]:
+        from lopolyfill_funcs import LopArrayHandling
         return LopArrayHandling(IllegalArgumentException).wrap_cols(
             in_range, wrap_count, pad_with)
 
+    @memoized
     def lopWrapRows(
             self, in_range: DataArray, wrap_count: int,
             pad_with: Any
     ) -> List[DataRow]:
+        from lopolyfill_funcs import LopArrayHandling
         return LopArrayHandling(IllegalArgumentException).wrap_rows(
             in_range, wrap_count, pad_with)
 
+    @memoized
+    def lopCumulate(
+            self, inRange: DataArray, function: Any
+    ) -> List[Any]:
+        from lopolyfill_funcs import LopRunning
+        return LopRunning(IllegalArgumentException).cumulate(
+            inRange, function)
+
+    @memoized
+    def lopMoving(
+            self, inRange: DataArray, window: int, function: Any
+    ) -> List[Any]:
+        from lopolyfill_funcs import LopRunning
+        return LopRunning(IllegalArgumentException).moving(
+            inRange, window, function)
+
+    @memoized_with_doc
+    def lopRank(
+            self,
+            oDoc: XPropertySet,
+            inRange: DataArray, order: Any, method: Any
+    ) -> List[Any]:
+        from lopolyfill_funcs import LopRank
+        oCollator = self._get_collator_from_doc(oDoc)
+        return LopRank(oCollator, IllegalArgumentException).rank(
+            inRange, order, method)
+
+    @memoized
+    def lopUniqueBy(
+            self, inRange: DataArray, keys: Any, byCol: Any, uniqueness: Any,
+            occurrence: Any
+    ) -> List[Any]:
+        from lopolyfill_funcs import LopUnique
+        return LopUnique(IllegalArgumentException).execute_by_keys(
+            inRange, keys, byCol, uniqueness, occurrence)
+
+    @memoized_with_doc
+    def lopQuery(
+            self,
+            oDoc: XPropertySet,
+            inRange: DataArray, include: Any, sortIndex: Any,
+            sortOrder: Any, distinct: Any, limit: Any
+    ) -> List[Any]:
+        from lopolyfill_funcs import LopQuery
+        oCollator = self._get_collator_from_doc(oDoc)
+        return LopQuery(oCollator, IllegalArgumentException).execute(
+            inRange, include, sortIndex, sortOrder, distinct, limit)
+
     def lopUpgrade(
             self,
             oDoc: XPropertySet
     ) -> Any:
         return lo_helper.upgrade(self.ctxt, oDoc)
 
+    def prewarm(self, oDoc: XPropertySet, time_budget: float) -> int:
+        """
+        Build, before the first recalculation, the collator of the document,
+        the Bloom filters and the sorted indexes (the collation keys of the
+        values) of the XLOOKUP/XMATCH search ranges and the results of the
+        SORT/SORTBY calls whose arguments are ranges and numbers.
+
+        :return: the number of prewarmed calls
+        """
+        import time
+        from lopolyfill_formula import find_calls
+
+        deadline = time.perf_counter() + time_budget
+        self._get_collator_from_doc(oDoc)
+        oController = oDoc.CurrentController  # None if loaded hidden
+        oStatusIndicator = None if oController is None \
+            else oController.StatusIndicator
+        if oStatusIndicator is not None:
+            oStatusIndicator.start("LoPolyfill", 100)
+        count = 0
+        try:
+            formula_ranges = lo_helper.iter_formula_ranges(
+                oDoc, oStatusIndicator)
+            for _i, _count, oSheet, oCellRange in formula_ranges:
+                formula = oCellRange.getCellByPosition(0, 0).Formula
+                for name, args in find_calls(
+                        formula, lo_helper.LOP_PREFIX, PREWARM_FUNCTION_NAMES):
+                    if time.perf_counter() > deadline:
+                        return count
+                    if self._prewarm_call(oDoc, oSheet, name, args):
+                        count += 1
+        finally:
+            if oStatusIndicator is not None:
+                oStatusIndicator.end()
+        return count
+
+    def _prewarm_call(
+            self, oDoc: XPropertySet, oSheet: Any, name: str, args: List[str]
+    ) -> bool:
+        from lopolyfill_formula import parse_number
+
+        if name in ("XLOOKUP", "XMATCH"):
+            if len(args) < 2:
+                return False
+            searchRange = lo_helper.get_range_data(oDoc, oSheet, args[1])
+            if not searchRange:
+                return False
+            # XLOOKUP has a result range and a default value before the modes
+            modeArgs = args[4:6] if name == "XLOOKUP" else args[2:4]
+            try:
+                modes = [parse_number(arg) for arg in modeArgs]
+            except ValueError:  # not a number
+                return False
+            matchMode, searchMode = modes + [None] * (2 - len(modes))
+            self._get_bloom_filter(searchRange, matchMode, searchMode)
+            self._get_sorted_index(oDoc, searchRange, matchMode, searchMode)
+            return True
+
+        inRange = lo_helper.get_range_data(oDoc, oSheet, args[0]) \
+            if args else None
+        if not inRange:
+            return False
+        try:
+            if name == "SORT":
+                params = [parse_number(arg) for arg in args[1:4]]
+                params += [None] * (3 - len(params))
+                self.lopSort(oDoc, inRange, *params)
+            else:  # SORTBY: range, then (sort by range, order) pairs
+                params = [
+                    lo_helper.get_range_data(oDoc, oSheet, arg) if i % 2 == 0
+                    else parse_number(arg)
+                    for i, arg in enumerate(args[1:31])
+                ]
+                if not all(params[0::2]):
+                    return False
+                params += [None] * (30 - len(params))
+                self.lopSortBy(oDoc, inRange, *params)
+        except ValueError:  # not a number
+            return False
+        except IllegalArgumentException:
+            return False
+        return True
+
+    def _with_append_state(
+            self, key: Any,
+            func: Callable[[Optional[AppendState]], AppendState],
+            uid: Any = None) -> Any:
+        """
+        Call func with the state of the previous call that had the same key
+        (the same parameters and first row), and keep the new state.
+        """
+        import time
+
+        try:
+            state = self._append_states.pop(key)
+        except TypeError:  # unhashable key
+            return func(None).result
+
+        start = time.perf_counter()
+        state = func(state)
+        self._append_states.put(
+            key, state, time.perf_counter() - start, uid)
+        return state.result
+
+    def _get_bloom_filter(
+            self, searchRange: DataArray, matchMode: Any, searchMode: Any
+    ) -> Optional[BloomFilter]:
+        """
+        The filter of the search range, for exact linear searches in large
+        ranges. The filters are cached: only the first search builds it.
+        """
+        import itertools
+        from lopolyfill_funcs import XMatchMode, XSearchMode
+        from lopolyfill_index import create_bloom_filter
+
+        if matchMode not in (None, XMatchMode.EXACT):
+            return None
+        if searchMode not in (None, XSearchMode.FIRST, XSearchMode.LAST):
+            return None
+        if len(searchRange) * len(searchRange[0]) < BLOOM_FILTER_MIN_COUNT:
+            return None
+
+        return self._bloom_filters.memoize(
+            "bloom", (searchRange,), lambda: create_bloom_filter(
+                itertools.chain.from_iterable(searchRange)))
+
+    def _get_sorted_index(
+            self, oDoc: XPropertySet, searchRange: DataArray, matchMode: Any,
+            searchMode: Any
+    ) -> Optional[SortedIndex]:
+        """
+        The sorted index of a large search range, for exact or approximate
+        linear searches. The index is loaded from the index store if the
+        values and the locale did not change, else built and stored.
+        """
+        from lopolyfill_funcs import XMatchMode, XSearchMode, create_sort_keys
+        from lopolyfill_index import INDEX_MIN_COUNT, create_sorted_index
+
+        if self._index_store is None:
+            return None
+        if matchMode not in (
+                None, XMatchMode.EXACT, XMatchMode.SMALLER, XMatchMode.LARGER):
+            return None
+        if searchMode not in (None, XSearchMode.FIRST, XSearchMode.LAST):
+            return None
+        if len(searchRange[0]) != 1 and len(searchRange) != 1:
+            return None
+        if len(searchRange) * len(searchRange[0]) < INDEX_MIN_COUNT:
+            return None
+
+        uid = self._documents.track(oDoc)
+        oCollator = self._get_collator_from_doc(oDoc)
+
+        def get_or_create() -> SortedIndex:
+            if len(searchRange[0]) == 1:
+                values = [row[0] for row in searchRange]
+            else:
+                values = searchRange[0]
+            return self._index_store.get_or_create(
+                values, lo_helper.get_locale_name(oDoc),
+                lambda: create_sorted_index(
+                    create_sort_keys(oCollator, values)))
+
+        return self._sorted_indexes.memoize(
+            "index", (uid, searchRange), get_or_create, uid)
+
     def _get_collator_from_doc(
             self, oDoc: XPropertySet, ignore_case: bool = True) -> XCollator:
-        try:
-            return self._collator_by_doc_uid[oDoc.RuntimeUID]
-        except KeyError:
-            oCollator = lo_helper.get_collator_from_doc(
-                self.ctxt, oDoc, ignore_case)
-            self._collator_by_doc_uid[oDoc.RuntimeUID] = oCollator
+        from lopolyfill_collation import create_checked_collator
 
-        return oCollator
+        uid = self._documents.track(oDoc)
+        return self._collators.memoize(
+            "collator", (uid,),
+            lambda: create_checked_collator(lo_helper.get_collator_from_doc(
+                self.ctxt, oDoc, ignore_case)), uid)
 
     def _get_whole_cell(self) -> bool:
-        if self._whole_cell is None:
-            self._whole_cell = lo_helper.get_whole_cell(self.ctxt)
+        whole_cell = self._whole_cell
+        if whole_cell is None:
+            with self._whole_cell_lock:
+                if self._calculate_access is None:
+                    self._calculate_access = (
+                        lo_helper.add_configuration_listener(
+                            self.ctxt, lo_helper.CALCULATE_OTHER_NODE,
+                            self._reset_whole_cell))
+                whole_cell = lo_helper.get_whole_cell(self.ctxt)
+                self._whole_cell = whole_cell
+
+        return whole_cell
+
+    def _reset_whole_cell(self):
+        # the memoized results are keyed on the value of whole_cell: they
+        # stay valid
+        with self._whole_cell_lock:
+            self._whole_cell = None
+
+
+class LoPolyfillPrewarmJob(unohelper.Base, XJob):
+    """
+    Executed on document load (see jobs.xcu) if the Enabled argument of the
+    job is true.
+    """
 
-        return self._whole_cell
+    def __init__(self, ctxt: XComponentContext):
+        self.ctxt = ctxt
 
+    def execute(self, args: Any) -> Any:
+        named_args = lo_helper.named_values_to_dict(args)
+        job_config = lo_helper.named_values_to_dict(
+            named_args.get("JobConfig"))
+        if not job_config.get("Enabled", False):
+            return None
+
+        environment = lo_helper.named_values_to_dict(
+            named_args.get("Environment"))
+        oDoc = environment.get("Model")
+        if oDoc is None or not oDoc.supportsService(
+                "com.sun.star.sheet.SpreadsheetDocument"):
+            return None
+
+        time_budget = job_config.get("TimeBudget", PREWARM_TIME_BUDGET)
+        try:
+            get_shared_instance(self.ctxt).prewarm(oDoc, time_budget)
+        except Exception:
+            import logging
+            logging.getLogger(__name__).exception("Prewarm")
+        return None
 
-def create_instance(ctxt):
-    # IF_DEBUG
+
+# the add-in and the job share one instance, hence the caches
+_shared_instance = None
+_shared_instance_lock = threading.Lock()
+
+
+def get_shared_instance(ctxt: XComponentContext) -> LoPolyfillImpl:
+    global _shared_instance
+    with _shared_instance_lock:
+        if _shared_instance is None:
+            _shared_instance = LoPolyfillImpl(ctxt)
+        return _shared_instance
+
+
+# IF_DEBUG
+def _configure_debug_log():
     import logging
+    from pathlib import Path
     logging.basicConfig(filename=str(Path.home() / "lopolyfill.log"),
                         encoding='utf-8',
                         level=logging.DEBUG, filemode="w")
-    logging.getLogger(__name__).debug("Instance creation")
-    # ENDIF_DEBUG
-    ret = LoPolyfillImpl(ctxt)
+    logging.getLogger(__name__).debug("First call")
+# ENDIF_DEBUG
+
+
+def create_instance(ctxt):
+    ret = get_shared_instance(ctxt)
     return ret
 
 
@@ -322,6 +758,10 @@ g_ImplementationHelper.addImplementation(
     create_instance, "com.github.jferard.lopolyfill.LoPolyfillImpl",
     ("com.sun.star.sheet.AddIn",),
 )
+g_ImplementationHelper.addImplementation(
+    LoPolyfillPrewarmJob, "com.github.jferard.lopolyfill.PrewarmJob",
+    ("com.sun.star.task.Job",),
+)
 
 
 class SimpleCollator:
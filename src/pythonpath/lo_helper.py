@@ -1,14 +1,25 @@
-import re
-from typing import Any
+# imported with LoPolyfill when LibreOffice starts: the other modules are
+# imported by the functions
+from __future__ import annotations
+
+from typing import (
+    TYPE_CHECKING, Any, Callable, Dict, Iterator, Optional, Tuple)
 
 # noinspection PyUnresolvedReferences
 import uno
 # noinspection PyUnresolvedReferences
+import unohelper
+# noinspection PyUnresolvedReferences
 from com.sun.star.beans import XPropertySet
 # noinspection PyUnresolvedReferences
 from com.sun.star.i18n import XCollator
 # noinspection PyUnresolvedReferences
 from com.sun.star.uno import XComponentContext
+# noinspection PyUnresolvedReferences
+from com.sun.star.util import XChangesListener, XCloseListener
+
+if TYPE_CHECKING:
+    from lopolyfill_funcs import DataArray
 
 
 class MessageBoxType:
@@ -28,6 +39,46 @@ class MessageBoxResults:
         OK, CANCEL, YES)
 
 
+CALCULATE_OTHER_NODE = "org.openoffice.Office.Calc/Calculate/Other"
+
+
+class DocumentListener(unohelper.Base, XCloseListener):
+    """
+    Call on_close when the document is closed or disposed.
+    """
+
+    def __init__(self, on_close: Callable[[], None]):
+        self._on_close = on_close
+
+    def queryClosing(self, oEvent: Any, getsOwnership: bool):
+        pass
+
+    def notifyClosing(self, oEvent: Any):
+        self._on_close()
+
+    def disposing(self, oEvent: Any):
+        self._on_close()
+
+
+class ConfigurationListener(unohelper.Base, XChangesListener):
+    """
+    Call the callback when a value of the configuration node changes.
+    """
+
+    def __init__(self, callback: Callable[[], None]):
+        self._callback = callback
+
+    def changesOccurred(self, oEvent: Any):
+        self._callback()
+
+    def disposing(self, oEvent: Any):
+        pass
+
+
+def named_values_to_dict(named_values: Any) -> Dict[str, Any]:
+    return {nv.Name: nv.Value for nv in named_values or ()}
+
+
 def get_collator_from_doc(
         ctxt: XComponentContext, oDoc: XPropertySet, ignore_case: bool = True
 ) -> XCollator:
@@ -40,12 +91,28 @@ def get_collator_from_doc(
     return oCollator
 
 
+def get_locale_name(oDoc: XPropertySet) -> str:
+    oLocale = oDoc.CharLocale
+    return "-".join([oLocale.Language, oLocale.Country, oLocale.Variant])
+
+
 def get_whole_cell(ctxt: XComponentContext) -> bool:
-    node_path = "org.openoffice.Office.Calc/Calculate/Other"
-    oAccess = _access_node(ctxt, node_path)
+    oAccess = _access_node(ctxt, CALCULATE_OTHER_NODE)
     return oAccess.SearchCriteria
 
 
+def add_configuration_listener(
+        ctxt: XComponentContext, node_path: str,
+        callback: Callable[[], None]) -> Any:
+    """
+    Return the access to the node: the listener is removed when the
+    access is released.
+    """
+    oAccess = _access_node(ctxt, node_path)
+    oAccess.addChangesListener(ConfigurationListener(callback))
+    return oAccess
+
+
 def _access_node(ctxt: XComponentContext, node_path: str) -> Any:
     pv = uno.createUnoStruct("com.sun.star.beans.PropertyValue")
     pv.Name = "nodepath"
@@ -69,8 +136,57 @@ NAMES_BY_VERSION = {
 }
 
 
+# the prefix of the add-in functions in the API formulas
+LOP_PREFIX = "COM.GITHUB.JFERARD.LOPOLYFILL.LOPOLYFILLIMPL.LOP"
+
+
+def iter_formula_ranges(
+        oDoc, oStatusIndicator: Any = None
+) -> Iterator[Tuple[int, int, Any, Any]]:
+    """
+    Yield (sheet index, sheet count, sheet, range) for each range of formula
+    cells of the document. The status indicator, if any, shows the sheet.
+    """
+    import logging
+    logger = logging.getLogger(__name__)
+
+    oSheets = oDoc.Sheets
+    sheet_count = oSheets.Count
+    for i in range(sheet_count):
+        oSheet = oSheets.getByIndex(i)
+        logger.debug("Sheet %s", oSheet.Name)
+        if oStatusIndicator is not None:
+            oStatusIndicator.Text = oSheet.Name
+            oStatusIndicator.Value = (i * 100) // sheet_count
+
+        oCellRanges = oSheet.queryContentCells(16)  # CellFlags.FORMULA
+        for j in range(oCellRanges.Count):
+            yield i, sheet_count, oSheet, oCellRanges.getByIndex(j)
+
+
+def get_range_data(oDoc, oSheet, reference: str) -> Optional[DataArray]:
+    """
+    The values of a range reference of a formula of oSheet, or None if the
+    reference is not a plain range reference.
+    """
+    from lopolyfill_formula import parse_range_reference
+
+    parsed = parse_range_reference(reference)
+    if parsed is None:
+        return None
+
+    sheet_name, address = parsed
+    try:
+        if sheet_name is not None:
+            oSheet = oDoc.Sheets.getByName(sheet_name)
+        return oSheet.getCellRangeByName(address).DataArray
+    except Exception:  # unknown sheet, invalid address
+        return None
+
+
 def upgrade(ctxt: XComponentContext, oDoc) -> Any:
     import logging
+    import re
     logger = logging.getLogger(__name__)
     logger.debug("Upgrade")
 
@@ -112,37 +228,27 @@ def upgrade(ctxt: XComponentContext, oDoc) -> Any:
             return "No upgrade"
 
         regex = re.compile(
-            r"COM\.GITHUB\.JFERARD\.LOPOLYFILL\.LOPOLYFILLIMPL\.LOP({})".format(
-                "|".join(all_names)))
-
-        oSheets = oDoc.Sheets
+            r"{}({})".format(re.escape(LOP_PREFIX), "|".join(all_names)))
 
         def func(m: re.Match) -> str:
             return m.group(1)
 
         count = 0
-        for i in range(oSheets.Count):
-            oSheet = oSheets.getByIndex(i)
-            logger.debug("Upgrade sheet %s", oSheet.Name)
-            oStatusIndicator.Text = oSheet.Name
-            oStatusIndicator.Value = (i * 100) // oSheets.Count
-
-            oCellRanges = oSheet.queryContentCells(16)
-            for j in range(oCellRanges.Count):
-                oCellRange = oCellRanges.getByIndex(j)
-                oCell = oCellRange.getCellByPosition(0, 0)
-                if oCellRange.ArrayFormula != "":
-                    clean_formula = oCell.Formula[2:-1]
-                    new_clean_formula = regex.sub(func, clean_formula)
-                    if new_clean_formula != clean_formula:
-                        oCellRange.ArrayFormula = new_clean_formula
-                        count += 1
-                else:
-                    formula = oCell.Formula
-                    new_formula = regex.sub(func, formula)
-                    if new_formula != formula:
-                        oCell.Formula = new_formula
-                        count += 1
+        for _i, _count, _oSheet, oCellRange in iter_formula_ranges(
+                oDoc, oStatusIndicator):
+            oCell = oCellRange.getCellByPosition(0, 0)
+            if oCellRange.ArrayFormula != "":
+                clean_formula = oCell.Formula[2:-1]
+                new_clean_formula = regex.sub(func, clean_formula)
+                if new_clean_formula != clean_formula:
+                    oCellRange.ArrayFormula = new_clean_formula
+                    count += 1
+            else:
+                formula = oCell.Formula
+                new_formula = regex.sub(func, formula)
+                if new_formula != formula:
+                    oCell.Formula = new_formula
+                    count += 1
 
         msg = "Upgraded {} formula(s)".format(count)
         oMessageBox = oToolkit.createMessageBox(
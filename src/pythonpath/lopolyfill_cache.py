@@ -0,0 +1,487 @@
+# LoPolyfill - Python - A set of 24.8 functions made availaible for 7.2
+# Copyright (C) 2025 Julien Férard.
+#
+# LoPolyfill is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# LoPolyfill is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+Caches shared by the calls of the add-in functions.
+
+A DataArray is not hashed as a whole to be used as a key: its fingerprint
+(shape, sampled rows and the types of their cells) is hashed instead, and
+the rows (or their digests) are compared only when the fingerprints are
+equal.
+"""
+import collections
+import hashlib
+import heapq
+import itertools
+import operator
+import pickle
+import sys
+import threading
+import time
+# List and Set are used in type comments only
+from typing import (  # noqa: F401
+    Any, Callable, Dict, FrozenSet, Hashable, List, NamedTuple, Optional,
+    Sequence, Set, Tuple)
+
+from lopolyfill_merge import int_from_env
+
+# number of items used to estimate the size of a sequence, and number of
+# rows sampled by a fingerprint
+_SAMPLE_SIZE = 16
+
+# number of rows pickled at once by a digest, and size of a digest in bytes
+_DIGEST_CHUNK = 1024
+_DIGEST_SIZE = 20
+
+# the maximum size of all the cached entries, in bytes
+CACHE_MEMORY = int_from_env("LOPOLYFILL_CACHE_MEMORY") or 128 * 1024 * 1024
+
+
+def estimate_size(value: Any) -> int:
+    """
+    An estimate of the memory used by a value, in bytes. Sequences of
+    sequences (a DataArray) are estimated from a sample of their items.
+    """
+    size = sys.getsizeof(value)
+    if isinstance(value, (tuple, list)) and value:
+        sample = value[:_SAMPLE_SIZE]
+        sample_size = sum(estimate_size(item) for item in sample)
+        size += sample_size * len(value) // len(sample)
+    return size
+
+
+class Fingerprint(NamedTuple):
+    count: int
+    width: int
+    types: Tuple[FrozenSet[type], ...]
+    sample: Tuple[Tuple[Any, ...], ...]
+
+
+def fingerprint(
+        rows: Sequence[Sequence[Any]], count: Optional[int] = None
+) -> Fingerprint:
+    """
+    The fingerprint of the first count rows (default: all the rows). The
+    cost does not depend on the number of rows, and the fingerprint of a
+    prefix of a range is the fingerprint of that prefix alone.
+
+    The types are needed because 1 == 1.0 == True.
+    """
+    if count is None:
+        count = len(rows)
+    if count == 0:
+        return Fingerprint(0, 0, (), ())
+
+    step = max(1, count // _SAMPLE_SIZE)
+    indices = list(range(0, count, step))
+    if indices[-1] != count - 1:
+        indices.append(count - 1)
+    sample = tuple(tuple(rows[i]) for i in indices)
+    types = tuple(frozenset(map(type, column)) for column in zip(*sample))
+    return Fingerprint(count, len(rows[0]), types, sample)
+
+
+def digest(rows: Sequence[Sequence[Any]],
+           count: Optional[int] = None) -> bytes:
+    """
+    A BLAKE2b hash of the first count rows (default: all the rows), pickled
+    by chunks of _DIGEST_CHUNK rows: the range is not copied. The pickles of
+    different rows are different (1, 1.0 and True included), hence equal
+    digests mean equal rows, but for a collision of BLAKE2b.
+    """
+    if count is None:
+        count = len(rows)
+    h = hashlib.blake2b(digest_size=_DIGEST_SIZE)
+    for start in range(0, count, _DIGEST_CHUNK):
+        chunk = rows[start:min(start + _DIGEST_CHUNK, count)]
+        h.update(pickle.dumps(chunk, pickle.HIGHEST_PROTOCOL))
+    return h.digest()
+
+
+def prefix_matches(
+        rows: Sequence[Sequence[Any]], in_range: Sequence[Sequence[Any]],
+        strict: bool = True
+) -> bool:
+    """
+    True if in_range starts with rows. The fingerprints are compared first;
+    then, in strict mode, the rows, else the digests.
+    """
+    count = len(rows)
+    if len(in_range) < count:
+        return False
+    if fingerprint(in_range, count) != fingerprint(rows):
+        return False
+    if strict:
+        return not any(map(operator.ne, rows, in_range))
+    else:
+        return digest(in_range, count) == digest(rows)
+
+
+class RowsKey:
+    """
+    A DataArray as part of a dict key, hashed on its fingerprint. Two keys
+    are equal if their fingerprints are equal and their rows are equal (in
+    strict mode) or their digests are equal.
+
+    A key that is not strict keeps only the fingerprint and the digest, not
+    the rows: Calc passes new tuples on each call, and a cache entry must not
+    hold a copy of its arguments.
+    """
+    __slots__ = ("rows", "fingerprint", "_digest")
+
+    def __init__(self, rows: Sequence[Sequence[Any]], strict: bool = True):
+        self.fingerprint = fingerprint(rows)
+        if strict:
+            self.rows = rows  # type: Optional[Sequence[Sequence[Any]]]
+            self._digest = None  # type: Optional[bytes]
+        else:
+            self.rows = None
+            self._digest = digest(rows)
+
+    def get_digest(self) -> bytes:
+        if self._digest is None:
+            self._digest = digest(self.rows)
+        return self._digest
+
+    def __hash__(self) -> int:
+        return hash(self.fingerprint)
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, RowsKey):
+            return NotImplemented
+        if self.fingerprint != other.fingerprint:
+            return False
+        if self.rows is None or other.rows is None:
+            return self.get_digest() == other.get_digest()
+        if self.rows is other.rows:
+            return True
+        return not any(map(operator.ne, self.rows, other.rows))
+
+    def __sizeof__(self) -> int:
+        if self.rows is None:
+            return object.__sizeof__(self) + estimate_size(self.fingerprint)
+        return object.__sizeof__(self) + estimate_size(self.rows)
+
+
+def to_key(args: Tuple[Any, ...], strict: bool = True) -> Tuple[Any, ...]:
+    """
+    Replace the DataArrays of the arguments by RowsKeys.
+    """
+    return tuple(
+        RowsKey(arg, strict) if _is_data_array(arg) else arg for arg in args)
+
+
+def _is_data_array(value: Any) -> bool:
+    return (isinstance(value, tuple) and len(value) > 0
+            and isinstance(value[0], tuple))
+
+
+class CacheMetrics:
+    __slots__ = ("count", "size", "hits", "misses", "evictions",
+                 "evicted_bytes")
+
+    def __init__(self):
+        self.count = 0
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.evicted_bytes = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class _Entry:
+    __slots__ = ("value", "size", "cost", "owner", "priority", "tick")
+
+    def __init__(self, value: Any, size: int, cost: float, owner: Hashable):
+        self.value = value
+        self.size = size
+        self.cost = cost
+        self.owner = owner
+        self.priority = 0.0
+        self.tick = 0
+
+
+class CacheRegistry:
+    """
+    The entries of all the caches (the kinds), within one byte budget.
+
+    Eviction is GreedyDual-Size: the priority of an entry is the cost to
+    compute it divided by its size, plus the priority of the last evicted
+    entry when the entry was last used. Hence cheap and large entries are
+    evicted first, and entries that are not used age. With equal costs per
+    byte, this is a LRU.
+
+    The registry is thread safe. The values are computed by the callers,
+    outside of the lock: two threads may compute the same value, and the
+    last one is kept.
+    """
+
+    def __init__(self, max_bytes: int = CACHE_MEMORY):
+        self.max_bytes = max_bytes
+        self._size = 0
+        self._entries = {}  # type: Dict[Tuple[str, Hashable], _Entry]
+        self._keys_by_owner = collections.defaultdict(
+            set)  # type: Dict[Hashable, Set[Tuple[str, Hashable]]]
+        # (priority, tick, key): an item is outdated if the entry was used or
+        # removed since
+        self._heap = []  # type: List[Tuple[float, int, Tuple[str, Hashable]]]
+        self._inflation = 0.0
+        self._ticks = itertools.count()
+        self._metrics_by_kind = collections.defaultdict(
+            CacheMetrics)  # type: Dict[str, CacheMetrics]
+        self._lock = threading.RLock()
+
+    def get(self, kind: str, key: Hashable) -> Any:
+        """
+        Raise a KeyError if there is no entry, a TypeError if the key is
+        unhashable.
+        """
+        with self._lock:
+            metrics = self._metrics_by_kind[kind]
+            entry = self._entries.get((kind, key))
+            if entry is None:
+                metrics.misses += 1
+                raise KeyError(key)
+
+            metrics.hits += 1
+            self._touch((kind, key), entry)
+            return entry.value
+
+    def put(self, kind: str, key: Hashable, value: Any, cost: float = 0.0,
+            owner: Hashable = None):
+        """
+        :param cost: the time it took to compute the value, in seconds.
+        :param owner: the document (RuntimeUID) the entry depends on, if any.
+        """
+        size = estimate_size(key) + estimate_size(value)
+        with self._lock:
+            self.pop(kind, key)
+            if size > self.max_bytes:
+                return
+
+            entry = _Entry(value, size, cost, owner)
+            self._entries[(kind, key)] = entry
+            if owner is not None:
+                self._keys_by_owner[owner].add((kind, key))
+            self._touch((kind, key), entry)
+            self._size += size
+            metrics = self._metrics_by_kind[kind]
+            metrics.count += 1
+            metrics.size += size
+            while self._size > self.max_bytes:
+                self._evict()
+
+    def pop(self, kind: str, key: Hashable) -> Any:
+        """
+        Remove the entry and return its value, or None if there is no entry.
+        """
+        with self._lock:
+            entry = self._entries.pop((kind, key), None)
+            if entry is None:
+                return None
+
+            self._remove((kind, key), entry)
+            return entry.value
+
+    def clear(self, kind: Optional[str] = None):
+        with self._lock:
+            if kind is None:
+                full_keys = list(self._entries)
+            else:
+                full_keys = [
+                    full_key for full_key in self._entries
+                    if full_key[0] == kind
+                ]
+            for entry_kind, key in full_keys:
+                self.pop(entry_kind, key)
+
+    def clear_owner(self, owner: Hashable):
+        """
+        Remove all the entries of that owner (e.g. a closed document).
+        """
+        with self._lock:
+            for kind, key in list(self._keys_by_owner.get(owner, ())):
+                self.pop(kind, key)
+
+    def size(self, kind: Optional[str] = None) -> int:
+        if kind is None:
+            return self._size
+        return self.get_kind_metrics(kind).size
+
+    def count(self, kind: Optional[str] = None) -> int:
+        if kind is None:
+            return len(self._entries)
+        return self.get_kind_metrics(kind).count
+
+    def get_kind_metrics(self, kind: str) -> CacheMetrics:
+        with self._lock:
+            return self._metrics_by_kind[kind]
+
+    def get_metrics(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {
+                kind: metrics.as_dict()
+                for kind, metrics in self._metrics_by_kind.items()
+            }
+
+    def _touch(self, full_key: Tuple[str, Hashable], entry: _Entry):
+        entry.priority = self._inflation + entry.cost / max(1, entry.size)
+        entry.tick = next(self._ticks)
+        heapq.heappush(self._heap, (entry.priority, entry.tick, full_key))
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._heap = [
+                (e.priority, e.tick, k) for k, e in self._entries.items()]
+            heapq.heapify(self._heap)
+
+    def _evict(self):
+        while True:
+            _priority, tick, full_key = heapq.heappop(self._heap)
+            entry = self._entries.get(full_key)
+            if entry is not None and entry.tick == tick:
+                break
+
+        del self._entries[full_key]
+        self._remove(full_key, entry)
+        self._inflation = entry.priority
+        metrics = self._metrics_by_kind[full_key[0]]
+        metrics.evictions += 1
+        metrics.evicted_bytes += entry.size
+
+    def _remove(self, full_key: Tuple[str, Hashable], entry: _Entry):
+        if entry.owner is not None:
+            keys = self._keys_by_owner[entry.owner]
+            keys.discard(full_key)
+            if not keys:
+                del self._keys_by_owner[entry.owner]
+        self._size -= entry.size
+        metrics = self._metrics_by_kind[full_key[0]]
+        metrics.count -= 1
+        metrics.size -= entry.size
+
+
+class ResultCache:
+    """
+    A cache of the results of pure functions, one kind of a CacheRegistry.
+
+    The key is the function name and the arguments, the DataArrays being
+    replaced by RowsKeys that keep only the fingerprint and the digest of the
+    ranges: a hit is a dict hit, and the entries of large ranges are measured
+    without copies of the ranges. The digest covers every row, hence a range
+    that differs in any cell is a miss. The cost of an entry is the time it
+    took to compute.
+    """
+
+    def __init__(self, registry: CacheRegistry, kind: str):
+        self._registry = registry
+        self._kind = kind
+
+    def memoize(
+            self, name: str, args: Tuple[Any, ...], compute: Callable[[], Any],
+            owner: Hashable = None
+    ) -> Any:
+        key = (name, to_key(args, False))
+        try:
+            return self._registry.get(self._kind, key)
+        except TypeError:  # unhashable arguments
+            return compute()
+        except KeyError:
+            pass
+
+        start = time.perf_counter()
+        value = compute()
+        self.put(key, value, time.perf_counter() - start, owner)
+        return value
+
+    def put(self, key: Hashable, value: Any, cost: float = 0.0,
+            owner: Hashable = None):
+        self._registry.put(self._kind, key, value, cost, owner)
+
+    def pop(self, key: Hashable) -> Any:
+        """
+        Remove the entry and return its value, or None if there is no entry.
+        """
+        return self._registry.pop(self._kind, key)
+
+    def clear(self):
+        self._registry.clear(self._kind)
+
+    @property
+    def size(self) -> int:
+        return self._registry.size(self._kind)
+
+    @property
+    def hits(self) -> int:
+        return self._registry.get_kind_metrics(self._kind).hits
+
+    @property
+    def misses(self) -> int:
+        return self._registry.get_kind_metrics(self._kind).misses
+
+    def __len__(self) -> int:
+        return self._registry.count(self._kind)
+
+
+class DocumentTracker:
+    """
+    Call on_invalid(RuntimeUID) when a tracked document is closed, or when
+    its state (e.g. its locale) differs from the state of the previous call.
+    The listener_factory creates, from an on_close callback, a listener to
+    add to the document (see lo_helper.DocumentListener).
+
+    The state is read on each call: the spreadsheet documents do not notify
+    the changes of their properties.
+    """
+
+    def __init__(
+            self, on_invalid: Callable[[Hashable], None],
+            listener_factory: Callable[[Callable[[], None]], Any],
+            get_state: Callable[[Any], Hashable] = lambda oDoc: None):
+        self._on_invalid = on_invalid
+        self._listener_factory = listener_factory
+        self._get_state = get_state
+        self._state_by_uid = {}  # type: Dict[Hashable, Hashable]
+        self._lock = threading.Lock()
+
+    def track(self, oDoc: Any) -> Hashable:
+        """
+        Track the document and return its RuntimeUID.
+        """
+        # UNO calls: outside of the lock
+        uid = oDoc.RuntimeUID
+        state = self._get_state(oDoc)
+        with self._lock:
+            tracked = uid in self._state_by_uid
+            previous_state = self._state_by_uid.get(uid)
+            self._state_by_uid[uid] = state
+
+        if not tracked:
+            oDoc.addCloseListener(
+                self._listener_factory(lambda: self._closed(uid)))
+        elif previous_state != state:
+            self._on_invalid(uid)
+        return uid
+
+    def _closed(self, uid: Hashable):
+        with self._lock:
+            if uid not in self._state_by_uid:  # notifyClosing, then disposing
+                return
+            del self._state_by_uid[uid]
+        self._on_invalid(uid)
+
+    def __len__(self) -> int:
+        return len(self._state_by_uid)
@@ -0,0 +1,188 @@
+# LoPolyfill - Python - A set of 24.8 functions made availaible for 7.2
+# Copyright (C) 2025 Julien Férard.
+#
+# LoPolyfill is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# LoPolyfill is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+Compare strings in-process, without a call to the UNO collator for each
+comparison.
+
+The local collation key follows the root collation of ICU, case ignored:
+the primary key is the sequence of base characters (spaces < punctuation <
+symbols < digits < letters), the secondary key is the sequence of accents
+(acute < grave < circumflex...).
+The document collator may disagree (e.g. "å" is after "z" in Swedish, "ch"
+after "h" in Czech): the local keys are used only if they agree with the
+collator on a set of probe strings, and the agreement is checked again on a
+sample of the comparisons. On the first disagreement, the collator falls back
+to the UNO collator for good.
+"""
+import functools
+import itertools
+import logging
+import unicodedata
+from typing import Any, Callable, Optional, Sequence, Tuple
+
+from lopolyfill_merge import int_from_env
+
+# 0: the local collation is off
+LOCAL_COLLATION = int_from_env("LOPOLYFILL_LOCAL_COLLATION")
+# one comparison out of CHECK_INTERVAL is checked against the UNO collator
+CHECK_INTERVAL = 64
+
+# ASCII punctuation and symbols, in the order of the ICU root collation
+_ASCII_PUNCTUATION = "_-,;:!?.'\"()[]{}@*/\\&#%`^+<=>|~$"
+_RANK_BY_PUNCTUATION = {c: i for i, c in enumerate(_ASCII_PUNCTUATION)}
+_CLASS_BY_CATEGORY = {"Z": 0, "P": 1, "S": 2, "N": 3, "L": 4}
+_CLASS_SHIFT = 21  # above the last code point
+# accents, in the order of their secondary weights in ICU
+_ACCENTS = (
+    "\u0301\u0300\u0306\u0302\u030c\u030a\u0308\u030b\u0303\u0307"
+    "\u0338\u0327\u0328\u0304")
+_SECONDARY_BY_ACCENT = {c: chr(1 + i) for i, c in enumerate(_ACCENTS)}
+# letters that NFKD does not decompose: base letters, then an accent
+_EXPANSIONS = {
+    "æ": "a\u0338e", "œ": "o\u0338e", "ø": "o\u0338", "đ": "d\u0338",
+    "ł": "l\u0338", "ħ": "h\u0338", "ŧ": "t\u0338",
+}
+
+PROBE_STRINGS = [
+    "", " ", "a", "A", "b", "c", "C", "d", "e", "h", "i", "l", "m", "n",
+    "o", "s", "t", "u", "y", "z", "Z", "0", "1", "9", "10", "a b", "a-b",
+    "ab", "a_b", "a.b", "co-op", "coop", "co op",
+] + list(_ASCII_PUNCTUATION) + [
+    "à", "á", "â", "ä", "å", "æ", "ç", "é", "è", "ê", "ë", "î", "ï", "ñ",
+    "ô", "ö", "ø", "œ", "ß", "ss", "ü", "ù", "ÿ",
+    "ae", "af", "ch", "ci", "cs", "cz", "dz", "dzs", "ll", "lz", "ly",
+    "ny", "nz", "oe", "of", "sz", "th", "ua", "uz", "zs",
+    "resume", "Résumé", "résumé", "naive", "naïve", "peche", "pêche",
+    "péché", "pèche", "strasse", "Straße",
+]
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def collation_key(s: str) -> Tuple[Tuple[int, ...], Tuple[str, ...]]:
+    """
+    The local collation key of a string. Strings that have the same key
+    are equal.
+    """
+    primary = []
+    secondary = []
+    decomposed = unicodedata.normalize("NFKD", s.casefold())
+    for c in "".join(_EXPANSIONS.get(c, c) for c in decomposed):
+        category = unicodedata.category(c)
+        if category[0] == "M":  # an accent of the previous character
+            if secondary:
+                secondary[-1] += _SECONDARY_BY_ACCENT.get(
+                    c, chr(1 + len(_ACCENTS) + ord(c)))
+            continue
+        char_class = _CLASS_BY_CATEGORY.get(category[0])
+        if char_class is None:  # control characters are ignored
+            continue
+        rank = _RANK_BY_PUNCTUATION.get(c)
+        if rank is None:
+            rank = len(_RANK_BY_PUNCTUATION) + ord(c)
+        primary.append((char_class << _CLASS_SHIFT) + rank)
+        secondary.append("")
+    return tuple(primary), tuple(secondary)
+
+
+def _sign(x: int) -> int:
+    return (x > 0) - (x < 0)
+
+
+class CheckedCollator:
+    """
+    A collator that compares the local collation keys, and checks one
+    comparison out of check_interval against the UNO collator.
+    """
+
+    def __init__(self, oCollator: Any, check_interval: int = CHECK_INTERVAL):
+        self.reference = oCollator
+        self._check_interval = check_interval
+        self._counter = itertools.count(1)
+        self._local = True
+
+    @property
+    def local(self) -> bool:
+        return self._local
+
+    def get_sort_key(self) -> Optional[Callable[[str], Any]]:
+        """
+        The local sort key, or None if the collator fell back to the UNO
+        collator.
+        """
+        return collation_key if self._local else None
+
+    def compareString(self, s1: str, s2: str) -> int:
+        if not self._local:
+            return self.reference.compareString(s1, s2)
+
+        k1 = collation_key(s1)
+        k2 = collation_key(s2)
+        ret = (k1 > k2) - (k1 < k2)
+        if next(self._counter) % self._check_interval == 0:
+            return self._check(s1, s2, ret)
+        return ret
+
+    def compare_checked(self, s1: str, s2: str) -> int:
+        """
+        Compare with the UNO collator. If the local keys disagree, fall back
+        to the UNO collator for good.
+        """
+        if not self._local:
+            return self.reference.compareString(s1, s2)
+
+        k1 = collation_key(s1)
+        k2 = collation_key(s2)
+        return self._check(s1, s2, (k1 > k2) - (k1 < k2))
+
+    def _check(self, s1: str, s2: str, ret: int) -> int:
+        expected = _sign(self.reference.compareString(s1, s2))
+        if expected != ret:
+            logging.getLogger(__name__).debug(
+                "Local collation disagrees: %r, %r", s1, s2)
+            self.disable()
+        return expected
+
+    def disable(self):
+        self._local = False
+
+
+def check_sorted(oCollator: Any, sorted_strings: Sequence[str]) -> bool:
+    """
+    True if the UNO collator agrees with the local order of the sorted
+    strings: each string is equal to the previous one for both, or greater
+    for both.
+    """
+    for s1, s2 in zip(sorted_strings, sorted_strings[1:]):
+        c = oCollator.compareString(s1, s2)
+        if collation_key(s1) == collation_key(s2):
+            if c != 0:
+                return False
+        elif c >= 0:
+            return False
+    return True
+
+
+def create_checked_collator(
+        oCollator: Any, probe_strings: Sequence[str] = PROBE_STRINGS) -> Any:
+    """
+    A CheckedCollator if the local collation keys agree with the UNO
+    collator on the probe strings, else the UNO collator itself.
+    """
+    if LOCAL_COLLATION == 0:
+        return oCollator
+    if not check_sorted(oCollator, sorted(probe_strings, key=collation_key)):
+        return oCollator
+    return CheckedCollator(oCollator)
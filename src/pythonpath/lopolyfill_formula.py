@@ -0,0 +1,104 @@
+# LoPolyfill - Python - A set of 24.8 functions made availaible for 7.2
+# Copyright (C) 2025 Julien Férard.
+#
+# LoPolyfill is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# LoPolyfill is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+Find the calls of the add-in functions in the formulas of a document.
+
+The formulas are in the API grammar (the `Formula` property of a cell): the
+add-in functions have their programmatic name, the arguments are separated
+by semicolons and the references look like `$Sheet1.A1:B10`.
+"""
+import re
+from typing import Collection, Iterator, List, Optional, Tuple
+
+_REFERENCE_REGEX = re.compile(
+    r"""^(?:\$?(?P<sheet>'(?:[^']|'')+'|[^.:'$;()]+)\.)?
+    (?P<start>\$?[A-Z]+\$?[0-9]+)
+    (?::(?:\$?(?:'(?:[^']|'')+'|[^.:'$;()]+)\.)?(?P<end>\$?[A-Z]+\$?[0-9]+))?$
+    """, re.VERBOSE)
+
+
+def find_calls(
+        formula: str, prefix: str, names: Collection[str]
+) -> Iterator[Tuple[str, List[str]]]:
+    """
+    Yield the (name, arguments) of the calls of prefix + name in the formula,
+    nested calls included.
+    """
+    regex = re.compile(r"{}({})\(".format(
+        re.escape(prefix), "|".join(map(re.escape, names))))
+    for match in regex.finditer(formula):
+        arguments = split_arguments(formula, match.end())
+        if arguments is not None:
+            yield match.group(1), arguments
+
+
+def split_arguments(formula: str, start: int) -> Optional[List[str]]:
+    """
+    The arguments of the call whose opening parenthesis is before start, or
+    None if the parenthesis is not closed.
+    """
+    arguments = []
+    depth = 0
+    in_string = False
+    argument_start = start
+    for i in range(start, len(formula)):
+        c = formula[i]
+        if in_string:
+            if c == '"':  # "" is an escaped quote: the state is toggled twice
+                in_string = False
+        elif c == '"':
+            in_string = True
+        elif c in "({":
+            depth += 1
+        elif c in ")}":
+            if depth == 0:
+                arguments.append(formula[argument_start:i].strip())
+                if arguments == [""]:
+                    return []
+                return arguments
+            depth -= 1
+        elif c == ";" and depth == 0:
+            arguments.append(formula[argument_start:i].strip())
+            argument_start = i + 1
+    return None
+
+
+def parse_range_reference(text: str) -> Optional[Tuple[Optional[str], str]]:
+    """
+    The sheet name (None for the current sheet) and the address of a range
+    reference, or None if the text is not a plain range reference.
+    """
+    match = _REFERENCE_REGEX.match(text)
+    if match is None:
+        return None
+
+    sheet = match.group("sheet")
+    if sheet is not None and sheet.startswith("'"):
+        sheet = sheet[1:-1].replace("''", "'")
+    address = match.group("start")
+    if match.group("end") is not None:
+        address += ":" + match.group("end")
+    return sheet, address
+
+
+def parse_number(text: str) -> Optional[float]:
+    """
+    The value of an omitted (None) or a literal number argument. Raise a
+    ValueError for any other argument.
+    """
+    if text == "":
+        return None
+    return float(text)
@@ -19,10 +19,20 @@
 import collections
 import enum
 import functools
+import heapq
 import itertools
+import operator
 import random
 import re
-from typing import Sequence, Any, Callable, List, Tuple, Optional, Iterable
+from typing import (
+    Sequence, Any, Callable, List, Tuple, Optional, Iterable, Dict,
+    NamedTuple)
+
+import lopolyfill_cache
+import lopolyfill_collation
+import lopolyfill_merge
+import lopolyfill_numpy
+from lopolyfill_index import BloomFilter, SortedIndex, normalize_string
 
 DataRow = Tuple[Any, ...]
 DataArray = Tuple[DataRow, ...]
@@ -39,17 +49,26 @@ class LopFilter:
         orientation = get_orientation(criteria, rows)
 
         if orientation == Orientation.BY_ROW:  # row filter
-            ret = [
-                row
-                for c, row in zip(criteria, rows)
-                if c[0]
-            ]
+            indices = lopolyfill_numpy.nonzero_indices(
+                [c[0] for c in criteria])
+            if indices is None:
+                ret = [
+                    row
+                    for c, row in zip(criteria, rows)
+                    if c[0]
+                ]
+            else:
+                ret = [rows[i] for i in indices]
         elif orientation == Orientation.BY_COL:  # col filter
             selected_columns = criteria[0]
-            ret = [
-                [v for s, v in zip(selected_columns, row) if s]
-                for row in rows
-            ]
+            indices = lopolyfill_numpy.nonzero_indices(selected_columns)
+            if indices is None:
+                ret = [
+                    [v for s, v in zip(selected_columns, row) if s]
+                    for row in rows
+                ]
+            else:
+                ret = [[row[j] for j in indices] for row in rows]
             if not ret[0]:
                 ret = []
         else:
@@ -133,6 +152,17 @@ class LopSequence:
         ]
 
 
+class AppendState(NamedTuple):
+    """
+    The input rows and the result of a call, kept to process the same rows
+    plus appended rows. data is specific to the function and may be built
+    on the first append.
+    """
+    rows: DataArray
+    result: List[DataRow]
+    data: Any = None
+
+
 class LopSort:
     def __init__(self, oCollator, illegal_argument_exception: Any):
         self._oCollator = oCollator
@@ -145,17 +175,53 @@ class LopSort:
         # desc: Error / Number / String
         assert in_range and in_range[0]
 
-        if sort_index is None:
-            sort_index = 0
+        sort_indices = self._get_sort_indices(sort_index)
+        ascendings = self._get_ascendings(sort_order, len(sort_indices))
+
+        if by_col:
+            return self._by_col_lop_sort(in_range, sort_indices, ascendings)
         else:
-            sort_index = int(sort_index) - 1
+            return self.sort_rows(in_range, sort_indices, ascendings)
 
-        ascending = self._is_ascending(sort_order)
+    def get_sort_params(
+            self, sort_index: Any, sort_order: Any, width: int
+    ) -> Tuple[List[int], List[bool]]:
+        """
+        The 0-based sort indices and the ascendings of SORT by row, checked
+        against the width of the rows.
+        """
+        sort_indices = self._get_sort_indices(sort_index)
+        ascendings = self._get_ascendings(sort_order, len(sort_indices))
+        if any(i < 0 or i >= width for i in sort_indices):
+            raise self._illegal_argument_exception("SortIndex col")
+        return sort_indices, ascendings
 
-        if by_col:
-            return self._by_col_lop_sort(in_range, sort_index, ascending)
+    def _get_sort_indices(self, sort_index: Any) -> List[int]:
+        if sort_index is None:
+            return [0]
+        elif isinstance(sort_index, (list, tuple)):
+            sort_indices = [
+                int(i) - 1 for i in itertools.chain(*sort_index)
+                if i is not None and i != ''
+            ]
+            if not sort_indices:
+                raise self._illegal_argument_exception("SortIndex")
+            return sort_indices
+        else:
+            return [int(sort_index) - 1]
+
+    def _get_ascendings(self, sort_order: Any, count: int) -> List[bool]:
+        if isinstance(sort_order, (list, tuple)):
+            ascendings = [
+                self._is_ascending(o) for o in itertools.chain(*sort_order)
+            ]
+            if len(ascendings) == 1:
+                ascendings = ascendings * count
+            elif len(ascendings) != count:
+                raise self._illegal_argument_exception("sort_order")
+            return ascendings
         else:
-            return self._by_row_lop_sort(in_range, sort_index, ascending)
+            return [self._is_ascending(sort_order)] * count
 
     def _is_ascending(self, sortOrder: Any) -> bool:
         if sortOrder is None:
@@ -171,26 +237,221 @@ class LopSort:
         return ascending
 
     def _by_col_lop_sort(
-            self, inRange: DataArray, sortIndex: int,
-            ascending: bool):
+            self, inRange: DataArray, sort_indices: List[int],
+            ascendings: List[bool]):
         cols = list(zip(*inRange))
-        sorted_cols = self._by_row_lop_sort(cols, sortIndex, ascending)
+        sorted_cols = self.sort_rows(cols, sort_indices, ascendings)
         return list(zip(*sorted_cols))
 
-    def _by_row_lop_sort(
-            self, rows: Sequence[DataRow], sort_index: int,
-            ascending: bool) -> List[DataRow]:
-        if sort_index < 0 or sort_index >= len(rows[0]):
+    def sort_rows(
+            self, rows: Sequence[DataRow], sort_indices: List[int],
+            ascendings: List[bool]) -> List[DataRow]:
+        """
+        SORT by row, with the parameters of get_sort_params.
+        """
+        if any(i < 0 or i >= len(rows[0]) for i in sort_indices):
             raise self._illegal_argument_exception("SortIndex col")
 
-        cmp_values_with_collator = create_cmp_values_with_collator(
-            self._oCollator)
+        sorted_indices = lopolyfill_numpy.argsort_rows(
+            rows, sort_indices, ascendings)
+        if sorted_indices is None:
+            sorted_indices = self._sort_indices(len(rows), [
+                ([row[sort_index] for row in rows], ascending)
+                for sort_index, ascending in zip(sort_indices, ascendings)
+            ])
+        return [rows[i] for i in sorted_indices]
+
+    def sort_appended(
+            self, state: Optional[AppendState], in_range: DataArray,
+            sort_index: Any, sort_order: Any) -> AppendState:
+        """
+        SORT by row. If in_range is state.rows plus appended rows, only the
+        appended rows are sorted, then merged into state.result.
+        """
+        assert in_range and in_range[0]
+
+        sort_indices, ascendings = self.get_sort_params(
+            sort_index, sort_order, len(in_range[0]))
+
+        appended = (None if state is None
+                    else get_appended_rows(state.rows, in_range))
+        result = None
+        if appended is not None:
+            result = self._merge_appended(
+                state.result, appended, sort_indices, ascendings)
+        if result is None:
+            result = self.sort_rows(in_range, sort_indices, ascendings)
+        return AppendState(in_range, result)
+
+    def _merge_appended(
+            self, sorted_rows: List[DataRow], appended: Sequence[DataRow],
+            sort_indices: List[int], ascendings: List[bool]
+    ) -> Optional[List[DataRow]]:
+        """
+        Merge the appended rows into the sorted rows. With a CheckedCollator,
+        the rows are merged on their local keys, and the UNO collator checks
+        each merged row against its neighbours: return None if it disagrees.
+        """
+        # the new rows are placed after the equal rows: the sort is stable
+        row_key = self._create_row_key(sort_indices, ascendings)
+        if row_key is None:
+            cmp_rows = self._create_cmp_rows(sort_indices, ascendings)
+            keyed_rows = sorted_rows
+            sorted_appended = [
+                (row, row) for row in sorted(
+                    appended, key=functools.cmp_to_key(cmp_rows))]
+        else:
+            cmp_rows = cmp_keys
+            keyed_rows = KeyedValues(sorted_rows, row_key)
+            sorted_appended = sorted(
+                ((row_key(row), row) for row in appended),
+                key=operator.itemgetter(0))
+        result = []
+        positions = []
+        lo = 0
+        for key, row in sorted_appended:
+            hi = bisect_right(keyed_rows, key, cmp_rows, lo)
+            result.extend(sorted_rows[lo:hi])
+            positions.append(len(result))
+            result.append(row)
+            lo = hi
+        result.extend(sorted_rows[lo:])
+        if row_key is not None and not self._check_merged(
+                result, positions, row_key, sort_indices, ascendings):
+            self._oCollator.disable()
+            return None
+        return result
+
+    def _check_merged(
+            self, rows: List[DataRow], positions: List[int],
+            row_key: Callable[[DataRow], Any], sort_indices: List[int],
+            ascendings: List[bool]) -> bool:
+        """
+        True if the UNO collator agrees with the local keys on the pairs of
+        consecutive rows where a row was inserted. The other pairs were
+        consecutive in the sorted rows.
+        """
+        cmp_rows = self._create_cmp_rows(
+            sort_indices, ascendings, self._oCollator.reference)
+        pairs = sorted({
+            j for p in positions for j in (p - 1, p) if 0 <= j < len(rows) - 1
+        })
+        return all(
+            cmp_keys(row_key(rows[j]), row_key(rows[j + 1]))
+            == cmp_keys(cmp_rows(rows[j], rows[j + 1]), 0)
+            for j in pairs)
+
+    def create_cmp_rows(
+            self, sort_index: Any, sort_order: Any
+    ) -> Callable[[DataRow, DataRow], int]:
+        """
+        The comparison of two rows in SORT, e.g. to merge sorted chunks.
+        """
+        sort_indices = self._get_sort_indices(sort_index)
+        ascendings = self._get_ascendings(sort_order, len(sort_indices))
+        return self._create_cmp_rows(sort_indices, ascendings)
 
-        def cmp_rows(row1: Sequence[Any], row2: Sequence[Any]):
-            return cmp_values_with_collator(row1[sort_index], row2[sort_index])
+    def _create_row_key(
+            self, sort_indices: List[int], ascendings: List[bool]
+    ) -> Optional[Callable[[DataRow], Any]]:
+        """
+        A key of the rows that sorts as cmp_rows, or None if the collator
+        has no local sort keys.
+        """
+        if _get_local_sort_key(self._oCollator) is None:
+            return None
+        columns = [
+            (i, create_typed_key_func(self._oCollator, ascending))
+            for i, ascending in zip(sort_indices, ascendings)
+        ]
 
-        return sorted(rows, key=functools.cmp_to_key(cmp_rows),
-                      reverse=ascending is False)
+        if len(columns) == 1:
+            [(i, typed_key)] = columns
+
+            def row_key(row: DataRow) -> Any:
+                return typed_key(row[i])
+        else:
+            def row_key(row: DataRow) -> Any:
+                return tuple([typed_key(row[i]) for i, typed_key in columns])
+
+        return row_key
+
+    def _create_cmp_rows(
+            self, sort_indices: List[int], ascendings: List[bool],
+            oCollator=None
+    ) -> Callable[[DataRow, DataRow], int]:
+        cmp_values = create_cmp_values_with_collator(
+            self._oCollator if oCollator is None else oCollator)
+        signs = [(i, 1 if ascending else -1)
+                 for i, ascending in zip(sort_indices, ascendings)]
+
+        def cmp_rows(row1: DataRow, row2: DataRow) -> int:
+            for i, sign in signs:
+                c = cmp_values(row1[i], row2[i])
+                if c:
+                    return sign * c
+            return 0
+
+        return cmp_rows
+
+    def _sort_indices(
+            self, count: int, sort_keys: List[Tuple[Sequence[Any], bool]]
+    ) -> Iterable[int]:
+        """
+        Stable argsort on a list of (values, ascending). Each value is
+        decorated once and rows are compared on one composite key.
+
+        Above EXTERNAL_SORT_MEMORY, the keys are sorted by runs in temporary
+        files (see lopolyfill_merge): the values, the ranks of the strings
+        and the result of the caller are still in memory.
+        """
+        key_funcs = self._create_key_funcs(sort_keys)
+
+        if len(key_funcs) == 1:
+            [(values, key_func)] = key_funcs
+
+            def row_key(i: int) -> Any:
+                return key_func(values[i])
+        else:
+            def row_key(i: int) -> Any:
+                return tuple([f(values[i]) for values, f in key_funcs])
+
+        sorted_indices = lopolyfill_merge.external_sorted_indices(
+            count, row_key, len(key_funcs))
+        if sorted_indices is not None:
+            return sorted_indices
+
+        keys = self._create_keys(key_funcs)
+        return sorted(range(count), key=keys.__getitem__)
+
+    def create_sort_keys(
+            self, rows: Sequence[DataRow], sort_indices: List[int],
+            ascendings: List[bool]) -> List[Any]:
+        """
+        The keys of the rows in SORT by row, with the parameters of
+        get_sort_params: the rows sort as their keys.
+        """
+        return self._create_keys(self._create_key_funcs([
+            ([row[sort_index] for row in rows], ascending)
+            for sort_index, ascending in zip(sort_indices, ascendings)
+        ]))
+
+    def _create_key_funcs(
+            self, sort_keys: List[Tuple[Sequence[Any], bool]]
+    ) -> List[Tuple[Sequence[Any], Callable[[Any], Any]]]:
+        return [
+            (values, create_sort_key_func(self._oCollator, values, ascending))
+            for values, ascending in sort_keys
+        ]
+
+    def _create_keys(
+            self, key_funcs: List[Tuple[Sequence[Any], Callable[[Any], Any]]]
+    ) -> List[Any]:
+        if len(key_funcs) == 1:
+            [(values, key_func)] = key_funcs
+            return list(map(key_func, values))
+        else:
+            return list(zip(*[map(f, values) for values, f in key_funcs]))
 
     def sort_by(
             self, inRange: DataArray,
@@ -216,11 +477,12 @@ class LopSort:
             if sortByRange is not None
         ]
         if byCol:
-            columns = list(zip(*inRange))
-            columns = self._by_row_lop_sortby(columns, sortKeys)
-            return list(zip(*columns))
+            sorted_indices = list(self._sort_indices(w, sortKeys))
+            return [
+                tuple(map(row.__getitem__, sorted_indices)) for row in inRange
+            ]
         else:
-            return self._by_row_lop_sortby(inRange, sortKeys)
+            return [inRange[i] for i in self._sort_indices(h, sortKeys)]
 
     def _is_by_col(
             self, sortByRange1: DataArray, h: int, w: int
@@ -248,27 +510,6 @@ class LopSort:
                 return [row[0] for row in sortByRange]
         return extract
 
-    def _by_row_lop_sortby(
-            self, rows: Sequence[DataRow],
-            sort_keys: List[Tuple[Any, bool]]
-    ) -> List[DataRow]:
-        cmp_values_with_collator = create_cmp_values_with_collator(
-            self._oCollator)
-
-        def cmp_integers(i: int, j: int) -> int:
-            for values, ascending in sort_keys:
-                c = cmp_values_with_collator(values[i], values[j])
-                if c != 0:
-                    if ascending:
-                        return c
-                    else:
-                        return -c
-            return 0
-
-        indices = range(len(rows))
-        sorted_indices = sorted(indices, key=functools.cmp_to_key(cmp_integers))
-        return [rows[i] for i in sorted_indices]
-
 
 class LopUnique:
     def __init__(self, illegal_argument_exception: Any):
@@ -296,6 +537,10 @@ class LopUnique:
         # hash = hash(unicodedata.normalize("NFD", egypt))
 
         rows = [tuple(row) for row in in_range]
+        indices = lopolyfill_numpy.unique_row_indices(rows, uniqueness)
+        if indices is not None:
+            return [rows[i] for i in indices]
+
         ret = []
         if uniqueness:
             c = collections.Counter(rows)
@@ -311,6 +556,119 @@ class LopUnique:
                     ret.append(row)
         return ret
 
+    def execute_appended(
+            self, state: Optional[AppendState], in_range: DataArray,
+            uniqueness: Any) -> AppendState:
+        """
+        UNIQUE by row. If in_range is state.rows plus appended rows, only the
+        appended rows are hashed. state.data is the set of the seen rows, or
+        the row counts and the rows that occur once if uniqueness is True.
+        """
+        uniqueness = bool(uniqueness)
+        appended = (None if state is None
+                    else get_appended_rows(state.rows, in_range))
+        if appended is None:
+            return AppendState(
+                in_range, self._unique_by_row(in_range, uniqueness))
+
+        rows = [tuple(row) for row in appended]
+        if uniqueness:
+            if state.data is None:
+                counter = collections.Counter(map(tuple, state.rows))
+                singles = dict.fromkeys(state.result)
+            else:
+                counter, singles = state.data
+            for row in rows:
+                count = counter[row] + 1
+                counter[row] = count
+                if count == 1:
+                    singles[row] = None
+                elif count == 2:
+                    del singles[row]
+            return AppendState(in_range, list(singles), (counter, singles))
+        else:
+            seen = set(state.result) if state.data is None else state.data
+            result = list(state.result)
+            for row in rows:
+                if row not in seen:
+                    seen.add(row)
+                    result.append(row)
+            return AppendState(in_range, result, seen)
+
+    def execute_by_keys(
+            self, in_range: DataArray, key_indices: Any, by_col: Any,
+            uniqueness: Any, occurrence: Any
+    ) -> List[Sequence[Any]]:
+        """
+        Deduplicate on the key columns (or rows if by_col) only, and return
+        the whole rows (or columns). Only the key projections are hashed.
+        """
+        assert in_range and in_range[0]
+
+        uniqueness = bool(uniqueness)
+        if occurrence is None:
+            keep_last = False
+        else:
+            occurrence = int(occurrence)
+            if occurrence == 1:
+                keep_last = False
+            elif occurrence == -1:
+                keep_last = True
+            else:
+                raise self._illegal_argument_exception("Occurrence")
+
+        if by_col:
+            key_indices = self._get_key_indices(key_indices, len(in_range))
+            keys = zip(*[in_range[k] for k in key_indices])
+            if len(key_indices) == 1:
+                keys = (key for key, in keys)
+        else:
+            key_indices = self._get_key_indices(
+                key_indices, len(in_range[0]))
+            keys = map(operator.itemgetter(*key_indices), in_range)
+
+        indices = self._unique_indices(keys, uniqueness, keep_last)
+        if by_col:
+            return [[row[j] for j in indices] for row in in_range]
+        else:
+            return [in_range[i] for i in indices]
+
+    def _get_key_indices(self, key_indices: Any, size: int) -> List[int]:
+        if key_indices is None:
+            key_indices = list(range(size))
+        elif isinstance(key_indices, (list, tuple)):
+            key_indices = [
+                int(key_index) - 1
+                for key_index in itertools.chain(*key_indices)
+                if key_index is not None and key_index != ''
+            ]
+        else:
+            key_indices = [int(key_indices) - 1]
+
+        if not key_indices or any(
+                i < 0 or i >= size for i in key_indices):
+            raise self._illegal_argument_exception("Keys")
+        return key_indices
+
+    def _unique_indices(
+            self, keys: Iterable[Any], uniqueness: bool, keep_last: bool
+    ) -> List[int]:
+        index_by_key = {}
+        if uniqueness:
+            counter = collections.Counter()
+            for i, key in enumerate(keys):
+                counter[key] += 1
+                index_by_key[key] = i
+            return sorted(
+                i for key, i in index_by_key.items() if counter[key] == 1)
+        elif keep_last:
+            index_by_key = dict(zip(keys, itertools.count()))
+            return sorted(index_by_key.values())
+        else:
+            for i, key in enumerate(keys):
+                index_by_key.setdefault(key, i)
+            return list(index_by_key.values())
+
 
 class XMatchMode(enum.IntEnum):
     EXACT = 0
@@ -329,10 +687,20 @@ class XSearchMode(enum.IntEnum):
 
 class LopXMatch:
     def __init__(
-            self, oCollator, illegal_argument_exception: Any, whole_cell: bool):
+            self, oCollator, illegal_argument_exception: Any, whole_cell: bool,
+            bloom_filter: Optional[BloomFilter] = None,
+            sorted_index: Optional[SortedIndex] = None):
+        """
+        :param bloom_filter: a filter over the values of the search range.
+        Exact matches that are not in the filter are misses.
+        :param sorted_index: the positions of the values of the search range,
+        sorted. Exact and approximate matches are found by bisection.
+        """
         self._oCollator = oCollator
         self._illegal_argument_exception = illegal_argument_exception
         self._whole_cell = whole_cell
+        self._bloom_filter = bloom_filter
+        self._sorted_index = sorted_index
 
     def lookup(
             self, criterion: Any,
@@ -422,7 +790,8 @@ class LopXMatch:
                 "Incompatible MatchMode/SearchMode")
 
         finder = IndexFinder(
-            self._oCollator, self._illegal_argument_exception, self._whole_cell
+            self._oCollator, self._illegal_argument_exception, self._whole_cell,
+            self._bloom_filter, self._sorted_index
         )
 
         if search_mode == XSearchMode.FIRST:
@@ -441,10 +810,13 @@ class LopXMatch:
 
 class IndexFinder:
     def __init__(self, oCollator, illegal_argument_exception: Any,
-                 whole_cell: bool):
+                 whole_cell: bool, bloom_filter: Optional[BloomFilter] = None,
+                 sorted_index: Optional[SortedIndex] = None):
         self._oCollator = oCollator
         self._illegal_argument_exception = illegal_argument_exception
         self._whole_cell = whole_cell
+        self._bloom_filter = bloom_filter
+        self._sorted_index = sorted_index
 
     def find_index(
             self, criterion: Any,
@@ -452,17 +824,28 @@ class IndexFinder:
             match_mode: Any,
             reverse: bool
     ) -> Optional[int]:
+        if match_mode == XMatchMode.EXACT:
+            if (self._bloom_filter is not None
+                    and not self._bloom_filter.might_contain(criterion)):
+                return None
+        if (match_mode in (
+                XMatchMode.EXACT, XMatchMode.SMALLER, XMatchMode.LARGER)
+                and self._sorted_index is not None
+                and len(self._sorted_index) == len(values)):
+            return self._find_sorted_value_index(
+                criterion, values, match_mode, reverse)
+
         if match_mode == XMatchMode.EXACT:
             eq_criterion = create_eq_criterion_with_collator(
                 self._oCollator, criterion, self._whole_cell)
             return self._find_eq_value_index(
                 eq_criterion, values, reverse)
         elif match_mode == XMatchMode.SMALLER:
-            cmp_values = create_cmp_values_with_collator(self._oCollator)
+            cmp_values = self._get_cmp_values(check_all=False)
             return self._find_smaller_value_index(
                 cmp_values, criterion, values, reverse)
         elif match_mode == XMatchMode.LARGER:
-            cmp_values = create_cmp_values_with_collator(self._oCollator)
+            cmp_values = self._get_cmp_values(check_all=False)
             return self._find_larger_value_index(
                 cmp_values, criterion, values, reverse)
         elif match_mode == XMatchMode.WILDCARD:
@@ -482,6 +865,18 @@ class IndexFinder:
             return self._find_eq_value_index(
                 eq_criterion, values, reverse)
 
+    def _get_cmp_values(self, check_all: bool) -> Callable[[Any, Any], int]:
+        """
+        The comparison of the values. With a CheckedCollator, the equalities
+        are checked by the UNO collator, and so are all the comparisons if
+        check_all: a bisection is decided by a few comparisons.
+
+        The values are not decorated with typed keys: a lookup reads each
+        value about once, hence a key would cost as much as the comparison.
+        """
+        return create_cmp_values_with_collator(
+            get_lookup_collator(self._oCollator, check_all))
+
     def _find_eq_value_index(
             self, eq_criterion: Callable[[Any], bool],
             values: Sequence[Any], reverse: bool) -> Optional[int]:
@@ -542,6 +937,32 @@ class IndexFinder:
 
         return cur_idx
 
+    def _find_sorted_value_index(
+            self, criterion: Any, values: Sequence[Any],
+            match_mode: XMatchMode, reverse: bool) -> Optional[int]:
+        """
+        Same result as the linear search, from the runs of equal values of
+        the sorted index.
+        """
+        index = self._sorted_index
+        cmp_values = self._get_cmp_values(check_all=True)
+        lo = index.bisect_left(values, criterion, cmp_values)
+        hi = index.bisect_right(values, criterion, cmp_values, lo)
+        if lo == hi:  # no equal value
+            if match_mode == XMatchMode.SMALLER and lo > 0:
+                # the run of the largest smaller value
+                hi = lo
+                lo = index.bisect_left(
+                    values, values[index[hi - 1]], cmp_values)
+            elif match_mode == XMatchMode.LARGER and hi < len(index):
+                # the run of the smallest larger value
+                lo = hi
+                hi = index.bisect_right(
+                    values, values[index[lo]], cmp_values, lo)
+            else:
+                return None
+        return index[hi - 1] if reverse else index[lo]
+
     # BINARY FIRST BY ROW *****************************************************
     def binary_find_index(
             self, criterion: Any,
@@ -549,9 +970,13 @@ class IndexFinder:
             match_mode: Any,
             reverse: bool
     ) -> Optional[int]:
+        if match_mode == XMatchMode.WILDCARD:
+            raise NotImplementedError()
+        elif match_mode == XMatchMode.REGEX:
+            raise NotImplementedError()
+
+        cmp_values = self._get_cmp_values(check_all=True)
         if match_mode == XMatchMode.EXACT:
-            cmp_values = create_cmp_values_with_collator(
-                self._oCollator)
             if reverse:
                 return self._find_binary_last_eq_value_index(
                     cmp_values, criterion, values)
@@ -559,7 +984,6 @@ class IndexFinder:
                 return self._find_binary_first_eq_value_index(
                     cmp_values, criterion, values)
         elif match_mode == XMatchMode.SMALLER:
-            cmp_values = create_cmp_values_with_collator(self._oCollator)
             if reverse:
                 return self._find_binary_last_smaller_value_index(
                     cmp_values, criterion, values)
@@ -567,17 +991,12 @@ class IndexFinder:
                 return self._find_binary_first_smaller_value_index(
                     cmp_values, criterion, values)
         elif match_mode == XMatchMode.LARGER:
-            cmp_values = create_cmp_values_with_collator(self._oCollator)
             if reverse:
                 return self._find_binary_last_larger_value_index(
                     cmp_values, criterion, values)
             else:
                 return self._find_binary_first_larger_value_index(
                     cmp_values, criterion, values)
-        elif match_mode == XMatchMode.WILDCARD:
-            raise NotImplementedError()
-        elif match_mode == XMatchMode.REGEX:
-            raise NotImplementedError()
 
     def _find_binary_first_eq_value_index(
             self, cmp_values: Callable[[Any, Any], int], criterion: Any,
@@ -657,12 +1076,8 @@ class IndexFinder:
             values: Sequence[Any]) -> Optional[int]:
         # values[idx - 1] <= criterion < values[idx]
         idx = bisect_right(values, criterion, cmp_values)
-        if idx == 0:  # criterion < values[0]
-            return None
-
-        new_idx = idx - 1
-        if cmp_values(values[new_idx], criterion) == 0:
-            return new_idx
+        if idx > 0 and cmp_values(values[idx - 1], criterion) == 0:
+            return idx - 1
         elif idx == len(values):
             return None
         else:
@@ -843,6 +1258,10 @@ class LopArrayHandling:
             ignore = Ignore(int(ignore))
         dont_ignore = self._get_dont_ignore_func(ignore)
 
+        values = lopolyfill_numpy.flatten(rows, scan_by_col)
+        if values is not None:
+            return list(zip(values))
+
         if scan_by_col:
             return [
                 (x,) for x in itertools.chain(*zip(*rows)) if dont_ignore(x)
@@ -859,6 +1278,10 @@ class LopArrayHandling:
             ignore = Ignore(int(ignore))
         dont_ignore = self._get_dont_ignore_func(ignore)
 
+        values = lopolyfill_numpy.flatten(rows, scan_by_col)
+        if values is not None:
+            return [values]
+
         if scan_by_col:
             return [
                 [x for x in itertools.chain(*zip(*rows)) if dont_ignore(x)]]
@@ -888,6 +1311,10 @@ class LopArrayHandling:
         assert rows and rows[0]
 
         values = self._extract_values(rows)
+        wrapped = lopolyfill_numpy.wrap(values, wrap_count, pad_with, True)
+        if wrapped is not None:
+            return wrapped
+
         d, m = divmod(len(values), wrap_count)
         if m != 0:
             d += 1
@@ -904,6 +1331,10 @@ class LopArrayHandling:
         assert rows and rows[0]
 
         values = self._extract_values(rows)
+        wrapped = lopolyfill_numpy.wrap(values, wrap_count, pad_with, False)
+        if wrapped is not None:
+            return [tuple(row) for row in wrapped]
+
         d, m = divmod(len(values), wrap_count)
         if m != 0:
             d += 1
@@ -924,6 +1355,478 @@ class LopArrayHandling:
         return values
 
 
+class Aggregate(enum.IntEnum):
+    """
+    Function codes, as in SUBTOTAL
+    """
+    AVERAGE = 1
+    COUNT = 2
+    MAX = 4
+    MIN = 5
+    SUM = 9
+
+
+class LopRunning:
+    """
+    Running (cumulative) and moving window aggregates over a vector, in one
+    pass.
+    """
+
+    def __init__(self, illegal_argument_exception: Any):
+        self._illegal_argument_exception = illegal_argument_exception
+
+    def cumulate(
+            self, rows: DataArray, function: Any
+    ) -> List[Sequence[Any]]:
+        assert rows and rows[0]
+
+        aggregate = self._get_aggregate(function)
+        values = LopArrayHandling(
+            self._illegal_argument_exception)._extract_values(rows)
+        if aggregate == Aggregate.SUM:
+            results = itertools.accumulate(
+                v if _is_number(v) else 0 for v in values)
+        elif aggregate == Aggregate.COUNT:
+            results = itertools.accumulate(
+                1 if _is_number(v) else 0 for v in values)
+        elif aggregate == Aggregate.AVERAGE:
+            results = self._cumulate_average(values)
+        elif aggregate == Aggregate.MAX:
+            results = self._cumulate_best(values, max)
+        else:
+            results = self._cumulate_best(values, min)
+
+        return shape_like_vector(rows, results)
+
+    def _cumulate_average(self, values: DataRow) -> Iterable[Any]:
+        total = 0
+        count = 0
+        for v in values:
+            if _is_number(v):
+                total += v
+                count += 1
+            yield None if count == 0 else total / count
+
+    def _cumulate_best(
+            self, values: DataRow, best_func: Callable[[Any, Any], Any]
+    ) -> Iterable[Any]:
+        best = None
+        for v in values:
+            if _is_number(v):
+                best = v if best is None else best_func(best, v)
+            yield 0 if best is None else best
+
+    def moving(
+            self, rows: DataArray, window: Any, function: Any
+    ) -> List[Sequence[Any]]:
+        assert rows and rows[0]
+
+        window = int(window)
+        if window < 1:
+            raise self._illegal_argument_exception("Window")
+        aggregate = self._get_aggregate(function)
+        values = LopArrayHandling(
+            self._illegal_argument_exception)._extract_values(rows)
+        if aggregate == Aggregate.MAX:
+            results = self._moving_best(values, window, lambda x, y: x >= y)
+        elif aggregate == Aggregate.MIN:
+            results = self._moving_best(values, window, lambda x, y: x <= y)
+        else:
+            results = self._moving_sum(values, window, aggregate)
+
+        return shape_like_vector(rows, results)
+
+    def _moving_sum(
+            self, values: DataRow, window: int, aggregate: Aggregate
+    ) -> Iterable[Any]:
+        # the values leave the window: the sum is compensated (Neumaier),
+        # else 1e20, 1, 1 would give 0 once 1e20 has left
+        total = 0
+        compensation = 0
+        count = 0
+        for i, v in enumerate(values):
+            if _is_number(v):
+                total, compensation = _add_compensated(
+                    total, compensation, v)
+                count += 1
+            if i >= window:
+                old = values[i - window]
+                if _is_number(old):
+                    total, compensation = _add_compensated(
+                        total, compensation, -old)
+                    count -= 1
+            if i < window - 1:
+                yield None
+            elif aggregate == Aggregate.SUM:
+                yield total + compensation if count else 0
+            elif aggregate == Aggregate.COUNT:
+                yield count
+            else:  # AVERAGE
+                yield None if count == 0 else (total + compensation) / count
+
+    def _moving_best(
+            self, values: DataRow, window: int,
+            dominates: Callable[[Any, Any], bool]
+    ) -> Iterable[Any]:
+        # monotonic deque of indices: values[candidates[0]] is the best
+        candidates = collections.deque()
+        for i, v in enumerate(values):
+            if _is_number(v):
+                while candidates and dominates(v, values[candidates[-1]]):
+                    candidates.pop()
+                candidates.append(i)
+            if candidates and candidates[0] <= i - window:
+                candidates.popleft()
+            if i < window - 1:
+                yield None
+            elif candidates:
+                yield values[candidates[0]]
+            else:
+                yield 0
+
+    def _get_aggregate(self, function: Any) -> Aggregate:
+        if function is None:
+            return Aggregate.SUM
+        try:
+            return Aggregate(int(function))
+        except ValueError:
+            raise self._illegal_argument_exception("Function")
+
+
+class RankMethod(enum.IntEnum):
+    COMPETITION = 0  # 1, 2, 2, 4
+    DENSE = 1  # 1, 2, 2, 3
+    ORDINAL = 2  # 1, 2, 3, 4
+
+
+class LopRank:
+    """
+    Ranks of the values of a vector, using the same keys as LopSort: one sort
+    for the whole vector.
+    """
+
+    def __init__(self, oCollator, illegal_argument_exception: Any):
+        self._oCollator = oCollator
+        self._illegal_argument_exception = illegal_argument_exception
+
+    def rank(
+            self, rows: DataArray, order: Any, method: Any
+    ) -> List[Sequence[Any]]:
+        assert rows and rows[0]
+
+        # as in RANK: 0 or omitted is descending
+        ascending = bool(order)
+        if method is None:
+            method = RankMethod.COMPETITION
+        else:
+            try:
+                method = RankMethod(int(method))
+            except ValueError:
+                raise self._illegal_argument_exception("Method")
+
+        values = LopArrayHandling(
+            self._illegal_argument_exception)._extract_values(rows)
+        # as in RANK, the blanks are not ranked and don't count
+        ranked = [i for i, v in enumerate(values) if v is not None and v != '']
+        # same keys and stable sort as LopSort: ties keep the order of the
+        # vector
+        keys = create_sort_keys(
+            self._oCollator, [values[i] for i in ranked], ascending)
+        sorted_indices = sorted(range(len(ranked)), key=keys.__getitem__)
+
+        ranks = [None] * len(values)  # type: List[Optional[int]]
+        rank = 0
+        dense_rank = 0
+        prev_key = None
+        for position, j in enumerate(sorted_indices, 1):
+            key = keys[j]
+            i = ranked[j]
+            if key != prev_key:
+                rank = position
+                dense_rank += 1
+            if method == RankMethod.COMPETITION:
+                ranks[i] = rank
+            elif method == RankMethod.DENSE:
+                ranks[i] = dense_rank
+            else:
+                ranks[i] = position
+            prev_key = key
+
+        return shape_like_vector(rows, ranks)
+
+
+class LopQuery:
+    """
+    TAKE(SORT(UNIQUE(FILTER(...)))) by row, in one pass: the rows are
+    streamed through the filter and the distinct set, and only the kept
+    rows are materialized. Without sort, the pass stops as soon as the limit
+    is reached; with a sort, only the limit rows are kept in a heap.
+    """
+
+    def __init__(self, oCollator, illegal_argument_exception: Any):
+        self._oCollator = oCollator
+        self._illegal_argument_exception = illegal_argument_exception
+
+    def execute(
+            self, in_range: DataArray, include: Any, sort_index: Any,
+            sort_order: Any, distinct: Any, limit: Any
+    ) -> List[DataRow]:
+        assert in_range and in_range[0]
+
+        rows = self._filter(in_range, include)  # type: Iterable[DataRow]
+        if distinct:
+            rows = self._distinct(rows)
+
+        if limit is not None:
+            limit = int(limit)
+            if limit == 0:
+                raise self._illegal_argument_exception(
+                    "Wrong limit parameter")
+
+        if sort_index is None and sort_order is None:
+            if limit is None:
+                return list(rows)
+            elif limit > 0:
+                return list(itertools.islice(rows, limit))
+            else:
+                return list(rows)[limit:]
+
+        lop_sort = LopSort(self._oCollator, self._illegal_argument_exception)
+        sort_indices, ascendings = lop_sort.get_sort_params(
+            sort_index, sort_order, len(in_range[0]))
+
+        rows = list(rows)
+        if not rows:
+            return rows
+        elif limit is None or abs(limit) >= len(rows):
+            return lop_sort.sort_rows(rows, sort_indices, ascendings)
+
+        # nsmallest is sorted(...)[:limit]; the last rows of a stable sort
+        # are the first rows of the stable reverse sort of the reversed rows
+        keys = lop_sort.create_sort_keys(rows, sort_indices, ascendings)
+        if limit > 0:
+            indices = heapq.nsmallest(
+                limit, range(len(rows)), key=keys.__getitem__)
+        else:
+            indices = heapq.nlargest(
+                -limit, reversed(range(len(rows))), key=keys.__getitem__
+            )[::-1]
+        return [rows[i] for i in indices]
+
+    def _filter(
+            self, in_range: DataArray, include: Any) -> Iterable[DataRow]:
+        if include is None:
+            return iter(in_range)
+        if get_orientation(include, in_range) != Orientation.BY_ROW:
+            raise self._illegal_argument_exception("Bad criteria")
+        return (row for (c,), row in zip(include, in_range) if c)
+
+    def _distinct(self, rows: Iterable[DataRow]) -> Iterable[DataRow]:
+        seen = set()
+        for row in rows:
+            row = tuple(row)
+            if row not in seen:
+                seen.add(row)
+                yield row
+
+
+def shape_like_vector(
+        rows: DataArray, values: Iterable[Any]
+) -> List[Sequence[Any]]:
+    """
+    Return the values as a column if rows is a column, else as a row.
+    """
+    if get_orientation(rows, rows) == Orientation.BY_ROW:  # a column
+        return [(v,) for v in values]
+    else:
+        return [list(values)]
+
+
+def get_appended_rows(
+        rows: DataArray, in_range: DataArray) -> Optional[DataArray]:
+    """
+    Return the appended rows if in_range is rows plus at most len(rows)
+    appended rows, None otherwise.
+    """
+    count = len(rows)
+    if not count < len(in_range) <= 2 * count:
+        return None
+    if not lopolyfill_cache.prefix_matches(rows, in_range):
+        return None
+    return in_range[count:]
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float))
+
+
+def _add_compensated(
+        total: Any, compensation: Any, value: Any) -> Tuple[Any, Any]:
+    """
+    Neumaier summation: total + compensation is the sum, compensation holds
+    the low-order bits lost by total.
+    """
+    new_total = total + value
+    if abs(total) >= abs(value):
+        compensation += (total - new_total) + value
+    else:
+        compensation += (value - new_total) + total
+    return new_total, compensation
+
+
+def create_collation_ranks(
+        oCollator, strings: Iterable[str]) -> Dict[str, int]:
+    """
+    Sort the distinct strings once with the collator and map each of them
+    to its dense rank: strings that the collator considers equal have the
+    same rank.
+
+    With a CheckedCollator, the strings are sorted on their local keys, and
+    the UNO collator only checks the consecutive strings.
+    """
+    strings = set(strings)
+    sort_key = _get_local_sort_key(oCollator)
+    if sort_key is not None:
+        sorted_strings = sorted(strings, key=sort_key)
+        if lopolyfill_collation.check_sorted(
+                oCollator.reference, sorted_strings):
+            rank_by_string = {}
+            rank = -1
+            prev_key = None
+            for s in sorted_strings:
+                key = sort_key(s)
+                if key != prev_key:
+                    rank += 1
+                rank_by_string[s] = rank
+                prev_key = key
+            return rank_by_string
+        oCollator.disable()
+
+    sorted_strings = sorted(
+        strings, key=functools.cmp_to_key(oCollator.compareString))
+    rank_by_string = {}
+    rank = 0
+    prev = None
+    for s in sorted_strings:
+        if prev is not None and oCollator.compareString(prev, s) != 0:
+            rank += 1
+        rank_by_string[s] = rank
+        prev = s
+    return rank_by_string
+
+
+def create_sort_key_func(
+        oCollator, values: Iterable[Any], ascending: bool = True
+) -> Callable[[Any], Tuple[int, Any]]:
+    """
+    Return a function that maps each of the values to a key that sorts as
+    cmp_values_with_collator (float < str < None), or in the reverse order
+    if not ascending. Strings are replaced by their collation rank, hence
+    the keys are plain numbers.
+    """
+    rank_by_string = create_collation_ranks(
+        oCollator, (v for v in values if isinstance(v, str)))
+    sign = 1 if ascending else -1
+
+    def sort_key(v: Any) -> Tuple[int, Any]:
+        if isinstance(v, (int, float)):
+            return 0, sign * v
+        elif isinstance(v, str):
+            return sign, sign * rank_by_string[v]
+        else:  # None or unknown
+            return sign * 2, 0
+
+    return sort_key
+
+
+def create_sort_keys(
+        oCollator, values: Sequence[Any], ascending: bool = True
+) -> List[Tuple[int, Any]]:
+    """
+    The keys of create_sort_key_func, for all the values
+    """
+    return list(map(
+        create_sort_key_func(oCollator, values, ascending), values))
+
+
+def _get_local_sort_key(oCollator) -> Optional[Callable[[str], Any]]:
+    get_sort_key = getattr(oCollator, "get_sort_key", None)
+    return None if get_sort_key is None else get_sort_key()
+
+
+def create_typed_key_func(
+        oCollator, ascending: bool = True
+) -> Optional[Callable[[Any], Tuple[int, Any]]]:
+    """
+    Return a function that maps a value to a (type rank, value) key that
+    sorts as cmp_values_with_collator (float < str < None), or in the
+    reverse order if not ascending. Return None if the collator has no local
+    sort keys for the strings (see lopolyfill_collation).
+    """
+    sort_key = _get_local_sort_key(oCollator)
+    if sort_key is None:
+        return None
+
+    if ascending:
+        def typed_key(v: Any) -> Tuple[int, Any]:
+            if isinstance(v, (int, float)):
+                return 0, v
+            elif isinstance(v, str):
+                return 1, sort_key(v)
+            else:  # None or unknown
+                return 2, 0
+    else:
+        def typed_key(v: Any) -> Tuple[int, Any]:
+            if isinstance(v, (int, float)):
+                return 0, -v
+            elif isinstance(v, str):
+                return -1, Descending(sort_key(v))
+            else:  # None or unknown
+                return -2, 0
+
+    return typed_key
+
+
+def cmp_keys(x: Any, y: Any) -> int:
+    return (x > y) - (x < y)
+
+
+class KeyedValues:
+    """
+    A view of the keys of the values: the key of a value is computed when
+    the value is read.
+    """
+
+    def __init__(self, values: Sequence[Any], key: Callable[[Any], Any]):
+        self._values = values
+        self._key = key
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __getitem__(self, i: int) -> Any:
+        return self._key(self._values[i])
+
+
+class Descending:
+    """
+    A key that sorts in the reverse order of the wrapped key.
+    """
+    __slots__ = ("key",)
+
+    def __init__(self, key: Any):
+        self.key = key
+
+    def __eq__(self, other: "Descending") -> bool:
+        return self.key == other.key
+
+    def __lt__(self, other: "Descending") -> bool:
+        return other.key < self.key
+
+    def __gt__(self, other: "Descending") -> bool:
+        return other.key > self.key
+
+
 def create_cmp_values_with_collator(oCollator) -> Callable[[Any, Any], int]:
     def cmp_values_with_collator(x: Any, y: Any) -> int:
         """
@@ -963,11 +1866,49 @@ def create_cmp_values_with_collator(oCollator) -> Callable[[Any, Any], int]:
     return cmp_values_with_collator
 
 
+class LookupCollator:
+    """
+    The comparisons of the lookups with a CheckedCollator. Two strings may be
+    equal for the collator only if their normalized keys are equal (see
+    lopolyfill_index): these strings are compared by the UNO collator, hence
+    an equality is never decided by the local keys alone. If check_all, all
+    the strings are compared by the UNO collator.
+    """
+
+    def __init__(self, oCollator, check_all: bool):
+        self._oCollator = oCollator
+        self._check_all = check_all
+
+    def compareString(self, s1: str, s2: str) -> int:
+        if self._check_all or normalize_string(s1) == normalize_string(s2):
+            return self._oCollator.compare_checked(s1, s2)
+        return self._oCollator.compareString(s1, s2)
+
+
+def get_lookup_collator(oCollator, check_all: bool = False):
+    """
+    A LookupCollator for a CheckedCollator, else the collator itself.
+    """
+    if getattr(oCollator, "compare_checked", None) is None:
+        return oCollator
+    return LookupCollator(oCollator, check_all)
+
+
 def create_eq_criterion_with_collator(
         oCollator, criterion: Any, whole_cell: bool
 ) -> Callable[[Any], bool]:
     # todo: use whole_cell
-    if isinstance(criterion, str):
+    compare_checked = getattr(oCollator, "compare_checked", None)
+    if isinstance(criterion, str) and compare_checked is not None:
+        # only the strings that may be equal (same normalized key) are
+        # compared, by the UNO collator
+        criterion_key = normalize_string(criterion)
+
+        def eq_criterion_with_collator(x: Any) -> bool:
+            return (isinstance(x, str)
+                    and normalize_string(x) == criterion_key
+                    and compare_checked(x, criterion) == 0)
+    elif isinstance(criterion, str):
         def eq_criterion_with_collator(x: Any) -> bool:
             return isinstance(x, str) and oCollator.compareString(x,
                                                                   criterion) == 0
@@ -1042,8 +1983,7 @@ def get_orientation(
 
 
 # from https://github.com/python/cpython/blob/main/Lib/bisect.py
-def bisect_right(a, x, cmp):
-    lo = 0
+def bisect_right(a, x, cmp, lo=0):
     hi = len(a)
     while lo < hi:
         mid = (lo + hi) // 2
@@ -1091,6 +2031,7 @@ LopRandarray.execute = debug(LopRandarray.execute)
 LopSequence.execute = debug(LopSequence.execute)
 LopSort.sort_by = debug(LopSort.sort_by)
 LopUnique.execute = debug(LopUnique.execute)
+LopUnique.execute_by_keys = debug(LopUnique.execute_by_keys)
 LopXMatch.lookup = debug(LopXMatch.lookup)
 LopXMatch.match = debug(LopXMatch.match)
 LopArrayHandling.choose_cols = debug(LopArrayHandling.choose_cols)
@@ -1104,4 +2045,8 @@ LopArrayHandling.to_col = debug(LopArrayHandling.to_col)
 LopArrayHandling.to_row = debug(LopArrayHandling.to_row)
 LopArrayHandling.wrap_cols = debug(LopArrayHandling.wrap_cols)
 LopArrayHandling.wrap_rows = debug(LopArrayHandling.wrap_rows)
+LopRunning.cumulate = debug(LopRunning.cumulate)
+LopRunning.moving = debug(LopRunning.moving)
+LopRank.rank = debug(LopRank.rank)
+LopQuery.execute = debug(LopQuery.execute)
 # ENDIF_DEBUG
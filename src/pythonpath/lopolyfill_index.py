@@ -0,0 +1,284 @@
+# LoPolyfill - Python - A set of 24.8 functions made availaible for 7.2
+# Copyright (C) 2025 Julien Férard.
+#
+# LoPolyfill is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# LoPolyfill is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+Indexes over the values of a search range.
+
+The Bloom filter answers "is there a value equal to the criterion?" with no
+false negatives: a miss can be returned without a search. Strings are equal
+if the collator says so, and the collator is a UNO object: the keys are
+normalized aggressively (compatibility decomposition, no combining marks,
+case folded, katakana as hiragana and small kana as large kana, letters and
+digits only) so that strings that the collator considers equal have the same
+key: the ICU collators ignore these differences below the tertiary strength.
+
+The sorted index holds the positions of the values of a search range, sorted
+by value: exact and approximate matches are found by bisection, even if the
+range is not sorted. Sorting uses the collator, hence the sorted indexes of
+large ranges are stored in files, named after a digest of the values and the
+locale, and mapped in memory when they are loaded again.
+"""
+import array
+import functools
+import hashlib
+import itertools
+import mmap
+import os
+import pickle
+import re
+import struct
+import sys
+import tempfile
+import unicodedata
+from typing import (
+    Any, Callable, Dict, Hashable, Iterable, Optional, Sequence)
+
+from lopolyfill_merge import int_from_env
+
+_NON_ALNUM_REGEX = re.compile(r"[\W_]+")
+
+
+def _create_kana_table() -> Dict[int, str]:
+    """
+    Katakana to hiragana, small kana to large kana. The voiced kana are
+    decomposed by NFKD before.
+    """
+    large_by_small = dict(zip(
+        "ぁぃぅぇぉっゃゅょゎゕゖㇰㇱㇲㇳㇴㇵㇶㇷㇸㇹㇺㇻㇼㇽㇾㇿ",
+        "あいうえおつやゆよわかけくしすとぬはひふへほむらりるれろ"))
+    table = {ord(c): large for c, large in large_by_small.items()}
+    # ァ..ヶ, ヽ, ヾ are ぁ..ゖ, ゝ, ゞ + 0x60
+    for code in itertools.chain(range(0x30A1, 0x30F7), (0x30FD, 0x30FE)):
+        hiragana = chr(code - 0x60)
+        table[code] = large_by_small.get(hiragana, hiragana)
+    return table
+
+
+_KANA_TABLE = _create_kana_table()
+
+# 12 bits and 4 hashes per key: about 0.6% of false positives
+_BITS_PER_KEY = 12
+_HASH_COUNT = 4
+_MASK_32 = 0xFFFFFFFF
+
+# None: the sorted indexes are not stored
+INDEX_DIR = os.environ.get("LOPOLYFILL_INDEX_DIR") or None
+# below this number of values, a sorted index costs more than a search
+INDEX_MIN_COUNT = int_from_env("LOPOLYFILL_INDEX_MIN_COUNT") or 10000
+
+# magic, byte order, item size, count
+_INDEX_HEADER = struct.Struct("<8s1sBxxxxxxQ")
+_INDEX_MAGIC = b"LOPIDX01"
+_POSITION_TYPECODE = "I"
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def normalize_string(s: str) -> str:
+    return _NON_ALNUM_REGEX.sub(
+        "", unicodedata.normalize("NFKD", s.casefold()).translate(
+            _KANA_TABLE))
+
+
+def normalize_key(value: Any) -> Optional[Hashable]:
+    """
+    The key of a value, tagged by kind. Numbers are equal to numbers,
+    strings to strings. Other values (errors) have no key.
+    """
+    if isinstance(value, (int, float)):
+        return 0, value
+    elif isinstance(value, str):
+        return 1, normalize_string(value)
+    else:
+        return None
+
+
+class BloomFilter:
+    def __init__(self, count: int):
+        self._bit_count = max(64, count * _BITS_PER_KEY)
+        self._bits = bytearray(-(-self._bit_count // 8))
+
+    def add(self, key: Hashable):
+        bits = self._bits
+        for position in self._get_positions(key):
+            bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: Hashable) -> bool:
+        bits = self._bits
+        return all(
+            bits[position >> 3] & (1 << (position & 7))
+            for position in self._get_positions(key))
+
+    def _get_positions(self, key: Hashable) -> Iterable[int]:
+        # double hashing on the two halves of the hash
+        h = hash(key)
+        h1 = h & _MASK_32
+        h2 = ((h >> 32) & _MASK_32) | 1
+        bit_count = self._bit_count
+        return [(h1 + i * h2) % bit_count for i in range(_HASH_COUNT)]
+
+    def might_contain(self, value: Any) -> bool:
+        """
+        False if no value of the filter is equal to that value.
+        """
+        key = normalize_key(value)
+        return key is not None and key in self
+
+    def __sizeof__(self) -> int:
+        return object.__sizeof__(self) + self._bits.__sizeof__()
+
+
+def create_bloom_filter(values: Iterable[Any]) -> BloomFilter:
+    keys = set(filter(None, map(normalize_key, values)))
+    bloom_filter = BloomFilter(len(keys))
+    for key in keys:
+        bloom_filter.add(key)
+    return bloom_filter
+
+
+class SortedIndex:
+    """
+    The positions of the values of a search range, sorted by value. Equal
+    values are sorted by position: the first position of a run of equal
+    values is the first match.
+    """
+
+    def __init__(self, positions: Sequence[int]):
+        self._positions = positions
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def __getitem__(self, i: int) -> int:
+        return self._positions[i]
+
+    def bisect_left(
+            self, values: Sequence[Any], x: Any,
+            cmp: Callable[[Any, Any], int], lo: int = 0) -> int:
+        positions = self._positions
+        hi = len(positions)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if cmp(values[positions[mid]], x) < 0:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def bisect_right(
+            self, values: Sequence[Any], x: Any,
+            cmp: Callable[[Any, Any], int], lo: int = 0) -> int:
+        positions = self._positions
+        hi = len(positions)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if cmp(x, values[positions[mid]]) < 0:
+                hi = mid
+            else:
+                lo = mid + 1
+        return lo
+
+    def __sizeof__(self) -> int:
+        # a mapped file is not counted: it is not resident
+        positions = self._positions
+        if isinstance(positions, memoryview):
+            return object.__sizeof__(self) + sys.getsizeof(positions)
+        return object.__sizeof__(self) + positions.__sizeof__()
+
+
+def create_sorted_index(keys: Sequence[Any]) -> SortedIndex:
+    """
+    :param keys: the sort keys of the values (see `create_sort_keys`)
+    """
+    return SortedIndex(array.array(
+        _POSITION_TYPECODE, sorted(range(len(keys)), key=keys.__getitem__)))
+
+
+def get_index_digest(values: Sequence[Any], locale: str) -> str:
+    """
+    The name of the sorted index of the values, for a collator locale.
+    """
+    h = hashlib.blake2b(locale.encode("utf-8"), digest_size=20)
+    h.update(pickle.dumps(tuple(values), pickle.HIGHEST_PROTOCOL))
+    return h.hexdigest()
+
+
+class IndexStore:
+    """
+    The sorted indexes, one file per index: a header, then the positions
+    as unsigned ints in the native byte order.
+    """
+
+    def __init__(self, directory: str):
+        self._directory = directory
+
+    def _get_path(self, digest: str) -> str:
+        return os.path.join(self._directory, digest + ".idx")
+
+    def load(self, digest: str, count: int) -> Optional[SortedIndex]:
+        """
+        The mapped index, or None if there is no valid index for count
+        values.
+        """
+        try:
+            with open(self._get_path(digest), "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):  # no file, empty file
+            return None
+
+        positions = memoryview(mapped)[_INDEX_HEADER.size:]
+        item_size = array.array(_POSITION_TYPECODE).itemsize
+        expected_header = (
+            _INDEX_MAGIC, sys.byteorder[0].encode("ascii"), item_size, count)
+        if (len(mapped) != _INDEX_HEADER.size + count * item_size
+                or _INDEX_HEADER.unpack_from(mapped) != expected_header):
+            positions.release()
+            mapped.close()
+            return None
+        return SortedIndex(positions.cast(_POSITION_TYPECODE))
+
+    def save(self, digest: str, index: SortedIndex):
+        """
+        Write the index. The file is replaced atomically: concurrent readers
+        see the whole file or nothing.
+        """
+        positions = array.array(_POSITION_TYPECODE, index)
+        os.makedirs(self._directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self._directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(_INDEX_HEADER.pack(
+                    _INDEX_MAGIC, sys.byteorder[0].encode("ascii"),
+                    positions.itemsize, len(positions)))
+                positions.tofile(f)
+            os.replace(tmp_path, self._get_path(digest))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def get_or_create(
+            self, values: Sequence[Any], locale: str,
+            create: Callable[[], SortedIndex]) -> SortedIndex:
+        """
+        Load the index of the values, or create and save it.
+        """
+        digest = get_index_digest(values, locale)
+        index = self.load(digest, len(values))
+        if index is None:
+            index = create()
+            try:
+                self.save(digest, index)
+            except OSError:  # read-only or full disk: keep it in memory
+                pass
+        return index
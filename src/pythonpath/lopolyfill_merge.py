@@ -0,0 +1,123 @@
+# LoPolyfill - Python - A set of 24.8 functions made availaible for 7.2
+# Copyright (C) 2025 Julien Férard.
+#
+# LoPolyfill is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# LoPolyfill is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+Sort very large inputs by runs, then merge the runs.
+
+When the sort keys would not fit in memory, runs of keys are sorted and
+written to temporary files, then merged while the files are read. The keys
+are plain Python keys (see `create_sort_keys`) or rows.
+
+This bounds the memory used by the keys, not the peak memory of a call: the
+add-in receives the whole range and returns the whole result, and the
+collation ranks of the distinct strings are kept in a dict. Only the CLI
+streams its input and output.
+
+The external sort is used above a memory budget (LOPOLYFILL_SORT_MEMORY, in
+bytes): below it, external_sorted_indices returns None and the caller sorts
+in memory.
+"""
+import heapq
+import os
+import pickle
+import tempfile
+from typing import Any, Callable, IO, Iterator, List, Optional, Sequence
+
+
+def int_from_env(name: str) -> Optional[int]:
+    value = os.environ.get(name)
+    if value is None or value == "":
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+# the maximum size of the sort keys in memory, in bytes
+EXTERNAL_SORT_MEMORY = (
+        int_from_env("LOPOLYFILL_SORT_MEMORY") or 512 * 1024 * 1024)
+
+# estimated size of an (key, index) item, and of each column of the key
+_ITEM_BYTES = 136
+_KEY_COLUMN_BYTES = 88
+# items per pickle.dump in a run file
+_BLOCK_SIZE = 4096
+
+
+def external_sorted_indices(
+        count: int, row_key: Callable[[int], Any], key_width: int
+) -> Optional[Iterator[int]]:
+    """
+    Stable argsort of count rows, the sort keys bounded in memory: row_key(i)
+    is called once for each row, runs of (key, index) that fit in
+    EXTERNAL_SORT_MEMORY are sorted and written to temporary files, then the
+    runs are merged while reading the files.
+
+    Only the keys are bounded: whatever row_key reads (the rows, the ranks
+    of the strings) stays in memory, and so does the result of the caller.
+
+    Return None if all the keys fit in memory.
+    """
+    item_bytes = _ITEM_BYTES + _KEY_COLUMN_BYTES * key_width
+    if count * item_bytes <= EXTERNAL_SORT_MEMORY:
+        return None
+
+    run_size = max(1, EXTERNAL_SORT_MEMORY // item_bytes)
+    run_files = []
+    try:
+        for start in range(0, count, run_size):
+            run = sorted(
+                (row_key(i), i)
+                for i in range(start, min(start + run_size, count)))
+            run_files.append(write_run(run))
+            del run
+    except BaseException:
+        for run_file in run_files:
+            run_file.close()
+        raise
+
+    return _merge_runs(run_files)
+
+
+def write_run(run: Sequence[Any]) -> IO[bytes]:
+    """
+    Write the items to a temporary file, by blocks. The file is closed once
+    read_run has read all the items.
+    """
+    run_file = tempfile.TemporaryFile(prefix="lopolyfill")
+    for start in range(0, len(run), _BLOCK_SIZE):
+        pickle.dump(run[start:start + _BLOCK_SIZE], run_file,
+                    pickle.HIGHEST_PROTOCOL)
+    run_file.seek(0)
+    return run_file
+
+
+def read_run(run_file: IO[bytes]) -> Iterator[Any]:
+    try:
+        while True:
+            try:
+                block = pickle.load(run_file)
+            except EOFError:
+                return
+            yield from block
+    finally:
+        run_file.close()
+
+
+def _merge_runs(run_files: List[IO[bytes]]) -> Iterator[int]:
+    # (key, index) items: ties on the key are sorted by index, hence stable
+    for _key, i in heapq.merge(*[read_run(f) for f in run_files]):
+        yield i
@@ -0,0 +1,175 @@
+# LoPolyfill - Python - A set of 24.8 functions made availaible for 7.2
+# Copyright (C) 2025 Julien Férard.
+#
+# LoPolyfill is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# LoPolyfill is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+Optional NumPy backend for numeric ranges.
+
+NumPy is not shipped with LibreOffice: it is imported on first use and every
+function returns None if NumPy is missing, if the input is too small to be
+worth a conversion or if the input is not purely numeric. The caller then
+falls back to the pure Python code.
+
+The functions return indices or values that are used to build exactly the
+same result as the pure Python code.
+"""
+import itertools
+from typing import Any, List, Optional, Sequence
+
+# below this number of cells, the conversion costs more than it saves
+MIN_CELL_COUNT = 10000
+
+# larger ints are not exactly represented by a float64
+_MAX_EXACT_INT = 2 ** 53
+
+_numpy = None
+_numpy_loaded = False
+
+
+def get_numpy() -> Any:
+    global _numpy, _numpy_loaded
+    if not _numpy_loaded:
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        _numpy = numpy
+        _numpy_loaded = True
+    return _numpy
+
+
+def to_float_array(
+        rows: Sequence[Sequence[Any]], floats_only: bool = False
+) -> Any:
+    """
+    Return a 2D float64 array if all the cells are numbers, None otherwise.
+    If floats_only is True, ints are rejected too: the array values may then
+    replace the cells.
+    """
+    np = get_numpy()
+    if np is None or not rows or not rows[0]:
+        return None
+    if len(rows) * len(rows[0]) < MIN_CELL_COUNT:
+        return None
+
+    types = set(map(type, itertools.chain.from_iterable(rows)))
+    if floats_only:
+        if types != {float}:
+            return None
+    elif not types <= {float, int}:
+        return None
+
+    try:
+        arr = np.array(rows, dtype=np.float64)
+    except ValueError:  # ragged
+        return None
+    if arr.ndim != 2 or np.isnan(arr).any():
+        return None
+    if int in types and np.abs(arr).max() > _MAX_EXACT_INT:
+        return None
+    return arr + 0.0  # -0.0 -> 0.0, as Python equality
+
+
+def argsort_rows(
+        rows: Sequence[Sequence[Any]], sort_indices: List[int],
+        ascendings: List[bool]
+) -> Optional[List[int]]:
+    """
+    Stable argsort of the rows on the sort columns
+    """
+    key_rows = [
+        [row[sort_index] for sort_index in sort_indices] for row in rows]
+    arr = to_float_array(key_rows)
+    if arr is None:
+        return None
+
+    np = get_numpy()
+    keys = [
+        arr[:, i] if ascending else -arr[:, i]
+        for i, ascending in enumerate(ascendings)
+    ]
+    # lexsort: the last key is the primary key
+    return np.lexsort(keys[::-1]).tolist()
+
+
+def unique_row_indices(
+        rows: Sequence[Sequence[Any]], uniqueness: bool
+) -> Optional[List[int]]:
+    """
+    Indices of the first occurrences of distinct rows (or of the rows that
+    occur once if uniqueness is True), in the order of the rows.
+    """
+    arr = to_float_array(rows)
+    if arr is None:
+        return None
+
+    np = get_numpy()
+    _values, indices, counts = np.unique(
+        arr, axis=0, return_index=True, return_counts=True)
+    if uniqueness:
+        indices = indices[counts == 1]
+    indices.sort()
+    return indices.tolist()
+
+
+def nonzero_indices(values: Sequence[Any]) -> Optional[List[int]]:
+    """
+    Indices of the truthy values of a vector (FILTER criteria).
+    """
+    arr = to_float_array([values])
+    if arr is None:
+        return None
+
+    np = get_numpy()
+    return np.flatnonzero(arr[0]).tolist()
+
+
+def flatten(
+        rows: Sequence[Sequence[Any]], scan_by_col: bool
+) -> Optional[List[float]]:
+    """
+    The values, row by row or column by column (TOCOL, TOROW). Since the
+    values are all numbers, there are no blanks nor errors to ignore.
+    """
+    arr = to_float_array(rows, floats_only=True)
+    if arr is None:
+        return None
+
+    return arr.ravel(order="F" if scan_by_col else "C").tolist()
+
+
+def wrap(
+        values: Sequence[Any], wrap_count: int, pad_with: Any,
+        by_col: bool
+) -> Optional[List[List[float]]]:
+    """
+    Wrap a vector in rows of wrap_count values (WRAPROWS), or in columns of
+    wrap_count values (WRAPCOLS). Return None if padding would require
+    a non number.
+    """
+    if len(values) % wrap_count != 0 and type(pad_with) is not float:
+        return None
+    arr = to_float_array([values], floats_only=True)
+    if arr is None:
+        return None
+
+    np = get_numpy()
+    missing = -len(values) % wrap_count
+    flat = arr[0]
+    if missing:
+        flat = np.concatenate((flat, np.full(missing, pad_with)))
+    wrapped = flat.reshape(-1, wrap_count)
+    if by_col:
+        wrapped = wrapped.T
+    return wrapped.tolist()
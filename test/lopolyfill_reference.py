@@ -0,0 +1,307 @@
+# LoPolyfill - Python - A set of 24.8 functions made availaible for 7.2
+# Copyright (C) 2025 Julien Férard.
+#
+# LoPolyfill is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# LoPolyfill is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+Reference implementations of the LOP functions, used as an oracle by
+test_lopolyfill_differential.
+
+This is the straightforward code: values are compared one pair at a time
+with the collator (float < str < None), searches are linear, sorts are
+stable sorts on a comparison function. No sort key, no index, no NumPy, no
+state: keep it that way, the optimised paths of lopolyfill_funcs must
+return the same results.
+"""
+import collections
+import functools
+from typing import Any, Callable, List, Optional, Sequence
+
+from lopolyfill_funcs import DataArray, DataRow
+
+
+def cmp_values(oCollator, x: Any, y: Any) -> int:
+    """
+    float < str < None. Strings are compared by the collator.
+    """
+    def rank(v: Any) -> int:
+        if isinstance(v, (int, float)):
+            return 0
+        elif isinstance(v, str):
+            return 1
+        else:
+            return 2
+
+    rx, ry = rank(x), rank(y)
+    if rx != ry:
+        return -1 if rx < ry else 1
+    elif rx == 0:
+        return (x > y) - (x < y)
+    elif rx == 1:
+        c = oCollator.compareString(x, y)
+        return (c > 0) - (c < 0)
+    else:
+        return 0
+
+
+def create_cmp_rows(
+        oCollator, sort_indices: Sequence[int], ascendings: Sequence[bool]
+) -> Callable[[DataRow, DataRow], int]:
+    def cmp_rows(row1: DataRow, row2: DataRow) -> int:
+        for i, ascending in zip(sort_indices, ascendings):
+            c = cmp_values(oCollator, row1[i], row2[i])
+            if c != 0:
+                return c if ascending else -c
+        return 0
+
+    return cmp_rows
+
+
+def sort_rows(
+        oCollator, rows: DataArray, sort_indices: Sequence[int],
+        ascendings: Sequence[bool]
+) -> List[DataRow]:
+    """
+    SORT by row (0-based sort indices). The sort is stable.
+    """
+    return sorted(rows, key=functools.cmp_to_key(
+        create_cmp_rows(oCollator, sort_indices, ascendings)))
+
+
+def sort_by(
+        oCollator, rows: DataArray, by_columns: Sequence[Sequence[Any]],
+        ascendings: Sequence[bool]
+) -> List[DataRow]:
+    """
+    SORTBY by row: by_columns are the values of the sort by ranges.
+    """
+    keyed_rows = [
+        tuple(column[i] for column in by_columns) + (row,)
+        for i, row in enumerate(rows)
+    ]
+    return [
+        keyed_row[-1] for keyed_row in sort_rows(
+            oCollator, keyed_rows, range(len(by_columns)), ascendings)
+    ]
+
+
+def unique_rows(rows: DataArray, exactly_once: bool) -> List[DataRow]:
+    rows = [tuple(row) for row in rows]
+    counter = collections.Counter(rows)
+    ret = []
+    for row in rows:
+        if exactly_once:
+            if counter[row] == 1:
+                ret.append(row)
+        elif row not in ret:
+            ret.append(row)
+    return ret
+
+
+def unique_by_keys(
+        rows: DataArray, key_indices: Sequence[int], exactly_once: bool,
+        keep_last: bool
+) -> List[DataRow]:
+    keys = [tuple(row[k] for k in key_indices) for row in rows]
+    counter = collections.Counter(keys)
+    ret = []
+    for i, row in enumerate(rows):
+        key = keys[i]
+        if exactly_once:
+            kept = counter[key] == 1
+        elif keep_last:
+            kept = key not in keys[i + 1:]
+        else:
+            kept = key not in keys[:i]
+        if kept:
+            ret.append(row)
+    return ret
+
+
+def filter_rows(
+        rows: DataArray, include: Sequence[Any], default_value: Any
+) -> List[Any]:
+    ret = [row for row, c in zip(rows, include) if c]
+    if ret:
+        return ret
+    return [] if default_value is None else [[default_value]]
+
+
+def find_index(
+        oCollator, criterion: Any, values: Sequence[Any], match_mode: int,
+        reverse: bool
+) -> Optional[int]:
+    """
+    XMATCH (0-based) with match mode 0 (exact), -1 (exact or next smaller)
+    or 1 (exact or next larger). The first match, or the last if reverse.
+    Among equal candidates, the first (or last) one is kept.
+    """
+    indices = range(len(values))
+    if reverse:
+        indices = reversed(indices)
+
+    best = None
+    for i in indices:
+        value = values[i]
+        if isinstance(criterion, str):
+            if isinstance(value, str) and oCollator.compareString(
+                    value, criterion) == 0:
+                return i
+        elif value == criterion:
+            return i
+
+        if match_mode == 0:
+            continue
+        c = cmp_values(oCollator, value, criterion)
+        if c == match_mode and (best is None or cmp_values(
+                oCollator, value, values[best]) == -match_mode):
+            best = i
+    return best
+
+
+def query(
+        oCollator, rows: DataArray, include: Optional[Sequence[Any]],
+        sort_indices: Optional[Sequence[int]],
+        ascendings: Optional[Sequence[bool]], distinct: bool,
+        limit: Optional[int]
+) -> List[DataRow]:
+    """
+    TAKE(SORT(UNIQUE(FILTER(...)))): each step on the result of the
+    previous one.
+    """
+    if include is not None:
+        rows = [row for row, c in zip(rows, include) if c]
+    if distinct:
+        rows = unique_rows(rows, False)
+    if sort_indices is not None:
+        rows = sort_rows(oCollator, rows, sort_indices, ascendings)
+    rows = list(rows)
+    if limit is None:
+        return rows
+    elif limit > 0:
+        return rows[:limit]
+    else:
+        return rows[limit:]
+
+
+def rank(
+        oCollator, values: Sequence[Any], ascending: bool, method: int
+) -> List[int]:
+    """
+    method: 0 competition (1, 2, 2, 4), 1 dense (1, 2, 2, 3), 2 ordinal
+    (1, 2, 3, 4, ties in the order of the values). The blanks (None and '')
+    have no rank.
+    """
+    sign = 1 if ascending else -1
+    ranked = [v for v in values if v is not None and v != '']
+    ranks = []  # type: List[Optional[int]]
+    i = 0
+    for v in values:
+        if v is None or v == '':
+            ranks.append(None)
+            continue
+        cmps = [sign * cmp_values(oCollator, w, v) for w in ranked]
+        if method == 0:
+            ranks.append(1 + cmps.count(-1))
+        elif method == 1:
+            ranks.append(1 + _count_classes(
+                oCollator, [w for w, c in zip(ranked, cmps) if c == -1]))
+        else:
+            ranks.append(1 + cmps.count(-1) + cmps[:i].count(0))
+        i += 1
+    return ranks
+
+
+def _count_classes(oCollator, values: Sequence[Any]) -> int:
+    """
+    The number of classes of equal values
+    """
+    representatives = []
+    for v in values:
+        if all(cmp_values(oCollator, v, r) != 0 for r in representatives):
+            representatives.append(v)
+    return len(representatives)
+
+
+def expand(
+        rows: DataArray, row_count: Optional[int], col_count: Optional[int],
+        pad_with: Any
+) -> List[DataRow]:
+    if col_count is None:  # the rows are kept as they are
+        return [tuple(row) for row in rows]
+    ret = [
+        tuple(row) + (pad_with,) * (col_count - len(row)) for row in rows
+    ]
+    if row_count is not None:
+        ret += [(pad_with,) * col_count] * (row_count - len(rows))
+    return ret
+
+
+def hstack(*arrays: DataArray) -> List[List[Any]]:
+    """
+    The missing rows of the shorter arrays are None
+    """
+    height = max(len(array) for array in arrays)
+    ret = []
+    for i in range(height):
+        row = []
+        for array in arrays:
+            if i < len(array):
+                row.extend(array[i])
+            else:
+                row.extend([None] * len(array[0]))
+        ret.append(row)
+    return ret
+
+
+def vstack(*arrays: DataArray) -> List[DataRow]:
+    """
+    The missing columns of the narrower arrays are None
+    """
+    width = max(len(array[0]) for array in arrays)
+    return [
+        tuple(row) + (None,) * (width - len(row))
+        for array in arrays for row in array
+    ]
+
+
+def flatten(rows: DataArray, ignore: int, scan_by_col: bool) -> List[Any]:
+    """
+    TOCOL/TOROW values. ignore: 1 blanks (''), 2 errors (None), 3 both.
+    """
+    if scan_by_col:
+        values = [row[j] for j in range(len(rows[0])) for row in rows]
+    else:
+        values = [v for row in rows for v in row]
+    return [
+        v for v in values
+        if not (ignore in (1, 3) and v == '')
+        and not (ignore in (2, 3) and v is None)
+    ]
+
+
+def wrap_rows(
+        values: Sequence[Any], wrap_count: int, pad_with: Any
+) -> List[List[Any]]:
+    values = list(values)
+    while len(values) % wrap_count:
+        values.append(pad_with)
+    return [
+        values[i:i + wrap_count] for i in range(0, len(values), wrap_count)
+    ]
+
+
+def wrap_cols(
+        values: Sequence[Any], wrap_count: int, pad_with: Any
+) -> List[List[Any]]:
+    return [list(col) for col in zip(*wrap_rows(values, wrap_count, pad_with))]
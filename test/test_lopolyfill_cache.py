@@ -0,0 +1,297 @@
+# LoPolyfill - Python - A set of 24.8 functions made availaible for 7.2
+# Copyright (C) 2025 Julien Férard.
+#
+# LoPolyfill is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# LoPolyfill is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import itertools
+import sys
+import unittest
+
+from lopolyfill_cache import (
+    CacheRegistry, DocumentTracker, ResultCache, RowsKey, digest,
+    estimate_size, fingerprint, prefix_matches, to_key)
+from lopolyfill_funcs import LopUnique
+from lopolyfill_index import create_bloom_filter
+
+DATA = tuple((i, "a{}".format(i), float(i)) for i in range(100))
+
+
+class EstimateSizeTestCase(unittest.TestCase):
+    def test_estimate(self):
+        self.assertGreater(estimate_size(DATA), 100 * 3 * 24)
+        self.assertLess(estimate_size(DATA[:10]), estimate_size(DATA))
+        self.assertEqual(estimate_size(1.0), estimate_size(2.0))
+
+
+class FingerprintTestCase(unittest.TestCase):
+    def test_fingerprint(self):
+        copy = tuple(tuple(row) for row in DATA)
+        self.assertEqual(fingerprint(DATA), fingerprint(copy))
+        self.assertEqual(fingerprint(DATA[:40]), fingerprint(DATA, 40))
+        self.assertNotEqual(fingerprint(DATA[:40]), fingerprint(DATA, 41))
+        self.assertNotEqual(fingerprint(((1,),)), fingerprint(((1.0,),)))
+        self.assertEqual(fingerprint(()), fingerprint((), 0))
+
+    def test_digest(self):
+        self.assertEqual(digest(DATA[:40]), digest(DATA, 40))
+        self.assertNotEqual(digest(DATA), digest(DATA[1:]))
+        rows = tuple((float(i),) for i in range(3000))
+        self.assertEqual(digest(rows[:2500]), digest(rows, 2500))
+
+    def test_digest_hash_collisions(self):
+        # hash(-1) == hash(-2), hash(2.0 ** 61) == hash(1.0)
+        for x, y in ((-1.0, -2.0), (2.0 ** 61, 1.0), (1, 1.0), (0, False)):
+            self.assertNotEqual(digest(((x,),)), digest(((y,),)))
+
+    def test_prefix_matches(self):
+        changed = DATA[:31] + ((31, "b", 31.0),) + DATA[32:]
+        for strict in (True, False):
+            self.assertTrue(prefix_matches(DATA[:40], DATA, strict))
+            self.assertTrue(prefix_matches(DATA, DATA, strict))
+            self.assertFalse(prefix_matches(DATA[1:40], DATA, strict))
+            self.assertFalse(prefix_matches(DATA, DATA[:40], strict))
+            # an unsampled row differs: the fingerprints are equal
+            self.assertEqual(fingerprint(DATA, 40), fingerprint(changed, 40))
+            self.assertFalse(prefix_matches(changed[:40], DATA, strict))
+
+    def test_rows_key(self):
+        changed = DATA[:31] + ((31, "b", 31.0),) + DATA[32:]
+        copy = tuple(tuple(row) for row in DATA)
+        for strict in (True, False):
+            key = RowsKey(DATA, strict)
+            self.assertEqual(key, RowsKey(copy, strict))
+            self.assertEqual(hash(key), hash(RowsKey(copy, strict)))
+            self.assertEqual(hash(key), hash(RowsKey(changed, strict)))
+            self.assertNotEqual(key, RowsKey(changed, strict))
+            self.assertNotEqual(key, RowsKey(DATA[:99], strict))
+        self.assertGreater(sys.getsizeof(RowsKey(DATA)), estimate_size(DATA))
+        # only the fingerprint and the digest
+        self.assertIsNone(RowsKey(DATA, False).rows)
+        self.assertLess(sys.getsizeof(RowsKey(DATA, False)),
+                        estimate_size(DATA) // 2)
+        self.assertEqual(RowsKey(DATA), RowsKey(copy, False))
+        self.assertNotEqual(RowsKey(changed), RowsKey(DATA, False))
+
+
+class CacheRegistryTestCase(unittest.TestCase):
+    def test_cost_aware(self):
+        small = estimate_size(("k", 0)) + estimate_size(DATA[:10])
+        large = estimate_size(("k", 0)) + estimate_size(DATA)
+        registry = CacheRegistry(small * 2 + large - 1)
+        registry.put("a", ("k", 0), DATA[:10], 1.0)  # expensive
+        registry.put("b", ("k", 1), DATA, 1.0)  # large
+        registry.put("a", ("k", 2), DATA[:10], 0.001)  # cheap
+        registry.put("b", ("k", 3), DATA[:10], 1.0)
+
+        # the cheapest entries per byte were evicted
+        with self.assertRaises(KeyError):
+            registry.get("a", ("k", 2))
+        with self.assertRaises(KeyError):
+            registry.get("b", ("k", 1))
+        self.assertEqual(DATA[:10], registry.get("a", ("k", 0)))
+        self.assertEqual(DATA[:10], registry.get("b", ("k", 3)))
+        self.assertLessEqual(registry.size(), registry.max_bytes)
+
+    def test_metrics(self):
+        size = estimate_size(("k", 0)) + estimate_size(None)
+        registry = CacheRegistry(size * 3)
+        for i in range(5):
+            registry.put("a", ("k", i), None, 1.0)
+        registry.get("a", ("k", 4))
+        with self.assertRaises(KeyError):
+            registry.get("a", ("k", 0))
+        metrics = registry.get_metrics()["a"]
+        self.assertEqual(
+            {"count": 3, "size": registry.size("a"), "hits": 1, "misses": 1,
+             "evictions": 2, "evicted_bytes": 2 * size},
+            metrics)
+        self.assertEqual(registry.size(), registry.size("a"))
+        registry.put("b", ("k", 0), None)
+        registry.clear("a")
+        self.assertEqual((1, 0, 1), (
+            registry.count(), registry.count("a"), registry.count("b")))
+        registry.clear()
+        self.assertEqual((0, 0), (registry.count(), registry.size()))
+
+
+class MockDocument:
+    def __init__(self, uid):
+        self.RuntimeUID = uid
+        self.CharLocale = "fr-FR-"
+        self.listeners = []
+
+    def addCloseListener(self, listener):
+        self.listeners.append(listener)
+
+    def close(self):
+        for listener in self.listeners:
+            listener.notifyClosing(None)
+        for listener in self.listeners:
+            listener.disposing(None)
+
+
+class MockDocumentListener:
+    def __init__(self, on_close):
+        self._on_close = on_close
+
+    def notifyClosing(self, _event):
+        self._on_close()
+
+    def disposing(self, _event):
+        self._on_close()
+
+
+class DocumentTrackerTestCase(unittest.TestCase):
+    def test_close(self):
+        registry = CacheRegistry(1024 * 1024)
+        tracker = DocumentTracker(registry.clear_owner, MockDocumentListener)
+        doc1 = MockDocument("1")
+        doc2 = MockDocument("2")
+        results = ResultCache(registry, "results")
+        collators = ResultCache(registry, "collators")
+        for doc in (doc1, doc2, doc1):
+            uid = tracker.track(doc)
+            results.memoize("f", (uid, DATA), lambda: DATA[:10], uid)
+            collators.memoize("c", (uid,), lambda: object(), uid)
+        results.memoize("g", (DATA,), lambda: DATA[:10])
+        self.assertEqual((2, 1), (len(tracker), len(doc1.listeners)))
+        self.assertEqual(5, registry.count())
+
+        doc1.close()
+        self.assertEqual((1, 3), (len(tracker), registry.count()))
+        self.assertEqual((2, 1), (len(results), len(collators)))
+        doc2.close()
+        self.assertEqual((0, 1), (len(tracker), registry.count()))
+
+        # a closed document is tracked again if it is used again
+        tracker.track(doc1)
+        self.assertEqual((1, 2), (len(tracker), len(doc1.listeners)))
+
+    def test_state_change(self):
+        registry = CacheRegistry(1024 * 1024)
+        tracker = DocumentTracker(
+            registry.clear_owner, MockDocumentListener,
+            lambda oDoc: oDoc.CharLocale)
+        doc = MockDocument("1")
+        collators = ResultCache(registry, "collators")
+
+        def get_collator():
+            uid = tracker.track(doc)
+            return collators.memoize("c", (uid,), lambda: object(), uid)
+
+        collator = get_collator()
+        self.assertIs(collator, get_collator())
+        # no notification: the change is seen on the next call
+        doc.CharLocale = "sv-SE-"
+        self.assertIsNot(collator, get_collator())
+        self.assertEqual(1, len(collators))
+        self.assertIs(get_collator(), get_collator())
+        self.assertEqual((1, 1), (len(tracker), len(doc.listeners)))
+
+
+class ResultCacheTestCase(unittest.TestCase):
+    def test_memoize(self):
+        cache = ResultCache(CacheRegistry(1024 * 1024), "results")
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return [row[:1] for row in DATA]
+
+        first = cache.memoize("f", (DATA, 1), compute)
+        second = cache.memoize("f", (DATA, 1), compute)
+        self.assertIs(first, second)
+        self.assertEqual(1, len(calls))
+        self.assertEqual((1, 1), (cache.hits, cache.misses))
+
+        cache.memoize("g", (DATA, 1), compute)
+        cache.memoize("f", (DATA, 2), compute)
+        self.assertEqual(3, len(calls))
+
+        # equal but new arguments, as after a recalculation
+        copy = tuple(tuple(row) for row in DATA)
+        cache.memoize("f", (copy, 1), compute)
+        self.assertEqual(3, len(calls))
+
+        # same fingerprint, different rows
+        changed = DATA[:31] + ((31, "b", 31.0),) + DATA[32:]
+        cache.memoize("f", (changed, 1), compute)
+        self.assertEqual(4, len(calls))
+
+    def test_hash_collision(self):
+        # hash(-1.0) == hash(-2.0): an unsampled cell changes
+        rows = tuple((float(i % 7),) for i in range(100))
+        rows = rows[:31] + ((-1.0,),) + rows[32:]
+        changed = rows[:31] + ((-2.0,),) + rows[32:]
+        lop_unique = LopUnique(ValueError)
+        cache = ResultCache(CacheRegistry(1024 * 1024), "results")
+        for in_range in (rows, changed):
+            self.assertEqual(
+                lop_unique.execute(in_range, False, False),
+                cache.memoize("lopUnique", (in_range, False, False),
+                              lambda: lop_unique.execute(
+                                  in_range, False, False)))
+
+        bloom_filters = ResultCache(CacheRegistry(1024 * 1024), "bloom")
+        for in_range, value in ((rows, -1.0), (changed, -2.0)):
+            bloom_filter = bloom_filters.memoize(
+                "bloom", (in_range,), lambda: create_bloom_filter(
+                    itertools.chain.from_iterable(in_range)))
+            self.assertTrue(bloom_filter.might_contain(value))
+
+    def test_entries_without_ranges(self):
+        # new equal ranges, as after recalculations: one small entry
+        cache = ResultCache(CacheRegistry(1024 * 1024), "results")
+        for _ in range(3):
+            copy = tuple(tuple(row) for row in DATA)
+            self.assertEqual(1, cache.memoize("f", (copy, 1), lambda: 1))
+        self.assertEqual((1, 2), (len(cache), cache.hits))
+        self.assertLess(cache.size, estimate_size(DATA) // 2)
+
+    def test_unhashable(self):
+        cache = ResultCache(CacheRegistry(1024 * 1024), "results")
+        self.assertEqual(3, cache.memoize("f", ([1, 2],), lambda: 3))
+        self.assertEqual(0, len(cache))
+
+    def test_lru_budget(self):
+        size = estimate_size(("f", to_key((DATA, 0)))) + estimate_size(DATA)
+        cache = ResultCache(CacheRegistry(size * 3), "results")
+        for i in range(3):
+            cache.put(("f", to_key((DATA, i))), DATA, 1.0)
+        self.assertEqual(3, len(cache))
+        cache.memoize("f", (DATA, 0), lambda: DATA)  # 0 is now the MRU
+        cache.put(("f", to_key((DATA, 3))), DATA, 1.0)
+        self.assertEqual(3, len(cache))
+        self.assertLessEqual(cache.size, size * 3)
+
+        calls = []
+        cache.memoize("f", (DATA, 0), lambda: calls.append(0))
+        cache.memoize("f", (DATA, 1), lambda: calls.append(1))
+        self.assertEqual([1], calls)
+
+    def test_pop(self):
+        cache = ResultCache(CacheRegistry(1024 * 1024), "results")
+        cache.put("k", DATA)
+        self.assertIs(DATA, cache.pop("k"))
+        self.assertEqual((0, 0), (len(cache), cache.size))
+        self.assertIsNone(cache.pop("k"))
+
+    def test_too_large(self):
+        cache = ResultCache(CacheRegistry(100), "results")
+        cache.memoize("f", (DATA,), lambda: DATA)
+        self.assertEqual(0, len(cache))
+        self.assertEqual(0, cache.size)
+
+
+if __name__ == "__main__":
+    unittest.main()
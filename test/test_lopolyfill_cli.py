@@ -0,0 +1,145 @@
+# LoPolyfill - Python - A set of 24.8 functions made availaible for 7.2
+# Copyright (C) 2025 Julien Férard.
+#
+# LoPolyfill is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# LoPolyfill is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import io
+import os
+import random
+import tempfile
+import unittest
+
+import lopolyfill_cli
+from lopolyfill_cli import (
+    LocalCollator, lookup_rows, read_rows, sort_rows, unique_rows,
+    write_rows)
+from lopolyfill_funcs import LopSort, LopUnique, LopXMatch
+
+
+def _random_rows(seed, count):
+    rnd = random.Random(seed)
+    return [
+        (rnd.choice(["a", "B", "b", "c", None, 1.0]), float(rnd.randint(0, 9)))
+        for _ in range(count)
+    ]
+
+
+class CsvTestCase(unittest.TestCase):
+    def test_read_write(self):
+        rows = list(read_rows(io.StringIO('a,1,,"x,y"\n2.5,B,-3\n'), ","))
+        self.assertEqual(
+            [("a", 1.0, "", "x,y"), (2.5, "B", -3.0)], rows)
+        output = io.StringIO()
+        write_rows(output, ";", rows)
+        self.assertEqual("a;1;;x,y\n2.5;B;-3\n", output.getvalue())
+
+    def test_not_finite(self):
+        self.assertEqual(
+            [("nan", "inf", "-Infinity", 1e300)],
+            list(read_rows(io.StringIO("nan,inf,-Infinity,1e300\n"), ",")))
+
+    def test_blanks_as_calc(self):
+        # Calc passes blank cells as empty strings: they are strings for
+        # SORT, and None (an error) is not a blank
+        rows = list(read_rows(io.StringIO("b,1\n,2\na,3\n"), ","))
+        self.assertEqual(
+            LopSort(LocalCollator(), ValueError).sort(
+                [("b", 1.0), ("", 2.0), ("a", 3.0)], 1, 1, None),
+            list(sort_rows(iter(rows), 1, 1)))
+        self.assertEqual([("", 2.0), ("a", 3.0), ("b", 1.0)],
+                         list(sort_rows(iter(rows), 1, 1)))
+
+
+class SortTestCase(unittest.TestCase):
+    def test_sort_by_chunks(self):
+        rows = _random_rows(1, 500)
+        expected = LopSort(LocalCollator(), ValueError).sort(
+            rows, ((1, 2),), ((1, -1),), None)
+        for chunk_rows in (7, 100, 500, 1000):
+            self.assertEqual(
+                expected,
+                list(sort_rows(iter(rows), ((1, 2),), ((1, -1),),
+                               chunk_rows)))
+
+    def test_bad_sort_index(self):
+        with self.assertRaises(ValueError):
+            list(sort_rows(iter([(1,), (2,)]), 2, None, 1))
+
+
+class UniqueTestCase(unittest.TestCase):
+    def test_unique(self):
+        rows = _random_rows(2, 300)
+        for exactly_once in (False, True):
+            self.assertEqual(
+                LopUnique(ValueError).execute(rows, None, exactly_once),
+                list(unique_rows(lambda: iter(rows), exactly_once)))
+
+
+class LookupTestCase(unittest.TestCase):
+    def test_lookup(self):
+        table = [("b", 1.0), ("A", 2.0), (3.0, 3.0), ("a", 4.0), ("c", 5.0)]
+        rows = [(v,) for v in ["a", "B", 3.0, "d", 0.0, None]]
+        lop_xmatch = LopXMatch(LocalCollator(), ValueError, True)
+        for match_mode in (0, -1, 1):
+            expected = []
+            for row in rows:
+                found = ["-"] if row[0] is None else lop_xmatch.lookup(
+                    row[0], [(k,) for k, _v in table], table, "-",
+                    match_mode, None)[0]
+                # the default value fills the row
+                expected.append(row + tuple(found) * (2 // len(found)))
+            self.assertEqual(expected, list(lookup_rows(
+                rows, table, 0, 0, None, "-", match_mode)), match_mode)
+
+    def test_return_columns(self):
+        self.assertEqual([("a", 2.0), ("z", None)], list(lookup_rows(
+            [("a",), ("z",)], [("b", 1.0), ("A", 2.0)], 0, 0, [1], None,
+            0)))
+
+
+class MainTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.input = os.path.join(self.tmp_dir.name, "in.csv")
+        self.output = os.path.join(self.tmp_dir.name, "out.csv")
+        with open(self.input, "w", encoding="utf-8") as f:
+            f.write("name,n\nb,2\na,3\nB,1\na,3\n")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _read_output(self):
+        with open(self.output, encoding="utf-8") as f:
+            return f.read()
+
+    def test_sort(self):
+        self.assertEqual(0, lopolyfill_cli.main([
+            "sort", self.input, "--header", "-k", "1", "-k", "2", "-r", "1",
+            "-r", "-1", "-o", self.output]))
+        self.assertEqual("name,n\na,3\na,3\nb,2\nB,1\n", self._read_output())
+
+    def test_unique(self):
+        self.assertEqual(0, lopolyfill_cli.main([
+            "unique", self.input, "--header", "--exactly-once",
+            "-o", self.output]))
+        self.assertEqual("name,n\nb,2\nB,1\n", self._read_output())
+
+    def test_error(self):
+        with self.assertRaises(SystemExit) as cm:
+            lopolyfill_cli.main(
+                ["sort", self.input, "-k", "3", "-o", self.output])
+        self.assertEqual(2, cm.exception.code)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,255 @@
+# LoPolyfill - Python - A set of 24.8 functions made availaible for 7.2
+# Copyright (C) 2025 Julien Férard.
+#
+# LoPolyfill is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# LoPolyfill is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import random
+import unittest
+
+from lopolyfill_collation import (
+    CheckedCollator, collation_key, create_checked_collator)
+from lopolyfill_funcs import (
+    AppendState, IndexFinder, LopQuery, LopSort, create_collation_ranks,
+    create_sort_keys, create_typed_key_func)
+from lopolyfill_index import create_sorted_index, normalize_string
+
+
+class KeyCollator:
+    """A reference collator: compares transformed local keys"""
+
+    def __init__(self, transform=lambda s: s):
+        self.transform = transform
+        self.call_count = 0
+
+    def compareString(self, s1: str, s2: str) -> int:
+        self.call_count += 1
+        k1 = collation_key(self.transform(s1.casefold()))
+        k2 = collation_key(self.transform(s2.casefold()))
+        return (k1 > k2) - (k1 < k2)
+
+
+def swedish(s):
+    return s.replace("å", "z{").replace("ä", "z|").replace("ö", "z}")
+
+
+def x_after_y(s):
+    return s.replace("x", "yz")
+
+
+def katakana_as_hiragana(s):
+    return "".join(
+        chr(ord(c) - 0x60) if "ァ" <= c <= "ヶ" else c for c in s)
+
+
+class CollationKeyTestCase(unittest.TestCase):
+    def test_equal(self):
+        self.assertEqual(collation_key("Résumé"), collation_key("rÉSUMÉ"))
+        self.assertEqual(collation_key("Straße"), collation_key("STRASSE"))
+        self.assertNotEqual(collation_key("resume"), collation_key("résumé"))
+
+    def test_order(self):
+        for strings in (
+                ["", " ", "-", "$", "10", "9", "a", "a b", "ab", "b"],
+                ["peche", "péché", "pèche", "pêche", "pechf"],
+                ["ae", "æ", "af", "o", "ø", "of"],
+        ):
+            self.assertEqual(strings, sorted(
+                reversed(strings), key=collation_key))
+
+
+class CheckedCollatorTestCase(unittest.TestCase):
+    def test_probes(self):
+        self.assertIsInstance(
+            create_checked_collator(KeyCollator()), CheckedCollator)
+        swedish_collator = KeyCollator(swedish)
+        self.assertIs(swedish_collator,
+                      create_checked_collator(swedish_collator))
+
+    def test_sampled_check(self):
+        collator = CheckedCollator(KeyCollator(x_after_y), 2)
+        self.assertEqual(-1, collator.compareString("w", "y"))
+        self.assertTrue(collator.local)
+        self.assertEqual(1, collator.compareString("x", "y"))
+        self.assertFalse(collator.local)
+        self.assertEqual(1, collator.compareString("x", "y"))
+
+    def test_ranks(self):
+        reference = KeyCollator()
+        collator = CheckedCollator(reference)
+        strings = ["b", "A", "a", "é", "c", "e", "B"]
+        self.assertEqual(
+            create_collation_ranks(reference, strings),
+            create_collation_ranks(collator, strings))
+        reference.call_count = 0
+        create_collation_ranks(collator, strings)
+        self.assertEqual(6, reference.call_count)  # 7 distinct strings
+
+    def test_ranks_fallback(self):
+        collator = CheckedCollator(KeyCollator(x_after_y))
+        self.assertEqual({"w": 0, "y": 1, "x": 2, "z": 3},
+                         create_collation_ranks(collator, "xwzy"))
+        self.assertFalse(collator.local)
+
+    def test_sort(self):
+        rnd = random.Random(1)
+        rows = tuple(
+            ("".join(rnd.choice("aAbéèeE -z") for _ in range(3)), i)
+            for i in range(300))
+        self.assertEqual(
+            LopSort(KeyCollator(), ValueError).sort(rows, 1, -1, None),
+            LopSort(CheckedCollator(KeyCollator()), ValueError).sort(
+                rows, 1, -1, None))
+
+
+def _random_values(seed, count):
+    rnd = random.Random(seed)
+    return [
+        rnd.choice([
+            None, float(rnd.randint(0, 20)),
+            "".join(rnd.choice("aAbéèe -") for _ in range(rnd.randint(0, 3)))
+        ])
+        for _ in range(count)
+    ]
+
+
+class TypedKeyTestCase(unittest.TestCase):
+    def test_typed_key(self):
+        self.assertIsNone(create_typed_key_func(KeyCollator()))
+        typed_key = create_typed_key_func(CheckedCollator(KeyCollator()))
+        self.assertEqual(
+            [-1.0, 3, "", "a", "B", None],
+            sorted([None, "B", 3, "", "a", -1.0], key=typed_key))
+        self.assertEqual(typed_key("É"), typed_key("é"))
+
+    def test_index_finder(self):
+        reference = KeyCollator()
+        plain = IndexFinder(reference, ValueError, True)
+        keyed = IndexFinder(CheckedCollator(reference), ValueError, True)
+        values = _random_values(1, 200)
+        sorted_values = sorted(
+            values, key=create_typed_key_func(CheckedCollator(reference)))
+        sorted_index = create_sorted_index(
+            create_sort_keys(reference, values))
+        indexed = IndexFinder(CheckedCollator(reference), ValueError, True,
+                              sorted_index=sorted_index)
+        reference.call_count = 0
+        for criterion in _random_values(2, 100):
+            if criterion is None:
+                continue
+            for match_mode in (0, -1, 1):
+                for reverse in (False, True):
+                    expected = plain.find_index(
+                        criterion, values, match_mode, reverse)
+                    self.assertEqual(expected, keyed.find_index(
+                        criterion, values, match_mode, reverse))
+                    self.assertEqual(expected, indexed.find_index(
+                        criterion, values, match_mode, reverse))
+                    self.assertEqual(
+                        plain.binary_find_index(
+                            criterion, sorted_values, match_mode, reverse),
+                        keyed.binary_find_index(
+                            criterion, sorted_values, match_mode, reverse))
+        # the keyed finder checks the comparisons of a bisection, and the
+        # candidates of an exact search only
+        plain_count = reference.call_count
+        reference.call_count = 0
+        keyed.binary_find_index("ab", sorted_values, 0, False)
+        self.assertLessEqual(reference.call_count, 10)
+        reference.call_count = 0
+        keyed.find_index("ab", values, 0, False)
+        self.assertLessEqual(reference.call_count, sum(
+            isinstance(v, str) and normalize_string(v) == "ab"
+            for v in values))
+        self.assertGreater(plain_count, 0)
+
+    def test_index_finder_disagreement(self):
+        # the collator ignores the differences between katakana and
+        # hiragana, the local keys don't
+        reference = KeyCollator(katakana_as_hiragana)
+        values = ["k{}".format(i) for i in range(5000)]
+        values[4000] = "か"
+        collator = create_checked_collator(reference)
+        self.assertIsInstance(collator, CheckedCollator)
+        finder = IndexFinder(collator, ValueError, True)
+        reference.call_count = 0
+        for _ in range(200):
+            self.assertEqual(4000, finder.find_index("カ", values, 0, False))
+        # one candidate per search
+        self.assertEqual(200, reference.call_count)
+        self.assertFalse(collator.local)
+
+        for match_mode in (0, -1, 1):
+            collator = CheckedCollator(reference)
+            sorted_values = sorted(values, key=collation_key)
+            self.assertEqual(
+                sorted_values.index("か"),
+                IndexFinder(collator, ValueError, True).binary_find_index(
+                    "カ", sorted_values, match_mode, False))
+            self.assertEqual(
+                values.index("か"),
+                IndexFinder(collator, ValueError, True, sorted_index=(
+                    create_sorted_index(create_sort_keys(reference, values)))
+                ).find_index("カ", values, match_mode, False))
+
+    def test_sort_appended(self):
+        rows = tuple(zip(_random_values(3, 300), range(300)))
+        for sort_order in (1, -1):
+            lop_sort = LopSort(CheckedCollator(KeyCollator()), ValueError)
+            state = lop_sort.sort_appended(None, rows[:200], 1, sort_order)
+            state = lop_sort.sort_appended(
+                AppendState(state.rows, state.result), rows, 1, sort_order)
+            self.assertEqual(
+                LopSort(KeyCollator(), ValueError).sort(
+                    rows, 1, sort_order, None),
+                state.result)
+
+    def test_sort_appended_disagreement(self):
+        reference = KeyCollator(katakana_as_hiragana)
+        collator = create_checked_collator(reference)
+        self.assertIsInstance(collator, CheckedCollator)
+        rows = (("き",), ("か",), ("く",), ("カ",))
+        lop_sort = LopSort(collator, ValueError)
+        state = lop_sort.sort_appended(None, rows[:3], 1, 1)
+        self.assertTrue(collator.local)
+        state = lop_sort.sort_appended(state, rows, 1, 1)
+        self.assertEqual(
+            LopSort(reference, ValueError).sort(rows, 1, 1, None),
+            state.result)
+        self.assertEqual([("か",), ("カ",), ("き",), ("く",)], state.result)
+        self.assertFalse(collator.local)
+
+    def test_query(self):
+        rows = tuple(zip(_random_values(4, 300), _random_values(5, 300)))
+        for limit in (5, -5):
+            self.assertEqual(
+                LopQuery(KeyCollator(), ValueError).execute(
+                    rows, None, ((1, 2),), ((-1, 1),), True, limit),
+                LopQuery(CheckedCollator(KeyCollator()), ValueError).execute(
+                    rows, None, ((1, 2),), ((-1, 1),), True, limit))
+
+    def test_query_sort_keys(self):
+        # the distinct strings are sorted once, the rows are not compared
+        # by the collator
+        rows = tuple(("abc"[i % 3], i) for i in range(1000))
+        sorted_rows = LopSort(KeyCollator(), ValueError).sort(
+            rows, 1, -1, None)
+        collator = KeyCollator()
+        f = LopQuery(collator, ValueError).execute
+        self.assertEqual(sorted_rows[:5], f(rows, None, 1, -1, None, 5))
+        self.assertEqual(sorted_rows[-5:], f(rows, None, 1, -1, None, -5))
+        # at most 6 calls per query: the rows are not compared
+        self.assertLessEqual(collator.call_count, 12)
+
+
+if __name__ == "__main__":
+    unittest.main()
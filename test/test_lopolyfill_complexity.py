@@ -0,0 +1,251 @@
+# LoPolyfill - Python - A set of 24.8 functions made availaible for 7.2
+# Copyright (C) 2025 Julien Férard.
+#
+# LoPolyfill is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# LoPolyfill is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+Complexity regression benchmark: each function is run on doubling input
+sizes and the growth exponent of its duration is fitted (the slope of
+log(duration) / log(size)). A function fails if the exponent exceeds its
+declared complexity class plus the tolerance.
+
+    LOPOLYFILL_BENCHMARK=1 python -m pytest -q test/test_lopolyfill_complexity.py
+"""
+import gc
+import math
+import os
+import random
+import time
+import unittest
+from typing import Any, Callable, List, Sequence, Tuple
+
+from lopolyfill_funcs import (
+    LopArrayHandling, LopFilter, LopQuery, LopRandarray, LopRank, LopRunning,
+    LopSequence, LopSort, LopUnique, LopXMatch)
+from test.test_lopolyfill_funcs import SimpleCollator
+
+BENCHMARK = os.environ.get("LOPOLYFILL_BENCHMARK", "0") != "0"
+SIZES = [2 ** k for k in range(12, 17)]
+REPEAT = 3
+TOLERANCE = float(os.environ.get("LOPOLYFILL_BENCHMARK_TOLERANCE", "0.3"))
+
+# the complexity classes, as exponents
+CONSTANT = 0.0
+LINEAR = 1.0
+N_LOG_N = 1.1  # the slope of n log n between the sizes
+QUADRATIC = 2.0
+
+
+def fit_exponent(sizes: Sequence[int], durations: Sequence[float]) -> float:
+    """
+    The least squares slope of log(duration) against log(size).
+    """
+    xs = [math.log(n) for n in sizes]
+    ys = [math.log(d) for d in durations]
+    x_mean = sum(xs) / len(xs)
+    y_mean = sum(ys) / len(ys)
+    return sum(
+        (x - x_mean) * (y - y_mean) for x, y in zip(xs, ys)
+    ) / sum((x - x_mean) ** 2 for x in xs)
+
+
+def measure(create_call: Callable[[int], Callable[[], Any]],
+            sizes: Sequence[int] = SIZES, repeat: int = REPEAT
+            ) -> List[float]:
+    """
+    The best duration of the call for each size. The arguments are created
+    before the time is measured.
+    """
+    durations = []
+    gc_enabled = gc.isenabled()
+    try:
+        for n in sizes:
+            call = create_call(n)
+            best = math.inf
+            for _ in range(repeat):
+                gc.collect()
+                gc.disable()
+                start = time.perf_counter()
+                call()
+                best = min(best, time.perf_counter() - start)
+                gc.enable()
+            durations.append(best)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return durations
+
+
+def _random_values(rnd: random.Random, n: int) -> List[Any]:
+    return [
+        rnd.choice([
+            float(rnd.randint(0, n)), "k{}".format(rnd.randint(0, n)), None])
+        for _ in range(n)
+    ]
+
+
+def _create_rows(n: int, seed: int = 0) -> Tuple[Tuple[Any, ...], ...]:
+    rnd = random.Random(seed)
+    return tuple(zip(
+        _random_values(rnd, n), _random_values(rnd, n),
+        [float(i) for i in range(n)]))
+
+
+def _create_column(n: int, seed: int = 0) -> Tuple[Tuple[Any, ...], ...]:
+    rnd = random.Random(seed)
+    return tuple((v,) for v in _random_values(rnd, n))
+
+
+def _create_sorted_column(n: int) -> Tuple[Tuple[Any, ...], ...]:
+    return tuple((float(i),) for i in range(n))
+
+
+def _sort(n: int) -> Callable[[], Any]:
+    rows = _create_rows(n)
+    return lambda: LopSort(SimpleCollator(), ValueError).sort(
+        rows, [[1, 2]], [[1, -1]], None)
+
+
+def _sort_appended(n: int) -> Callable[[], Any]:
+    rows = _create_rows(n + n // 8)
+    lop_sort = LopSort(SimpleCollator(), ValueError)
+    state = lop_sort.sort_appended(None, rows[:n], 1, 1)
+    return lambda: lop_sort.sort_appended(state, rows, 1, 1)
+
+
+def _sort_by(n: int) -> Callable[[], Any]:
+    rows = _create_rows(n)
+    by = _create_column(n, 1)
+    return lambda: LopSort(SimpleCollator(), ValueError).sort_by(
+        rows, by, -1, *[None] * 28)
+
+
+def _unique_appended(n: int) -> Callable[[], Any]:
+    rows = _create_rows(n + n // 8)
+    lop_unique = LopUnique(ValueError)
+    state = lop_unique.execute_appended(None, rows[:n], True)
+    return lambda: lop_unique.execute_appended(state, rows, True)
+
+
+def _match(match_mode: int, search_mode: int, sorted_range: bool = False
+           ) -> Callable[[int], Callable[[], Any]]:
+    def create_call(n: int) -> Callable[[], Any]:
+        search_range = _create_sorted_column(n) if sorted_range \
+            else _create_column(n)
+        # absent from the range: the linear searches read all the values
+        criterion = n + 0.5
+        lop_xmatch = LopXMatch(SimpleCollator(), ValueError, True)
+        return lambda: [
+            lop_xmatch.match(criterion, search_range, match_mode, search_mode)
+            for _ in range(8)
+        ]
+
+    return create_call
+
+
+def _array(method: str, *args: Any, vector: bool = False
+           ) -> Callable[[int], Callable[[], Any]]:
+    def create_call(n: int) -> Callable[[], Any]:
+        rows = _create_column(n) if vector else _create_rows(n)
+        return lambda: getattr(LopArrayHandling(ValueError), method)(
+            rows, *args)
+
+    return create_call
+
+
+# name, declared exponent, function of the size that returns the call
+CASES = [
+    ("FILTER", LINEAR, lambda n: (
+        lambda rows, criteria: lambda: LopFilter(ValueError).execute(
+            rows, criteria, None)
+    )(_create_rows(n), tuple((float(i % 2),) for i in range(n)))),
+    ("RANDARRAY", LINEAR, lambda n: lambda: LopRandarray(ValueError).execute(
+        n, 3, None, None, None)),
+    ("SEQUENCE", LINEAR, lambda n: lambda: LopSequence(ValueError).execute(
+        n, 3, None, None)),
+    ("SORT", N_LOG_N, _sort),
+    # the appended rows are merged into the sorted rows, in linear time
+    ("SORT appended", LINEAR, _sort_appended),
+    ("SORTBY", N_LOG_N, _sort_by),
+    ("UNIQUE", LINEAR, lambda n: (
+        lambda rows: lambda: LopUnique(ValueError).execute(rows, None, True)
+    )(_create_rows(n))),
+    ("UNIQUE appended", LINEAR, _unique_appended),
+    ("UNIQUE by keys", LINEAR, lambda n: (
+        lambda rows: lambda: LopUnique(ValueError).execute_by_keys(
+            rows, 1, None, None, None)
+    )(_create_rows(n))),
+    ("XMATCH exact", LINEAR, _match(0, 1)),
+    ("XMATCH smaller", LINEAR, _match(-1, 1)),
+    ("XMATCH larger", LINEAR, _match(1, 1)),
+    ("XMATCH last", LINEAR, _match(-1, -1)),
+    # LINEAR only because the values are extracted from the range, in O(n):
+    # this case would not catch a linear search on the sorted values
+    ("XMATCH binary", LINEAR, _match(-1, 2, True)),
+    ("CHOOSECOLS", LINEAR, _array("choose_cols", 1, 3)),
+    ("CHOOSEROWS", CONSTANT, _array("choose_rows", 1, -1)),
+    ("DROP", LINEAR, _array("drop", 1, 1)),
+    ("TAKE", CONSTANT, _array("take", -2, 2)),
+    ("EXPAND", LINEAR, _array("expand", None, 5, None)),
+    ("HSTACK", LINEAR, _array("hstack", ((1.0,),))),
+    ("VSTACK", LINEAR, _array("vstack", ((1.0,),))),
+    ("TOCOL", LINEAR, _array("to_col", 1, True)),
+    ("TOROW", LINEAR, _array("to_row", None, None)),
+    ("WRAPCOLS", LINEAR, _array("wrap_cols", 7, None, vector=True)),
+    ("WRAPROWS", LINEAR, _array("wrap_rows", 7, None, vector=True)),
+    ("CUMULATE", LINEAR, lambda n: (
+        lambda rows: lambda: LopRunning(ValueError).cumulate(rows, 9)
+    )(_create_sorted_column(n))),
+    ("MOVING", LINEAR, lambda n: (
+        lambda rows: lambda: LopRunning(ValueError).moving(rows, 10, 4)
+    )(_create_sorted_column(n))),
+    ("RANK", N_LOG_N, lambda n: (
+        lambda rows: lambda: LopRank(SimpleCollator(), ValueError).rank(
+            rows, 1, None)
+    )(_create_column(n))),
+    ("QUERY limit", N_LOG_N, lambda n: (
+        lambda rows: lambda: LopQuery(SimpleCollator(), ValueError).execute(
+            rows, None, 1, 1, True, 100)
+    )(_create_rows(n))),
+    ("QUERY", N_LOG_N, lambda n: (
+        lambda rows: lambda: LopQuery(SimpleCollator(), ValueError).execute(
+            rows, None, 1, -1, True, None)
+    )(_create_rows(n))),
+]
+
+
+class FitExponentTestCase(unittest.TestCase):
+    def test_power(self):
+        for exponent in (0.0, 1.0, 2.0):
+            self.assertAlmostEqual(exponent, fit_exponent(
+                SIZES, [3e-6 * n ** exponent for n in SIZES]))
+
+    def test_n_log_n(self):
+        self.assertAlmostEqual(N_LOG_N, fit_exponent(
+            SIZES, [n * math.log(n) for n in SIZES]), delta=0.01)
+
+
+@unittest.skipUnless(BENCHMARK, "Set LOPOLYFILL_BENCHMARK=1 to run")
+class ComplexityTestCase(unittest.TestCase):
+    def test_complexity(self):
+        for name, declared, create_call in CASES:
+            with self.subTest(name):
+                exponent = fit_exponent(SIZES, measure(create_call))
+                self.assertLessEqual(
+                    exponent, declared + TOLERANCE,
+                    "{}: n^{:.2f} > n^{:.2f}".format(
+                        name, exponent, declared))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,423 @@
+# LoPolyfill - Python - A set of 24.8 functions made availaible for 7.2
+# Copyright (C) 2025 Julien Férard.
+#
+# LoPolyfill is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# LoPolyfill is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+Differential tests: the functions are called on random mixed-type ranges
+and parameters, with each optimised path switched on (NumPy, external
+sorts, local collation keys, Bloom filters, sorted indexes, binary searches,
+appended rows), and the results are compared to the reference
+implementations of lopolyfill_reference.
+
+    LOPOLYFILL_FUZZ_ITERATIONS=1000 LOPOLYFILL_FUZZ_SEED=42 \
+        python -m pytest -q test/test_lopolyfill_differential.py
+"""
+import contextlib
+import os
+import random
+import unittest
+from typing import Any, Callable, Iterator, List, Tuple
+from unittest import mock
+
+import lopolyfill_cli
+import lopolyfill_merge
+import lopolyfill_numpy
+from lopolyfill_collation import CheckedCollator
+from lopolyfill_funcs import (
+    LopArrayHandling, LopFilter, LopQuery, LopRank, LopSort, LopUnique,
+    LopXMatch, create_sort_keys)
+from lopolyfill_index import create_bloom_filter, create_sorted_index
+from test import lopolyfill_reference as reference
+from test.test_lopolyfill_collation import KeyCollator
+from test.test_lopolyfill_funcs import SimpleCollator
+
+ITERATIONS = int(os.environ.get("LOPOLYFILL_FUZZ_ITERATIONS", "30"))
+SEED = int(os.environ.get("LOPOLYFILL_FUZZ_SEED", "0"))
+
+# few distinct values: many ties, and strings that the collators consider
+# equal
+NUMBERS = (-2.0, -1.0, 0.0, 0.5, 1.0, 2.0, 3.0, 10.0)
+STRINGS = (
+    "", "a", "A", "á", "Á", "ab", "aB", "a b", "a-b", "b", "B", "e", "é",
+    "ss", "ß", "z", "Z")
+
+
+@contextlib.contextmanager
+def _pure_python() -> Iterator[None]:
+    with mock.patch.object(lopolyfill_numpy, "get_numpy", lambda: None):
+        yield
+
+
+@contextlib.contextmanager
+def _numpy() -> Iterator[None]:
+    with mock.patch.object(lopolyfill_numpy, "MIN_CELL_COUNT", 0):
+        yield
+
+
+@contextlib.contextmanager
+def _external() -> Iterator[None]:
+    # a few rows per run
+    with _pure_python(), mock.patch.object(
+            lopolyfill_merge, "EXTERNAL_SORT_MEMORY", 2000):
+        yield
+
+
+CONFIGURATIONS = {
+    "python": _pure_python,
+    "numpy": _numpy,
+    "external": _external,
+}
+
+# the collator of the reference, the collator of the functions
+COLLATORS = {
+    "uno": lambda: (SimpleCollator(), SimpleCollator()),
+    "local": lambda: (KeyCollator(), CheckedCollator(KeyCollator())),
+}
+
+
+class Generator:
+    def __init__(self, seed: int):
+        self.rnd = random.Random(seed)
+
+    def value(self, numbers_only: bool = False) -> Any:
+        rnd = self.rnd
+        if numbers_only:
+            return rnd.choice(NUMBERS)
+        kind = rnd.random()
+        if kind < 0.4:
+            return rnd.choice(NUMBERS)
+        elif kind < 0.45:
+            return rnd.choice((1, 2))
+        elif kind < 0.9:
+            return rnd.choice(STRINGS)
+        else:
+            return None
+
+    def criterion(self, values: List[Any]) -> Any:
+        if values and self.rnd.random() < 0.5:
+            criterion = self.rnd.choice(values)
+            if criterion is not None:
+                return criterion
+        value = None
+        while value is None:
+            value = self.value()
+        return value
+
+    def rows(self, height: int, width: int, numbers_only: bool = False
+             ) -> Tuple[Tuple[Any, ...], ...]:
+        return tuple(
+            tuple(self.value(numbers_only) for _ in range(width))
+            for _ in range(height)
+        )
+
+    def range(self) -> Tuple[Tuple[Any, ...], ...]:
+        rnd = self.rnd
+        return self.rows(
+            rnd.randint(1, 30), rnd.randint(1, 4), rnd.random() < 0.3)
+
+    def column(self, height: int) -> Tuple[Tuple[Any, ...], ...]:
+        return self.rows(height, 1, self.rnd.random() < 0.3)
+
+    def sort_params(self, width: int
+                    ) -> Tuple[List[int], List[bool], Any, Any]:
+        """
+        The 0-based indices and the ascendings, and the same parameters
+        as arguments of the functions
+        """
+        rnd = self.rnd
+        indices = rnd.sample(range(width), rnd.randint(1, width))
+        ascendings = [rnd.random() < 0.5 for _ in indices]
+        if len(indices) == 1 and rnd.random() < 0.5:
+            sort_index = indices[0] + 1
+            sort_order = rnd.choice((None, 1)) if ascendings[0] else -1
+        else:
+            sort_index = (tuple(i + 1 for i in indices),)
+            sort_order = (tuple(1 if a else -1 for a in ascendings),)
+        return indices, ascendings, sort_index, sort_order
+
+
+def _rows(result: Any) -> List[List[Any]]:
+    return [list(row) for row in result]
+
+
+def _transpose(rows: Any) -> List[Tuple[Any, ...]]:
+    return list(zip(*rows))
+
+
+class DifferentialTestCase(unittest.TestCase):
+    def _check(
+            self, check: Callable[[Generator, Any, Any], None],
+            configurations: Tuple[str, ...] = tuple(CONFIGURATIONS)):
+        """
+        Call check(generator, reference collator, collator) for each
+        iteration, configuration and collator.
+        """
+        for iteration in range(ITERATIONS):
+            seed = SEED + iteration
+            for configuration in configurations:
+                for collator_name, create_collators in COLLATORS.items():
+                    reference_collator, collator = create_collators()
+                    with self.subTest(seed=seed, configuration=configuration,
+                                      collator=collator_name), \
+                            CONFIGURATIONS[configuration]():
+                        check(Generator(seed), reference_collator, collator)
+
+    def test_sort(self):
+        def check(gen: Generator, reference_collator: Any, collator: Any):
+            rows = gen.range()
+            indices, ascendings, sort_index, sort_order = gen.sort_params(
+                len(rows[0]))
+            expected = reference.sort_rows(
+                reference_collator, rows, indices, ascendings)
+            lop_sort = LopSort(collator, ValueError)
+
+            self.assertEqual(_rows(expected), _rows(
+                lop_sort.sort(rows, sort_index, sort_order, None)))
+            self.assertEqual(_rows(_transpose(expected)), _rows(lop_sort.sort(
+                _transpose(rows), sort_index, sort_order, True)))
+
+            # the first rows, then all the rows
+            state = lop_sort.sort_appended(
+                None, rows[:(len(rows) + 1) // 2], sort_index, sort_order)
+            self.assertEqual(_rows(expected), _rows(lop_sort.sort_appended(
+                state, rows, sort_index, sort_order).result))
+
+            if isinstance(reference_collator, SimpleCollator):
+                self.assertEqual(_rows(expected), _rows(
+                    lopolyfill_cli.sort_rows(
+                        rows, sort_index, sort_order, gen.rnd.randint(1, 5))))
+
+        self._check(check)
+
+    def test_sort_by(self):
+        def check(gen: Generator, reference_collator: Any, collator: Any):
+            rows = gen.range()
+            by_ranges = [gen.column(len(rows))
+                         for _ in range(gen.rnd.randint(1, 3))]
+            ascendings = [gen.rnd.random() < 0.5 for _ in by_ranges]
+            args = []
+            for by_range, ascending in zip(by_ranges, ascendings):
+                args += [by_range, 1 if ascending else -1]
+
+            self.assertEqual(
+                _rows(reference.sort_by(
+                    reference_collator, rows,
+                    [[v for v, in by_range] for by_range in by_ranges],
+                    ascendings)),
+                _rows(LopSort(collator, ValueError).sort_by(rows, *args)))
+
+        self._check(check)
+
+    def test_unique(self):
+        def check(gen: Generator, _reference_collator: Any, _collator: Any):
+            rows = gen.range()
+            exactly_once = gen.rnd.random() < 0.5
+            expected = reference.unique_rows(rows, exactly_once)
+            lop_unique = LopUnique(ValueError)
+
+            self.assertEqual(_rows(expected), _rows(
+                lop_unique.execute(rows, None, exactly_once)))
+            self.assertEqual(
+                _rows(_transpose(expected)),
+                _rows(lop_unique.execute(
+                    _transpose(rows), True, exactly_once)))
+
+            state = lop_unique.execute_appended(
+                None, rows[:(len(rows) + 1) // 2], exactly_once)
+            self.assertEqual(_rows(expected), _rows(
+                lop_unique.execute_appended(
+                    state, rows, exactly_once).result))
+
+            key_indices = sorted(gen.rnd.sample(
+                range(len(rows[0])), gen.rnd.randint(1, len(rows[0]))))
+            occurrence = gen.rnd.choice((None, 1, -1))
+            self.assertEqual(
+                _rows(reference.unique_by_keys(
+                    rows, key_indices, exactly_once, occurrence == -1)),
+                _rows(lop_unique.execute_by_keys(
+                    rows, (tuple(k + 1 for k in key_indices),), None,
+                    exactly_once, occurrence)))
+
+        self._check(check, ("python", "numpy"))
+
+    def test_filter(self):
+        def check(gen: Generator, _reference_collator: Any, _collator: Any):
+            rows = gen.range()
+            if gen.rnd.random() < 0.7:
+                include = [gen.rnd.choice((0.0, 1.0, 2.0)) for _ in rows]
+            else:
+                include = [gen.value() for _ in rows]
+            default_value = gen.rnd.choice((None, "none"))
+
+            self.assertEqual(
+                _rows(reference.filter_rows(rows, include, default_value)),
+                _rows(LopFilter(ValueError).execute(
+                    rows, tuple((c,) for c in include), default_value)))
+
+        self._check(check, ("python", "numpy"))
+
+    def test_xmatch(self):
+        def check(gen: Generator, reference_collator: Any, collator: Any):
+            search_range = gen.column(gen.rnd.randint(1, 30))
+            values = [v for v, in search_range]
+            if gen.rnd.random() < 0.3:
+                search_range = (tuple(values),)
+            criterion = gen.criterion(values)
+            sorted_values = [v for v, in reference.sort_rows(
+                reference_collator, [(v,) for v in values], [0], [True])]
+            sorted_range = tuple((v,) for v in sorted_values)
+            bloom_filter = create_bloom_filter(values)
+            sorted_index = create_sorted_index(
+                create_sort_keys(collator, values))
+
+            for match_mode in (0, -1, 1):
+                for search_mode in (1, -1):
+                    expected = reference.find_index(
+                        reference_collator, criterion, values, match_mode,
+                        search_mode == -1)
+                    expected = None if expected is None else expected + 1
+                    for lop_xmatch in (
+                            LopXMatch(collator, ValueError, True),
+                            LopXMatch(collator, ValueError, True,
+                                      bloom_filter=bloom_filter),
+                            LopXMatch(collator, ValueError, True,
+                                      sorted_index=sorted_index)):
+                        self.assertEqual(expected, lop_xmatch.match(
+                            criterion, search_range, match_mode,
+                            search_mode), (criterion, match_mode, search_mode))
+
+                    # binary search in the sorted values
+                    expected = reference.find_index(
+                        reference_collator, criterion, sorted_values,
+                        match_mode, search_mode == -1)
+                    expected = None if expected is None else expected + 1
+                    self.assertEqual(
+                        expected, LopXMatch(collator, ValueError, True).match(
+                            criterion, sorted_range, match_mode,
+                            2 * search_mode),
+                        (criterion, match_mode, 2 * search_mode))
+
+        self._check(check, ("python",))
+
+    def test_xlookup(self):
+        def check(gen: Generator, reference_collator: Any, collator: Any):
+            result_range = gen.range()
+            search_range = gen.column(len(result_range))
+            values = [v for v, in search_range]
+            criterion = gen.criterion(values)
+            match_mode = gen.rnd.choice((0, -1, 1))
+            search_mode = gen.rnd.choice((1, -1))
+            idx = reference.find_index(
+                reference_collator, criterion, values, match_mode,
+                search_mode == -1)
+            expected = [["none"]] if idx is None else [result_range[idx]]
+
+            self.assertEqual(_rows(expected), _rows(
+                LopXMatch(collator, ValueError, True).lookup(
+                    criterion, search_range, result_range, "none",
+                    match_mode, search_mode)))
+
+        self._check(check, ("python",))
+
+    def test_query(self):
+        def check(gen: Generator, reference_collator: Any, collator: Any):
+            rnd = gen.rnd
+            rows = gen.range()
+            include = None if rnd.random() < 0.3 else [
+                rnd.choice((0.0, 1.0)) for _ in rows]
+            if rnd.random() < 0.3:
+                indices = ascendings = sort_index = sort_order = None
+            else:
+                indices, ascendings, sort_index, sort_order = \
+                    gen.sort_params(len(rows[0]))
+            distinct = rnd.random() < 0.5
+            limit = rnd.choice((None, 1, 3, 100, -1, -3, -100))
+
+            self.assertEqual(
+                _rows(reference.query(
+                    reference_collator, rows, include, indices, ascendings,
+                    distinct, limit)),
+                _rows(LopQuery(collator, ValueError).execute(
+                    rows, None if include is None else tuple(
+                        (c,) for c in include),
+                    sort_index, sort_order, distinct, limit)))
+
+        self._check(check, ("python", "numpy"))
+
+    def test_rank(self):
+        def check(gen: Generator, reference_collator: Any, collator: Any):
+            column = gen.column(gen.rnd.randint(1, 30))
+            order = gen.rnd.choice((None, 0, 1))
+            method = gen.rnd.choice((None, 0, 1, 2))
+
+            self.assertEqual(
+                [[r] for r in reference.rank(
+                    reference_collator, [v for v, in column], bool(order),
+                    method or 0)],
+                _rows(LopRank(collator, ValueError).rank(
+                    column, order, method)))
+
+        self._check(check, ("python",))
+
+    def test_array_handling(self):
+        def check(gen: Generator, _reference_collator: Any, _collator: Any):
+            rnd = gen.rnd
+            rows = gen.range()
+            height, width = len(rows), len(rows[0])
+            lop_array_handling = LopArrayHandling(ValueError)
+            pad_with = rnd.choice((None, 0.0, "x"))
+
+            row_count = rnd.choice((None, height, height + rnd.randint(1, 3)))
+            col_count = rnd.choice((None, width, width + rnd.randint(1, 3)))
+            self.assertEqual(
+                _rows(reference.expand(rows, row_count, col_count, pad_with)),
+                _rows(lop_array_handling.expand(
+                    rows, row_count, col_count, pad_with)))
+
+            arrays = [rows] + [gen.range() for _ in range(rnd.randint(1, 2))]
+            self.assertEqual(
+                _rows(reference.hstack(*arrays)),
+                _rows(lop_array_handling.hstack(*arrays)))
+            self.assertEqual(
+                _rows(reference.vstack(*arrays)),
+                _rows(lop_array_handling.vstack(*arrays)))
+
+            ignore = rnd.choice((None, 0, 1, 2, 3))
+            scan_by_col = rnd.random() < 0.5
+            values = reference.flatten(rows, ignore or 0, scan_by_col)
+            self.assertEqual(
+                [[v] for v in values],
+                _rows(lop_array_handling.to_col(rows, ignore, scan_by_col)))
+            self.assertEqual(
+                [values],
+                _rows(lop_array_handling.to_row(rows, ignore, scan_by_col)))
+
+            vector = tuple((v,) for v in reference.flatten(rows, 0, False))
+            wrap_count = rnd.randint(1, 5)
+            self.assertEqual(
+                reference.wrap_rows(
+                    [v for v, in vector], wrap_count, pad_with),
+                _rows(lop_array_handling.wrap_rows(
+                    vector, wrap_count, pad_with)))
+            self.assertEqual(
+                reference.wrap_cols(
+                    [v for v, in vector], wrap_count, pad_with),
+                _rows(lop_array_handling.wrap_cols(
+                    vector, wrap_count, pad_with)))
+
+        self._check(check, ("python", "numpy"))
+
+
+if __name__ == "__main__":
+    unittest.main()
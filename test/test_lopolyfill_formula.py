@@ -0,0 +1,80 @@
+# LoPolyfill - Python - A set of 24.8 functions made availaible for 7.2
+# Copyright (C) 2025 Julien Férard.
+#
+# LoPolyfill is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# LoPolyfill is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import unittest
+
+from lopolyfill_formula import (
+    find_calls, parse_number, parse_range_reference, split_arguments)
+
+PREFIX = "COM.GITHUB.JFERARD.LOPOLYFILL.LOPOLYFILLIMPL.LOP"
+
+
+class FindCallsTestCase(unittest.TestCase):
+    def test_find_calls(self):
+        formula = ("=SUM({0}XMATCH(B1;$Sheet1.$A$1:$A$100;0;1))"
+                   "+{0}SORT($A1:B20;2;-1;)").format(PREFIX)
+        self.assertEqual([
+            ("XMATCH", ["B1", "$Sheet1.$A$1:$A$100", "0", "1"]),
+            ("SORT", ["$A1:B20", "2", "-1", ""]),
+        ], list(find_calls(formula, PREFIX, ["XMATCH", "SORT"])))
+
+    def test_find_nested_calls(self):
+        formula = "={0}SORT({0}SORTBY(A1:A3;B1:B3);1)".format(PREFIX)
+        self.assertEqual([
+            ("SORT", ["{}SORTBY(A1:A3;B1:B3)".format(PREFIX), "1"]),
+            ("SORTBY", ["A1:A3", "B1:B3"]),
+        ], list(find_calls(formula, PREFIX, ["SORTBY", "SORT"])))
+
+    def test_find_no_call(self):
+        formula = "={}FILTER(A1:A3;B1:B3)".format(PREFIX)
+        self.assertEqual([], list(find_calls(formula, PREFIX, ["SORT"])))
+
+
+class SplitArgumentsTestCase(unittest.TestCase):
+    def test_split_arguments(self):
+        self.assertEqual(
+            ["A1", 'IF(B1;"a;b";"c)")', "{1;2}", ""],
+            split_arguments('F(A1; IF(B1;"a;b";"c)");{1;2};)', 2))
+
+    def test_escaped_quote(self):
+        self.assertEqual(['"a"";b"', "1"], split_arguments('F("a"";b";1)', 2))
+
+    def test_empty_call(self):
+        self.assertEqual([], split_arguments("F()", 2))
+
+    def test_not_closed(self):
+        self.assertIsNone(split_arguments("F(A1;(B2)", 2))
+
+
+class ParseTestCase(unittest.TestCase):
+    def test_parse_range_reference(self):
+        self.assertEqual((None, "A1:B10"), parse_range_reference("A1:B10"))
+        self.assertEqual(("Sheet1", "$A$1:$B$10"),
+                         parse_range_reference("$Sheet1.$A$1:$B$10"))
+        self.assertEqual(("Sheet1", "A1:B10"),
+                         parse_range_reference("$Sheet1.A1:$Sheet1.B10"))
+        self.assertEqual(("It's", "C3"), parse_range_reference("$'It''s'.C3"))
+
+    def test_parse_not_a_range_reference(self):
+        self.assertIsNone(parse_range_reference("OFFSET(A1;1;1)"))
+        self.assertIsNone(parse_range_reference("MyNamedRange"))
+        self.assertIsNone(parse_range_reference("2"))
+
+    def test_parse_number(self):
+        self.assertIsNone(parse_number(""))
+        self.assertEqual(-1.0, parse_number("-1"))
+        self.assertEqual(0.5, parse_number("0.5"))
+        with self.assertRaises(ValueError):
+            parse_number("A1")
@@ -18,11 +18,13 @@
 # taken from the LibreOffice help pages ( Mozilla Public License v2.0).
 
 import itertools
+import random
 import unittest
 
 from lopolyfill_funcs import (
     XSearchMode, XMatchMode, IndexFinder, LopArrayHandling, Ignore,
-    create_eq_criterion_with_regex, create_eq_criterion_with_wildcard)
+    create_eq_criterion_with_regex, create_eq_criterion_with_wildcard,
+    LopRunning, Aggregate, LopRank, RankMethod, LopQuery)
 from pythonpath.lopolyfill_funcs import (
     LopFilter, LopRandarray, LopSort, LopUnique, LopXMatch
 )
@@ -247,6 +249,74 @@ class LopSortTestCase(unittest.TestCase):
         ], f(OTHER_SORT_DATA_ARRAY, 8, 1, 1)
         )
 
+    def test_sort_multi(self):
+        f = LopSort(SimpleCollator(), ValueError).sort
+        self.assertEqual([
+            ['book', 19, 180],
+            ['book', 17, 180],
+            ['notebook', 20, 191],
+            ['notebook', 20, 190],
+            ['notebook', 20, 187],
+            ['pen', 35, 85],
+            ['pen', 7, 19],
+            ['pen', 5, 18],
+            ['pen', 5, 15],
+            ['pencil', 22, 70],
+            ['pencil', 20, 65],
+        ], f(SORTBY_DATA_ARRAY[1:], ((1, 3),), ((1, -1),), None)
+        )
+        self.assertEqual([
+            ['pencil', 22, 70],
+            ['pencil', 20, 65],
+            ['pen', 35, 85],
+            ['pen', 7, 19],
+            ['pen', 5, 15],
+            ['pen', 5, 18],
+            ['notebook', 20, 190],
+            ['notebook', 20, 191],
+            ['notebook', 20, 187],
+            ['book', 19, 180],
+            ['book', 17, 180],
+        ], f(SORTBY_DATA_ARRAY[1:], ((1,), (2,)), -1, None)
+        )
+
+    def test_sort_multi_same_as_sortby(self):
+        f = LopSort(SimpleCollator(), ValueError)
+        rows = SORTBY_DATA_ARRAY[1:]
+        cols = _extract_cols(rows)
+        self.assertEqual(
+            f.sort_by(rows, cols[0], -1, cols[1], 1, cols[2], -1),
+            f.sort(rows, ((1, 2, 3),), ((-1, 1, -1),), None))
+
+    def test_sort_multi_errors(self):
+        f = LopSort(SimpleCollator(), ValueError).sort
+        with self.assertRaises(ValueError):
+            f(SORTBY_DATA_ARRAY, ((1, 2),), ((1, -1, 1),), None)
+        with self.assertRaises(ValueError):
+            f(SORTBY_DATA_ARRAY, ((1, 4),), 1, None)
+
+    def test_sort_appended(self):
+        lop_sort = LopSort(SimpleCollator(), ValueError)
+        rnd = random.Random(34)
+        rows = tuple(
+            (rnd.choice([1, 2.5, -3, "a", "B", "b", None]), i)
+            for i in range(60))
+        for sort_index, sort_order in [
+            (1, None), (1, -1), (((1, 2),), ((-1, 1),)), (2, -1)]:
+            state = lop_sort.sort_appended(
+                None, rows[:20], sort_index, sort_order)
+            for stop in (20, 25, 26, 40, 60):
+                state = lop_sort.sort_appended(
+                    state, rows[:stop], sort_index, sort_order)
+                self.assertEqual(
+                    lop_sort.sort(rows[:stop], sort_index, sort_order, None),
+                    state.result)
+
+        state = lop_sort.sort_appended(None, rows[:20], 1, 1)
+        other = rows[1:30]  # not an append: sorted from scratch
+        self.assertEqual(lop_sort.sort(other, 1, 1, None),
+                         lop_sort.sort_appended(state, other, 1, 1).result)
+
     def test_sortby(self):
         lop_sort = LopSort(SimpleCollator(), ValueError)
 
@@ -385,6 +455,79 @@ class LopUniqueTestCase(unittest.TestCase):
             ('Age', 10, 10, 11, 7, 7)
         ], f(rows, True, True))
 
+    def test_by_keys(self):
+        f = LopUnique(ValueError).execute_by_keys
+        rows = UNIQUE_DATA_ARRAY[1:]
+        self.assertEqual([
+            ["Andy", 3, 9, 150, 40],
+            ["Betty", 4, 10, 1000, 42],
+            ["Daniel", 5, 11, 1200, 48],
+            ["Eva", 2, 8, 650, 33],
+            ["Greta", 1, 7, 200, 36],
+        ], f(rows, 2, False, False, None))
+        self.assertEqual([
+            ["Betty", 4, 10, 1000, 42],
+            ["Daniel", 5, 11, 1200, 48],
+            ["Greta", 1, 7, 200, 36],
+            ["Harry", 3, 9, 1200, 44],
+            ["Irene", 2, 8, 1000, 42],
+        ], f(rows, 2, False, False, -1))
+        self.assertEqual([
+            ["Betty", 4, 10, 1000, 42],
+            ["Daniel", 5, 11, 1200, 48],
+            ["Greta", 1, 7, 200, 36],
+        ], f(rows, 2, False, True, None))
+
+    def test_by_keys_multi(self):
+        f = LopUnique(ValueError).execute_by_keys
+        rows = UNIQUE_DATA_ARRAY[1:]
+        self.assertEqual([
+            ["Andy", 3, 9, 150, 40],
+            ["Betty", 4, 10, 1000, 42],
+            ["Charles", 3, 10, 300, 51],
+            ["Daniel", 5, 11, 1200, 48],
+            ["Eva", 2, 8, 650, 33],
+            ["Frank", 2, 7, 300, 42],
+            ["Greta", 1, 7, 200, 36],
+        ], f(rows, ((2, 3),), False, False, 1))
+        self.assertEqual(
+            f([row[1:3] for row in rows], None, False, False, None),
+            [row[1:3] for row in f(rows, ((2,), (3,)), False, False, None)])
+
+    def test_by_keys_bycol(self):
+        f = LopUnique(ValueError).execute_by_keys
+        cols = list(zip(*UNIQUE_DATA_ARRAY[1:]))
+        self.assertEqual([
+            ['Andy', 'Betty', 'Daniel', 'Eva', 'Greta'],
+            [3, 4, 5, 2, 1],
+            [9, 10, 11, 8, 7],
+            [150, 1000, 1200, 650, 200],
+            [40, 42, 48, 33, 36],
+        ], f(cols, 2, True, False, None))
+
+    def test_by_keys_errors(self):
+        f = LopUnique(ValueError).execute_by_keys
+        with self.assertRaises(ValueError):
+            f(SIMPLE_2_2_ARRAY, 3, False, False, None)
+        with self.assertRaises(ValueError):
+            f(SIMPLE_2_2_ARRAY, 1, False, False, 2)
+
+    def test_appended(self):
+        lop_unique = LopUnique(ValueError)
+        rnd = random.Random(34)
+        rows = tuple(
+            (rnd.choice([1, 2, "a"]), rnd.choice([0.0, -0.0, 1.0]))
+            for _ in range(60))
+        for uniqueness in (False, True):
+            state = None
+            for stop in (10, 15, 16, 30, 60):
+                state = lop_unique.execute_appended(
+                    state, rows[:stop], uniqueness)
+                self.assertEqual(
+                    lop_unique.execute(rows[:stop], False, uniqueness),
+                    state.result)
+            self.assertIsNotNone(state.data)
+
 
 XLOOKUP_DATA_ARRAY = [
     ["Element", "Hydrogen", "Helium", "Lithium", "...", "Oganesson"],
@@ -658,6 +801,15 @@ class IndexFinderTestCase(unittest.TestCase):
                                                      XMatchMode.LARGER,
                                                      reverse=True))
 
+    def test_binary_larger_than_all(self):
+        finder = IndexFinder(SimpleCollator(), ValueError, True)
+        values = [1, 1, 2, 3]
+
+        self.assertEqual(0, finder.binary_find_index(
+            0, values, XMatchMode.LARGER, reverse=False))
+        self.assertEqual(1, finder.binary_find_index(
+            0, values, XMatchMode.LARGER, reverse=True))
+
     def test_eq_with_wildcard_question_mark(self):
         criterion = "c?s"
         eq = create_eq_criterion_with_wildcard(criterion, True)
@@ -885,5 +1037,191 @@ class LopArrayHandlingTestCase(unittest.TestCase):
             ((1, '', 2), ('', 3, None)), Ignore.IGNORE_BLANKS_AND_ERRORS, True))
 
 
+RUNNING_COLUMN = ((1,), (2,), ('x',), (4,), (None,), (3,))
+
+
+class LopRunningTestCase(unittest.TestCase):
+    def test_cumulate(self):
+        f = LopRunning(ValueError).cumulate
+        self.assertEqual([(1,), (3,), (3,), (7,), (7,), (10,)],
+                         f(RUNNING_COLUMN, None))
+        self.assertEqual([(1,), (2,), (2,), (3,), (3,), (4,)],
+                         f(RUNNING_COLUMN, Aggregate.COUNT))
+        self.assertEqual([(1,), (2,), (2,), (4,), (4,), (4,)],
+                         f(RUNNING_COLUMN, Aggregate.MAX))
+        self.assertEqual([(1,), (1,), (1,), (1,), (1,), (1,)],
+                         f(RUNNING_COLUMN, Aggregate.MIN))
+        self.assertEqual([(None,), (1.0,), (1.5,)],
+                         f((('',), (1,), (2,)), Aggregate.AVERAGE))
+
+    def test_cumulate_row(self):
+        f = LopRunning(ValueError).cumulate
+        self.assertEqual([[1, 3, 6]], f(((1, 2, 3),), Aggregate.SUM))
+
+    def test_moving(self):
+        f = LopRunning(ValueError).moving
+        self.assertEqual([(None,), (3,), (2,), (4,), (4,), (3,)],
+                         f(RUNNING_COLUMN, 2, None))
+        self.assertEqual([(None,), (None,), (2,), (4,), (4,), (4,)],
+                         f(RUNNING_COLUMN, 3, Aggregate.MAX))
+        self.assertEqual([(None,), (None,), (1,), (2,), (4,), (3,)],
+                         f(RUNNING_COLUMN, 3, Aggregate.MIN))
+        self.assertEqual([[None, 1.5, 2.5]],
+                         f(((1, 2, 3),), 2, Aggregate.AVERAGE))
+
+    def test_moving_precision(self):
+        f = LopRunning(ValueError).moving
+        rows = ((1e20,), (1,), (1,), (1,), (1,))
+        self.assertEqual([(None,), (1e20,), (2,), (2,), (2,)],
+                         f(rows, 2, None))
+        self.assertEqual([(None,), (5e19,), (1,), (1,), (1,)],
+                         f(rows, 2, Aggregate.AVERAGE))
+
+    def test_moving_naive(self):
+        values = [5, 3, 'a', 8, 1, 1, 9, None, 2, 7, 4]
+        rows = tuple((v,) for v in values)
+        f = LopRunning(ValueError).moving
+        for window in range(1, 5):
+            numbers = [
+                [v for v in values[max(0, i - window + 1):i + 1]
+                 if isinstance(v, int)]
+                for i in range(len(values))
+            ]
+            self.assertEqual(
+                [(None,)] * (window - 1) + [
+                    (max(ns) if ns else 0,) for ns in numbers[window - 1:]],
+                f(rows, window, Aggregate.MAX))
+            self.assertEqual(
+                [(None,)] * (window - 1) + [
+                    (sum(ns),) for ns in numbers[window - 1:]],
+                f(rows, window, Aggregate.SUM))
+
+    def test_errors(self):
+        with self.assertRaises(ValueError):
+            LopRunning(ValueError).moving(RUNNING_COLUMN, 0, None)
+        with self.assertRaises(ValueError):
+            LopRunning(ValueError).cumulate(RUNNING_COLUMN, 3)
+        with self.assertRaises(ValueError):
+            LopRunning(ValueError).cumulate(SIMPLE_2_2_ARRAY, None)
+
+
+class LopRankTestCase(unittest.TestCase):
+    def test_rank_numbers(self):
+        f = LopRank(SimpleCollator(), ValueError).rank
+        column = ((10,), (30,), (20,), (30,), (5,))
+        self.assertEqual([(4,), (1,), (3,), (1,), (5,)],
+                         f(column, None, None))
+        self.assertEqual([(2,), (4,), (3,), (4,), (1,)],
+                         f(column, 1, RankMethod.COMPETITION))
+        self.assertEqual([(3,), (1,), (2,), (1,), (4,)],
+                         f(column, 0, RankMethod.DENSE))
+        self.assertEqual([(4,), (1,), (3,), (2,), (5,)],
+                         f(column, 0, RankMethod.ORDINAL))
+        self.assertEqual([(2,), (4,), (3,), (5,), (1,)],
+                         f(column, 1, RankMethod.ORDINAL))
+
+    def test_rank_mixed(self):
+        f = LopRank(SimpleCollator(), ValueError).rank
+        self.assertEqual([[3, 1, 4, 2, None, 3]], f(
+            (("b", 2, "c", "a", None, "B"),), 1, RankMethod.DENSE))
+        self.assertEqual([[3, 1, 5, 2, None, 4]], f(
+            (("b", 2, "c", "a", None, "B"),), 1, RankMethod.ORDINAL))
+
+    def test_rank_blanks(self):
+        f = LopRank(SimpleCollator(), ValueError).rank
+        self.assertEqual([(2,), (None,), (1,), (None,), (3,)],
+                         f(((3,), (None,), (5,), ('',), (1,)), None, None))
+        self.assertEqual([(1,), (None,), (1,), (2,)], f(
+            ((4,), (None,), (4,), (7,)), 1, RankMethod.DENSE))
+        self.assertEqual([(None,), (None,)],
+                         f(((None,), ('',)), None, RankMethod.ORDINAL))
+
+    def test_rank_consistent_with_sort(self):
+        column = tuple((v,) for v in ["b", 2, "B", "a", 2, 1.5, "A"])
+        for order, sort_order in ((0, -1), (1, 1)):
+            ranks = LopRank(SimpleCollator(), ValueError).rank(
+                column, order, RankMethod.ORDINAL)
+            sorted_column = LopSort(SimpleCollator(), ValueError).sort(
+                tuple((v, i) for i, (v,) in enumerate(column)), 1,
+                sort_order, None)
+            self.assertEqual(
+                [i for _v, i in sorted_column],
+                sorted(range(len(column)), key=lambda i: ranks[i][0]))
+
+    def test_errors(self):
+        f = LopRank(SimpleCollator(), ValueError).rank
+        with self.assertRaises(ValueError):
+            f(((1,), (2,)), 1, 3)
+        with self.assertRaises(ValueError):
+            f(SIMPLE_2_2_ARRAY, 1, None)
+
+
+class LopQueryTestCase(unittest.TestCase):
+    def _nested(self, rows, include, sort_index, sort_order, distinct,
+                limit):
+        if include is not None:
+            rows = LopFilter(ValueError).execute(rows, include, None)
+        if distinct and rows:
+            rows = LopUnique(ValueError).execute(rows, None, None)
+        if (sort_index is not None or sort_order is not None) and rows:
+            rows = LopSort(SimpleCollator(), ValueError).sort(
+                rows, sort_index, sort_order, None)
+        if limit is not None and rows:
+            rows = LopArrayHandling(ValueError).take(rows, limit, None)
+        return [tuple(row) for row in rows]
+
+    def test_same_as_nested(self):
+        rnd = random.Random(42)
+        f = LopQuery(SimpleCollator(), ValueError).execute
+        for _ in range(300):
+            rows = tuple(
+                (rnd.choice(["a", "B", "b", 1.0, 2.0, None]),
+                 rnd.randint(0, 3))
+                for _ in range(rnd.randint(1, 30)))
+            include = rnd.choice([None, tuple(
+                (rnd.random() < 0.7,) for _ in rows)])
+            sort_index = rnd.choice([None, 1, 2, ((2, 1),)])
+            sort_order = rnd.choice([None, 1, -1])
+            distinct = rnd.choice([None, False, True])
+            limit = rnd.choice([None, 1, 3, 50, -1, -4])
+            args = (rows, include, sort_index, sort_order, distinct, limit)
+            self.assertEqual(
+                self._nested(*args),
+                [tuple(row) for row in f(*args)], args)
+
+    def test_early_termination(self):
+        consumed = []
+
+        class Include(tuple):
+            def __iter__(self):
+                for c in tuple.__iter__(self):
+                    consumed.append(c)
+                    yield c
+
+        rows = tuple((i,) for i in range(1000))
+        include = Include((True,) for _ in rows)
+        self.assertEqual([(0,), (1,), (2,)], LopQuery(
+            SimpleCollator(), ValueError).execute(
+            rows, include, None, None, None, 3))
+        self.assertEqual(3, len(consumed))
+
+    def test_top(self):
+        rows = tuple((i % 7, "r{}".format(i)) for i in range(100))
+        f = LopQuery(SimpleCollator(), ValueError).execute
+        self.assertEqual([(6, "r6"), (6, "r13")],
+                         f(rows, None, 1, -1, None, 2))
+        self.assertEqual([(6, "r90"), (6, "r97")],
+                         f(rows, None, 1, None, None, -2))
+
+    def test_errors(self):
+        f = LopQuery(SimpleCollator(), ValueError).execute
+        with self.assertRaises(ValueError):
+            f(SIMPLE_2_2_ARRAY, ((True, False),), None, None, None, None)
+        with self.assertRaises(ValueError):
+            f(SIMPLE_2_2_ARRAY, None, 3, None, None, None)
+        with self.assertRaises(ValueError):
+            f(SIMPLE_2_2_ARRAY, None, None, None, None, 0)
+
+
 if __name__ == "__main__":
     unittest.main()
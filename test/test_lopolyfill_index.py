@@ -0,0 +1,167 @@
+# LoPolyfill - Python - A set of 24.8 functions made availaible for 7.2
+# Copyright (C) 2025 Julien Férard.
+#
+# LoPolyfill is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# LoPolyfill is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import os
+import random
+import tempfile
+import unittest
+from unittest import mock
+
+from lopolyfill_funcs import IndexFinder, LopXMatch, create_sort_keys
+from lopolyfill_index import (
+    IndexStore, create_bloom_filter, create_sorted_index, get_index_digest,
+    normalize_key, normalize_string)
+from test.test_lopolyfill_funcs import SimpleCollator
+
+
+def _random_values(seed, count):
+    rnd = random.Random(seed)
+    return [
+        "".join(rnd.choice("abcdefgXYZ") for _ in range(rnd.randint(1, 8)))
+        if rnd.random() < 0.7 else float(rnd.randint(0, 10000))
+        for _ in range(count)
+    ]
+
+
+class NormalizeTestCase(unittest.TestCase):
+    def test_normalize_string(self):
+        self.assertEqual("evequestrasse", normalize_string("Évêque-Straße"))
+        self.assertEqual("fi2", normalize_string("ﬁ ２"))
+        self.assertEqual("", normalize_string("--"))
+
+    def test_normalize_kana(self):
+        # equal for a collator that ignores case (secondary strength)
+        for katakana, hiragana in (
+                ("カ", "か"), ("ガッコウ", "がっこう"), ("ｶﾞｯｺｳ", "がっこう"),
+                ("ヴァ", "ゔぁ"), ("ヶ", "け"), ("ヽ", "ゝ")):
+            self.assertEqual(normalize_string(hiragana),
+                             normalize_string(katakana))
+        self.assertEqual(normalize_string("つ"), normalize_string("ッ"))
+        self.assertNotEqual(normalize_string("か"), normalize_string("き"))
+
+    def test_normalize_key(self):
+        self.assertEqual(normalize_key(1), normalize_key(1.0))
+        self.assertNotEqual(normalize_key(1), normalize_key("1"))
+        self.assertEqual(normalize_key("ABC"), normalize_key("abc"))
+        self.assertIsNone(normalize_key(None))
+
+
+class BloomFilterTestCase(unittest.TestCase):
+    def test_no_false_negative(self):
+        values = _random_values(1, 5000)
+        bloom_filter = create_bloom_filter(values + [None])
+        for value in values:
+            self.assertTrue(bloom_filter.might_contain(value))
+            if isinstance(value, str):
+                self.assertTrue(bloom_filter.might_contain(value.upper()))
+        self.assertFalse(bloom_filter.might_contain(None))
+
+    def test_no_false_negative_kana(self):
+        bloom_filter = create_bloom_filter(["か", "がっこう", "ｷ"])
+        for value in ("カ", "ガッコウ", "キ", "き"):
+            self.assertTrue(bloom_filter.might_contain(value))
+
+    def test_false_positives(self):
+        values = _random_values(1, 5000)
+        bloom_filter = create_bloom_filter(values)
+        keys = set(map(normalize_key, values))
+        others = [
+            value for value in _random_values(2, 5000)
+            if normalize_key(value) not in keys
+        ]
+        false_positives = sum(map(bloom_filter.might_contain, others))
+        self.assertLess(false_positives, len(others) * 0.02)
+
+    def test_xmatch(self):
+        search_range = tuple((v,) for v in _random_values(3, 2000))
+        bloom_filter = create_bloom_filter(v for v, in search_range)
+        plain = LopXMatch(SimpleCollator(), ValueError, True)
+        filtered = LopXMatch(SimpleCollator(), ValueError, True, bloom_filter)
+        for criterion in _random_values(4, 300) + ["ABC", 12.0]:
+            for search_mode in (None, -1, 2):
+                self.assertEqual(
+                    plain.match(criterion, search_range, 0, search_mode),
+                    filtered.match(criterion, search_range, 0, search_mode))
+
+
+class SortedIndexTestCase(unittest.TestCase):
+    def test_same_as_linear(self):
+        values = _random_values(5, 500)
+        values[::50] = [None] * len(values[::50])
+        sorted_index = create_sorted_index(
+            create_sort_keys(SimpleCollator(), values))
+        plain = IndexFinder(SimpleCollator(), ValueError, True)
+        indexed = IndexFinder(
+            SimpleCollator(), ValueError, True, sorted_index=sorted_index)
+        criteria = values[:100] + _random_values(6, 100) + [
+            "", "ZZZ", -1.0, 1e9, values[3].upper()]
+        for criterion in criteria:
+            for match_mode in (0, -1, 1):
+                for reverse in (False, True):
+                    self.assertEqual(
+                        plain.find_index(
+                            criterion, values, match_mode, reverse),
+                        indexed.find_index(
+                            criterion, values, match_mode, reverse),
+                        (criterion, match_mode, reverse))
+
+
+class IndexStoreTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = IndexStore(os.path.join(self.tmp_dir.name, "indexes"))
+        self.values = _random_values(7, 300)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _create(self):
+        return create_sorted_index(
+            create_sort_keys(SimpleCollator(), self.values))
+
+    def test_get_or_create(self):
+        create = mock.Mock(side_effect=self._create)
+        index = self.store.get_or_create(self.values, "fr-FR-", create)
+        loaded = self.store.get_or_create(self.values, "fr-FR-", create)
+        self.assertEqual(1, create.call_count)
+        self.assertEqual(list(index), list(loaded))
+        self.assertLess(loaded.__sizeof__(), 1000)
+
+        self.store.get_or_create(self.values, "en-US-", create)
+        self.assertEqual(2, create.call_count)
+        self.store.get_or_create(self.values[1:], "fr-FR-", create)
+        self.assertEqual(3, create.call_count)
+
+    def test_digest(self):
+        self.assertEqual(get_index_digest([1.0, "a", None], "fr-FR-"),
+                         get_index_digest((1.0, "a", None), "fr-FR-"))
+        self.assertNotEqual(get_index_digest([1.0, "a", None], "fr-FR-"),
+                            get_index_digest([1.0, "A", None], "fr-FR-"))
+
+    def test_invalid_file(self):
+        digest = get_index_digest(self.values, "fr-FR-")
+        self.assertIsNone(self.store.load(digest, len(self.values)))
+        self.store.save(digest, self._create())
+        self.assertIsNotNone(self.store.load(digest, len(self.values)))
+        self.assertIsNone(self.store.load(digest, len(self.values) + 1))
+
+        path = os.path.join(self.tmp_dir.name, "indexes", digest + ".idx")
+        with open(path, "r+b") as f:
+            f.truncate(os.path.getsize(path) - 1)
+        self.assertIsNone(self.store.load(digest, len(self.values)))
+
+
+if __name__ == "__main__":
+    unittest.main()
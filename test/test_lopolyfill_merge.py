@@ -0,0 +1,68 @@
+# LoPolyfill - Python - A set of 24.8 functions made availaible for 7.2
+# Copyright (C) 2025 Julien Férard.
+#
+# LoPolyfill is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# LoPolyfill is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import random
+import unittest
+from unittest import mock
+
+import lopolyfill_merge
+from lopolyfill_funcs import LopSort
+from test.test_lopolyfill_funcs import SimpleCollator
+
+
+def _random_rows(h):
+    rnd = random.Random(h)
+    values = [1, 2, 3, "a", "A", "b", None]
+    return tuple(
+        (rnd.choice(values), rnd.choice(values), i)
+        for i in range(h)
+    )
+
+
+class ExternalSortTestCase(unittest.TestCase):
+    def test_in_memory(self):
+        self.assertIsNone(lopolyfill_merge.external_sorted_indices(
+            1000, lambda i: i, 1))
+
+    def test_sorted_indices(self):
+        keys = [((k * 7919) % 101, k % 3) for k in range(1000)]
+        with mock.patch.object(
+                lopolyfill_merge, "EXTERNAL_SORT_MEMORY", 50000), \
+                mock.patch.object(lopolyfill_merge, "write_run",
+                                  wraps=lopolyfill_merge.write_run) as m:
+            indices = lopolyfill_merge.external_sorted_indices(
+                len(keys), keys.__getitem__, 2)
+            self.assertEqual(
+                sorted(range(len(keys)), key=keys.__getitem__),
+                list(indices))
+        self.assertEqual(7, m.call_count)
+
+    def test_sort_by_same_as_in_memory(self):
+        rows = _random_rows(500)
+        cols = list(zip(*rows))
+        f = LopSort(SimpleCollator(), ValueError).sort_by
+        in_memory = f(rows, [[v] for v in cols[0]], 1,
+                      [[v] for v in cols[1]], -1)
+        by_col_in_memory = f(tuple(zip(*rows)), [cols[1]], -1)
+        with mock.patch.object(
+                lopolyfill_merge, "EXTERNAL_SORT_MEMORY", 10000):
+            self.assertEqual(in_memory, f(rows, [[v] for v in cols[0]], 1,
+                                          [[v] for v in cols[1]], -1))
+            self.assertEqual(by_col_in_memory,
+                             f(tuple(zip(*rows)), [cols[1]], -1))
+
+
+if __name__ == "__main__":
+    unittest.main()
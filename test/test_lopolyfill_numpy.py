@@ -0,0 +1,114 @@
+# LoPolyfill - Python - A set of 24.8 functions made availaible for 7.2
+# Copyright (C) 2025 Julien Férard.
+#
+# LoPolyfill is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# LoPolyfill is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import random
+import unittest
+from unittest import mock
+
+import lopolyfill_numpy
+from lopolyfill_funcs import (
+    LopFilter, LopSort, LopUnique, LopArrayHandling, Ignore)
+from test.test_lopolyfill_funcs import SimpleCollator
+
+HAS_NUMPY = lopolyfill_numpy.get_numpy() is not None
+
+
+def _random_rows(h, w, values):
+    rnd = random.Random(h * w)
+    return tuple(
+        tuple(rnd.choice(values) for _ in range(w))
+        for _ in range(h)
+    )
+
+
+class NumpyFallbackTestCase(unittest.TestCase):
+    def test_small_or_mixed(self):
+        with mock.patch.object(lopolyfill_numpy, "MIN_CELL_COUNT", 0):
+            self.assertIsNone(lopolyfill_numpy.to_float_array(
+                ((1.0, "a"), (2.0, 3.0))))
+            self.assertIsNone(lopolyfill_numpy.to_float_array(
+                ((1.0, None), (2.0, 3.0))))
+            self.assertIsNone(lopolyfill_numpy.argsort_rows(
+                ((1.0, "a"), ("b", 3.0)), [0], [True]))
+            self.assertIsNone(lopolyfill_numpy.to_float_array(
+                ((1.0, 2), (2.0, 3.0)), floats_only=True))
+        self.assertIsNone(lopolyfill_numpy.to_float_array(((1.0, 2.0),)))
+
+
+@unittest.skipUnless(HAS_NUMPY, "NumPy is not available")
+class NumpyBackendTestCase(unittest.TestCase):
+    """
+    The NumPy paths must return exactly the same results as the pure Python
+    paths.
+    """
+
+    def setUp(self):
+        self.rows = _random_rows(
+            200, 3, [0.0, -0.0, 1.0, 2.5, -3.0, 7.0, 1e20])
+
+    def _both(self, func, *args):
+        with mock.patch.object(lopolyfill_numpy, "MIN_CELL_COUNT", 0):
+            fast = func(*args)
+        with mock.patch.object(lopolyfill_numpy, "_numpy", None):
+            slow = func(*args)
+        self.assertEqual(slow, fast)
+        self.assertEqual(
+            [type(v) for row in slow for v in row],
+            [type(v) for row in fast for v in row])
+        return fast
+
+    def test_sort(self):
+        sort = LopSort(SimpleCollator(), ValueError).sort
+        self._both(sort, self.rows, 2, 1, None)
+        self._both(sort, self.rows, 2, -1, None)
+        self._both(sort, self.rows, ((3, 1),), ((-1, 1),), None)
+        self._both(sort, self.rows, 5, 1, 1)
+
+    def test_sort_mixed_keys(self):
+        rows = _random_rows(100, 2, [1.0, 2.0, "a", "B", None])
+        self._both(LopSort(SimpleCollator(), ValueError).sort,
+                   rows, ((1, 2),), ((1, -1),), None)
+
+    def test_unique(self):
+        unique = LopUnique(ValueError).execute
+        rows = _random_rows(300, 2, [0.0, -0.0, 1.0, 2.0])
+        self._both(unique, rows, False, False)
+        self._both(unique, rows, False, True)
+        self._both(unique, rows, True, False)
+
+    def test_filter(self):
+        f = LopFilter(ValueError).execute
+        criteria = _random_rows(200, 1, [0.0, 1.0, 2.0])
+        self._both(f, self.rows, criteria, None)
+        self._both(f, self.rows[:3], ((1.0, 0.0, 1.0),), None)
+
+    def test_to_col_to_row(self):
+        handling = LopArrayHandling(ValueError)
+        for scan_by_col in (False, True):
+            self._both(handling.to_col, self.rows, Ignore.IGNORE_BLANKS,
+                       scan_by_col)
+            self._both(handling.to_row, self.rows, None, scan_by_col)
+
+    def test_wrap(self):
+        handling = LopArrayHandling(ValueError)
+        column = tuple((row[0],) for row in self.rows)
+        for wrap_count in (1, 7, 10, 300):
+            self._both(handling.wrap_rows, column, wrap_count, 0.0)
+            self._both(handling.wrap_cols, column, wrap_count, -1.0)
+            self._both(handling.wrap_rows, column, wrap_count, None)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+# LoPolyfill - Python - A set of 24.8 functions made availaible for 7.2
+# Copyright (C) 2025 Julien Férard.
+#
+# LoPolyfill is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# LoPolyfill is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import importlib.util
+import os
+import subprocess
+import sys
+import unittest
+from typing import Dict, Tuple
+
+# without the LibreOffice Python, the component imports the stubs of uno_stub
+HAS_UNO = importlib.util.find_spec("uno") is not None
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+# the maximal import time of the component, in milliseconds
+IMPORT_TIME_BUDGET = int(os.environ.get(
+    "LOPOLYFILL_IMPORT_TIME_BUDGET", "100"))
+# the modules of the engines, imported on the first call of a function
+DEFERRED_MODULES = {
+    "hashlib", "logging", "mmap", "pathlib", "pickle", "random",
+    "tempfile", "unicodedata",
+}
+
+
+def _import_times(code: str) -> Dict[str, Tuple[int, int]]:
+    """
+    The self and cumulative import times (in microseconds) of the modules
+    imported by the code, in a new interpreter.
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([TEST_DIR] + sys.path))
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], env=env,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        universal_newlines=True, check=True)
+    times = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_time, cumulative, name = line[len("import time:"):].split("|")
+        if self_time.strip().isdigit():
+            times[name.strip()] = (int(self_time), int(cumulative))
+    return times
+
+
+class StartupTestCase(unittest.TestCase):
+    # LibreOffice has imported uno and unohelper before the component
+    UNO_CODE = "import uno, unohelper" if HAS_UNO else (
+        "import uno_stub; uno_stub.install(); import uno, unohelper")
+    CODE = UNO_CODE + "; import LoPolyfill"
+
+    def test_deferred_imports(self):
+        before = _import_times(self.UNO_CODE)
+        imported = set(_import_times(self.CODE)) - set(before)
+        self.assertEqual(
+            [], sorted(name for name in imported if name.startswith(
+                "lopolyfill_") or name in DEFERRED_MODULES))
+
+    def test_import_time(self):
+        best = min(
+            _import_times(self.CODE)["LoPolyfill"][1] for _ in range(5))
+        self.assertLess(best / 1000, IMPORT_TIME_BUDGET)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+# LoPolyfill - Python - A set of 24.8 functions made availaible for 7.2
+# Copyright (C) 2025 Julien Férard.
+#
+# LoPolyfill is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# LoPolyfill is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import random
+import sys
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from lopolyfill_cache import (
+    CacheRegistry, DocumentTracker, ResultCache, estimate_size)
+from lopolyfill_funcs import LopSort, LopXMatch
+from lopolyfill_index import create_bloom_filter
+from test.test_lopolyfill_cache import MockDocument, MockDocumentListener
+from test.test_lopolyfill_funcs import SimpleCollator
+
+THREAD_COUNT = 16
+
+
+def _random_rows(seed, count):
+    rnd = random.Random(seed)
+    return tuple(
+        (rnd.choice(["a", "B", "c", "D", 1.0, 2.0, None]), rnd.randint(0, 99))
+        for _ in range(count))
+
+
+class ThreadsTestCase(unittest.TestCase):
+    def setUp(self):
+        # switch threads as often as possible
+        self._switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+
+    def tearDown(self):
+        sys.setswitchinterval(self._switch_interval)
+
+    def _hammer(self, func, count):
+        with ThreadPoolExecutor(THREAD_COUNT) as executor:
+            return list(executor.map(func, range(count)))
+
+    def test_xmatch_and_sort(self):
+        rows = _random_rows(40, 500)
+        search_range = tuple((str(v),) for _v, v in rows)
+        bloom_filter = create_bloom_filter(v for v, in search_range)
+        criteria = [str(i) for i in range(150)]
+        sort_args = [(1, 1), (1, -1), (2, 1), (((2, 1),), ((-1, 1),))]
+
+        def xmatch(i):
+            return LopXMatch(
+                SimpleCollator(), ValueError, True, bloom_filter
+            ).match(criteria[i % len(criteria)], search_range, 0, None)
+
+        def sort(i):
+            sort_index, sort_order = sort_args[i % len(sort_args)]
+            return LopSort(SimpleCollator(), ValueError).sort(
+                rows, sort_index, sort_order, None)
+
+        expected_matches = [xmatch(i) for i in range(len(criteria))]
+        expected_sorts = [sort(i) for i in range(len(sort_args))]
+        for i, result in enumerate(self._hammer(xmatch, 600)):
+            self.assertEqual(expected_matches[i % len(criteria)], result)
+        for i, result in enumerate(self._hammer(sort, 200)):
+            self.assertEqual(expected_sorts[i % len(sort_args)], result)
+
+    def test_registry(self):
+        rows = _random_rows(40, 100)
+        entry_size = estimate_size(("f", (0, 0))) + estimate_size(rows)
+        registry = CacheRegistry(entry_size * 20)
+        caches = [ResultCache(registry, kind) for kind in ("a", "b", "c")]
+
+        def use(i):
+            cache = caches[i % len(caches)]
+            owner = i % 5
+            value = cache.memoize(
+                "f", (owner, i % 37), lambda: rows[:50 + i % 37], owner)
+            self.assertEqual(rows[:50 + i % 37], value)
+            if i % 11 == 0:
+                registry.clear_owner((i // 11) % 5)
+            if i % 23 == 0:
+                cache.pop(("f", (owner, i % 37)))
+
+        self._hammer(use, 5000)
+
+        metrics = registry.get_metrics()
+        self.assertLessEqual(registry.size(), registry.max_bytes)
+        self.assertEqual(
+            registry.size(), sum(m["size"] for m in metrics.values()))
+        self.assertEqual(
+            registry.count(), sum(m["count"] for m in metrics.values()))
+        self.assertEqual(
+            5000, sum(m["hits"] + m["misses"] for m in metrics.values()))
+        registry.clear()
+        self.assertEqual((0, 0), (registry.count(), registry.size()))
+
+    def test_tracker(self):
+        docs = [MockDocument(str(i)) for i in range(4)]
+        closed = []
+        tracker = DocumentTracker(closed.append, MockDocumentListener)
+        self._hammer(lambda i: tracker.track(docs[i % len(docs)]), 1000)
+        self.assertEqual([1] * len(docs), [len(d.listeners) for d in docs])
+        self._hammer(lambda i: docs[i % len(docs)].close(), 8)
+        self.assertEqual(sorted(d.RuntimeUID for d in docs), sorted(closed))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+# LoPolyfill - Python - A set of 24.8 functions made availaible for 7.2
+# Copyright (C) 2025 Julien Férard.
+#
+# LoPolyfill is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# LoPolyfill is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+A stand-in for the uno, unohelper and com.* modules of the LibreOffice
+Python, to import the component without LibreOffice:
+
+    import uno_stub; uno_stub.install(); import LoPolyfill
+
+Any module of these packages can be imported, any name of these modules is
+a class, and the instances of these classes accept any call.
+"""
+import importlib.abc
+import importlib.machinery
+import importlib.util
+import sys
+import types
+from typing import Any, Optional, Sequence
+
+_ROOT_NAMES = ("uno", "unohelper", "com")
+
+
+class Stub:
+    def __init__(self, *_args: Any, **_kwargs: Any):
+        pass
+
+    def __call__(self, *_args: Any, **_kwargs: Any) -> "Stub":
+        return Stub()
+
+    def __getattr__(self, name: str) -> "Stub":
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return Stub()
+
+
+class _StubModule(types.ModuleType):
+    def __getattr__(self, name: str) -> type:
+        if name.startswith("__"):
+            raise AttributeError(name)
+        value = type(name, (Stub,), {"__module__": self.__name__})
+        setattr(self, name, value)
+        return value
+
+
+class _StubFinder(importlib.abc.MetaPathFinder, importlib.abc.Loader):
+    def find_spec(
+            self, fullname: str, path: Optional[Sequence[str]],
+            target: Optional[types.ModuleType] = None
+    ) -> Optional[importlib.machinery.ModuleSpec]:
+        if fullname.split(".")[0] not in _ROOT_NAMES:
+            return None
+        return importlib.util.spec_from_loader(
+            fullname, self, is_package=True)
+
+    def create_module(
+            self, spec: importlib.machinery.ModuleSpec) -> types.ModuleType:
+        return _StubModule(spec.name)
+
+    def exec_module(self, module: types.ModuleType):
+        pass
+
+
+def install():
+    """
+    Import the stubs instead of the LibreOffice modules.
+    """
+    if not any(isinstance(finder, _StubFinder) for finder in sys.meta_path):
+        sys.meta_path.insert(0, _StubFinder())